@@ -0,0 +1,121 @@
+import heapq
+import math
+import os
+import time
+from collections import deque
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Teto global de chamadas a API por hora (plano Amadeus)
+LIMITE_CHAMADAS_HORA = int(os.getenv("LIMITE_CHAMADAS_HORA", "400"))
+INTERVALO_BASE = 6  # Intervalo base (maximo) por rota em horas
+INTERVALO_MIN_HORAS = 0.25  # 15 minutos
+AGENDA_TICK_SEGUNDOS = 60
+
+# Modo de cada rota pela queda em relacao a media: (modo, % minimo, intervalo em horas)
+MODOS_ROTA = [
+    ("ULTRA", 40, 0.25),
+    ("ATIVO", 25, 2),
+]
+# Duas ou mais rotas em queda de ATIVO ao mesmo tempo: todas elas viram cacador
+MODO_CACADOR = ("CACADOR", 0.5)
+MODOS_QUEDA = {"ATIVO", "CACADOR"}
+PRIORIDADE_MODO = {"NORMAL": 0, "ATIVO": 1, "CACADOR": 2, "ULTRA": 3}
+
+def intervalo_rota(percentual, volatilidade, assinantes, intervalo_base, outras_quedas=0):
+    # Queda grande manda; volatilidade e assinantes so encurtam o intervalo
+    modo, horas = "NORMAL", intervalo_base
+    for nome, minimo, intervalo in MODOS_ROTA:
+        if percentual >= minimo:
+            modo, horas = nome, intervalo
+            break
+    if modo == "ATIVO" and outras_quedas:
+        modo, horas = MODO_CACADOR
+    horas /= 1 + 5 * volatilidade  # coeficiente de variacao (desvio/media)
+    horas /= 1 + math.log1p(assinantes) / 2
+    return max(INTERVALO_MIN_HORAS, horas), modo
+
+# ==========================================
+# AGENDADOR POR ROTA
+# ==========================================
+class AgendadorRotas:
+    # Fila de prioridade (heap) por horario da proxima checagem de cada rota
+    def __init__(self, chamadas_por_rota=1, limite_hora=LIMITE_CHAMADAS_HORA):
+        self.chamadas_por_rota = chamadas_por_rota
+        self.limite_hora = limite_hora
+        self.heap = []  # (proximo_ts, rota_id); entradas velhas sao ignoradas
+        self.proximo = {}  # rota_id -> proximo_ts vigente
+        self.intervalos = {}  # rota_id -> horas pedidas pela rota
+        self.demanda = 0.0  # soma de chamadas_por_rota / horas de todas as rotas
+        self.modos = {}  # rota_id -> modo
+        self.em_queda = set()  # rotas em ATIVO/CACADOR
+        self.chamadas = deque()  # timestamps das chamadas da ultima hora
+
+    def sincronizar(self, rota_ids, agora=None):
+        # Rotas novas entram vencidas; rotas removidas saem da agenda
+        agora = agora or time.time()
+        for rota_id in rota_ids:
+            if rota_id not in self.proximo:
+                self._agendar(rota_id, agora)
+        for rota_id in set(self.proximo) - set(rota_ids):
+            del self.proximo[rota_id]
+            if rota_id in self.intervalos:
+                self.demanda -= self.chamadas_por_rota / self.intervalos.pop(rota_id)
+            self.modos.pop(rota_id, None)
+            self.em_queda.discard(rota_id)
+
+    def _agendar(self, rota_id, quando):
+        self.proximo[rota_id] = quando
+        heapq.heappush(self.heap, (quando, rota_id))
+
+    def fator_orcamento(self):
+        # >1 quando a soma dos pedidos (chamadas/hora) estoura o teto: estica todos por igual
+        return max(1.0, self.demanda / self.limite_hora)
+
+    def orcamento_restante(self, agora=None):
+        agora = agora or time.time()
+        while self.chamadas and self.chamadas[0] < agora - 3600:
+            self.chamadas.popleft()
+        return self.limite_hora - len(self.chamadas)
+
+    def devidas(self, agora=None, limite=None):
+        # Retira da fila as rotas vencidas que cabem no orcamento da ultima hora
+        agora = agora or time.time()
+        cabem = self.orcamento_restante(agora) // self.chamadas_por_rota
+        if limite is not None:
+            cabem = min(cabem, limite)
+        rotas = []
+        while self.heap and self.heap[0][0] <= agora and len(rotas) < cabem:
+            quando, rota_id = heapq.heappop(self.heap)
+            if self.proximo.get(rota_id) != quando:
+                continue
+            rotas.append(rota_id)
+            self.chamadas.extend([agora] * self.chamadas_por_rota)
+        return rotas
+
+    def reagendar(self, rota_id, horas, modo="NORMAL", agora=None):
+        if rota_id not in self.proximo:
+            return
+        agora = agora or time.time()
+        if rota_id in self.intervalos:
+            self.demanda -= self.chamadas_por_rota / self.intervalos[rota_id]
+        self.demanda += self.chamadas_por_rota / horas
+        self.intervalos[rota_id] = horas
+        self.modos[rota_id] = modo
+        if modo in MODOS_QUEDA:
+            self.em_queda.add(rota_id)
+        else:
+            self.em_queda.discard(rota_id)
+        self._agendar(rota_id, agora + horas * self.fator_orcamento() * 3600)
+
+    def devolver(self, rota_id, agora=None):
+        # Rota que nao chegou a ser consultada volta vencida, sem mexer no intervalo dela
+        if rota_id in self.proximo:
+            self._agendar(rota_id, agora or time.time())
+
+    def outras_quedas(self, rota_id):
+        return len(self.em_queda) - (rota_id in self.em_queda)
+
+    def modo_geral(self):
+        return max(self.modos.values(), key=PRIORIDADE_MODO.get, default="NORMAL")
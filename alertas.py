@@ -0,0 +1,59 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from anomalia import classificar_z
+
+# ==========================================
+# REGRAS DE ALERTA
+# ==========================================
+# Percentual abaixo da media e score (0-10) de cada tipo; o backtest le daqui
+PERCENTUAL_ANOMALIA = 50
+PERCENTUAL_DESCONTO = 35
+PERCENTUAL_BOM = 20
+SCORES_ALERTA = (9, 8, 7)  # critico, excelente, bom
+
+def determinar_tipo_alerta(preco_atual, media, score, z=None):
+    # Com o detector aquecido, quem decide e o z-score robusto (mediana movel,
+    # sazonalidade); as regras por media/score so valem durante o aquecimento
+    if z is not None:
+        return classificar_z(z)
+    if not media:
+        return None
+    percentual = ((media - preco_atual) / media) * 100
+    
+    if percentual >= PERCENTUAL_ANOMALIA or score >= SCORES_ALERTA[0]:
+        return "critico"
+    elif percentual >= PERCENTUAL_DESCONTO or score >= SCORES_ALERTA[1]:
+        return "excelente"
+    elif percentual >= PERCENTUAL_BOM or score >= SCORES_ALERTA[2]:
+        return "bom"
+    return None
+
+# ==========================================
+# INDICE DE ALERTAS PERSONALIZADOS
+# ==========================================
+# rota_id -> [(preco_max, user_id), ...] ordenado por preco_max.
+# Um preco dispara exatamente o sufixo com preco_max >= preco.
+class IndiceAlertas:
+    def __init__(self):
+        self.por_rota = defaultdict(list)
+
+    def adicionar(self, user_id, rota_id, preco_max):
+        insort(self.por_rota[rota_id], (preco_max, user_id))
+
+    def reconstruir(self, alertas_por_usuario):
+        self.por_rota.clear()
+        for user_id, alertas in alertas_por_usuario.items():
+            for alerta in alertas:
+                self.por_rota[alerta['rota']].append((alerta['preco_max'], user_id))
+        for lista in self.por_rota.values():
+            lista.sort()
+
+    def disparados(self, rota_id, preco):
+        lista = self.por_rota.get(rota_id)
+        if not lista:
+            return []
+        return lista[bisect_left(lista, (preco, "")):]
+
+    def assinantes(self, rota_id):
+        return len(self.por_rota.get(rota_id, ()))
@@ -0,0 +1,308 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+
+import aiohttp
+
+import metricas
+from cache import CacheTTL
+from disjuntor import FECHADO, SEMI_ABERTO, Disjuntor
+from limitador import LimitadorTaxa
+from ofertas import decodificar_ofertas
+from provedores import Provedor, ProvedorHtml, buscar_com_hedge
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+AMADEUS_API_KEY = os.getenv("AMADEUS_API_KEY")
+AMADEUS_API_SECRET = os.getenv("AMADEUS_API_SECRET")
+AMADEUS_URL = os.getenv("AMADEUS_URL", "https://test.api.amadeus.com")
+
+# Cota do ambiente de teste: 10 req/s e no maximo 1 req a cada 100ms
+AMADEUS_REQ_POR_SEGUNDO = float(os.getenv("AMADEUS_REQ_POR_SEGUNDO", "10"))
+AMADEUS_RAJADA = int(os.getenv("AMADEUS_RAJADA", "1"))
+MAX_BUSCAS_SIMULTANEAS = int(os.getenv("MAX_BUSCAS_SIMULTANEAS", "5"))
+MAX_TENTATIVAS_429 = 3
+
+# Calendario de tarifas: datas de partida (dias a partir de hoje) consultadas por rota
+# e, opcionalmente, duracoes de estadia para ida e volta (ex: "7,14")
+DIAS_PARTIDA = [int(d) for d in os.getenv("DIAS_PARTIDA", "30").split(",")]
+DIAS_ESTADIA = [int(d) for d in os.getenv("DIAS_ESTADIA", "").split(",") if d]
+OFERTAS_POR_BUSCA = int(os.getenv("OFERTAS_POR_BUSCA", "10"))
+ADULTOS = 1
+MOEDA = "BRL"
+CACHE_TTL_SEGUNDOS = int(os.getenv("CACHE_TTL_SEGUNDOS", "600"))
+# Fontes de tarifa em ordem de prioridade (as seguintes so entram no hedge)
+PROVEDORES = [p.strip() for p in os.getenv("PROVEDORES", "amadeus").split(",") if p.strip()]
+
+# Pool de conexoes HTTP (uma sessao para toda a vida do bot)
+HTTP_LIMITE_CONEXOES = int(os.getenv("HTTP_LIMITE_CONEXOES", "20"))
+HTTP_LIMITE_POR_HOST = int(os.getenv("HTTP_LIMITE_POR_HOST", "10"))
+HTTP_TTL_DNS = 300  # segundos
+HTTP_KEEPALIVE = 60  # segundos
+# Timeouts curtos: com a API fora, a chamada falha rapido em vez de segurar o ciclo
+HTTP_TIMEOUT_CONEXAO = float(os.getenv("HTTP_TIMEOUT_CONEXAO", "5"))
+HTTP_TIMEOUT_LEITURA = float(os.getenv("HTTP_TIMEOUT_LEITURA", "15"))
+HTTP_TIMEOUT_TOTAL = float(os.getenv("HTTP_TIMEOUT_TOTAL", "30"))
+
+AMADEUS_TOKEN = None
+AMADEUS_TOKEN_EXPIRY = None
+
+_sessao = None
+_token_lock = asyncio.Lock()
+cache_ofertas = CacheTTL(CACHE_TTL_SEGUNDOS)
+
+metricas.Medidor("cache_ofertas_acertos", "Consultas servidas pelo cache de ofertas", funcao=lambda: cache_ofertas.acertos)
+metricas.Medidor("cache_ofertas_falhas", "Consultas que foram a API", funcao=lambda: cache_ofertas.falhas)
+
+# Um disjuntor por endpoint: token fora do ar nao derruba o estado das buscas e vice-versa
+disjuntores = {"token": Disjuntor("token"), "flight-offers": Disjuntor("flight-offers")}
+# Modo coletor: as chamadas saem dos processos coletores, que mandam o estado
+# dos disjuntores deles junto com cada resultado (shard -> {endpoint: estado})
+disjuntores_coletores = {}
+
+def amadeus_indisponivel():
+    return any(d.aberto() for d in disjuntores.values())
+
+def api_indisponivel():
+    # So para o ciclo se nenhum provedor puder responder
+    return not any(p.disponivel() for p in provedores)
+
+def api_degradada():
+    estados = [d.estado for d in disjuntores.values()]
+    estados += [estado for remotos in disjuntores_coletores.values() for estado in remotos.values()]
+    return any(estado != FECHADO for estado in estados)
+
+def rotas_por_ciclo():
+    # Amadeus em teste (sonda) e nenhum outro provedor: so vale soltar uma rota
+    if api_degradada() and not any(p.disponivel() for p in provedores if not isinstance(p, ProvedorAmadeus)):
+        return 1
+    return None
+
+def registrar_status(disjuntor, status):
+    # 5xx conta como falha; 429 e demais 4xx mostram que a API esta respondendo
+    if status >= 500:
+        disjuntor.falha()
+    else:
+        disjuntor.sucesso()
+
+# ==========================================
+# SESSAO HTTP
+# ==========================================
+def obter_sessao():
+    global _sessao
+    if _sessao is None or _sessao.closed:
+        conector = aiohttp.TCPConnector(
+            limit=HTTP_LIMITE_CONEXOES,
+            limit_per_host=HTTP_LIMITE_POR_HOST,
+            ttl_dns_cache=HTTP_TTL_DNS,
+            keepalive_timeout=HTTP_KEEPALIVE,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=HTTP_TIMEOUT_TOTAL,
+            connect=HTTP_TIMEOUT_CONEXAO,
+            sock_read=HTTP_TIMEOUT_LEITURA,
+        )
+        _sessao = aiohttp.ClientSession(connector=conector, timeout=timeout)
+    return _sessao
+
+async def fechar_sessao():
+    global _sessao
+    if _sessao is not None and not _sessao.closed:
+        await _sessao.close()
+    _sessao = None
+
+# ==========================================
+# LIMITE DE TAXA
+# ==========================================
+limitador = LimitadorTaxa(AMADEUS_REQ_POR_SEGUNDO, AMADEUS_RAJADA)
+
+def tempo_retry_after(response, tentativa):
+    valor = response.headers.get("Retry-After")
+    if valor:
+        try:
+            return max(0.0, float(valor))
+        except ValueError:
+            pass
+    # Sem header (ou em formato de data): backoff exponencial com jitter
+    return 2 ** tentativa * random.uniform(0.5, 1)
+
+# ==========================================
+# AMADEUS API
+# ==========================================
+def token_valido():
+    return AMADEUS_TOKEN and AMADEUS_TOKEN_EXPIRY and datetime.now() < AMADEUS_TOKEN_EXPIRY
+
+async def obter_token_amadeus():
+    global AMADEUS_TOKEN, AMADEUS_TOKEN_EXPIRY
+    if token_valido():
+        return AMADEUS_TOKEN
+
+    # Single-flight: so o primeiro a chegar renova, os demais esperam e reaproveitam
+    async with _token_lock:
+        if token_valido():
+            return AMADEUS_TOKEN
+        disjuntor = disjuntores["token"]
+        if not disjuntor.permitir():
+            return None
+        sonda = disjuntor.estado == SEMI_ABERTO
+
+        url = f"{AMADEUS_URL}/v1/security/oauth2/token"
+        try:
+            with metricas.amadeus_latencia.cronometrar("token"):
+                async with obter_sessao().post(url,
+                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                    data={"grant_type": "client_credentials", "client_id": AMADEUS_API_KEY, "client_secret": AMADEUS_API_SECRET}
+                ) as response:
+                    metricas.amadeus_requisicoes.inc(1, "token", response.status)
+                    registrar_status(disjuntor, response.status)
+                    if response.status == 200:
+                        result = await response.json()
+                        AMADEUS_TOKEN = result['access_token']
+                        AMADEUS_TOKEN_EXPIRY = datetime.now() + timedelta(seconds=result['expires_in'] - 60)
+                        metricas.token_renovacoes.inc(1, "ok")
+                        return AMADEUS_TOKEN
+        except asyncio.CancelledError:
+            if sonda:
+                disjuntor.liberar()
+            raise
+        except Exception as e:
+            metricas.amadeus_requisicoes.inc(1, "token", "erro")
+            disjuntor.falha()
+            print(f"❌ Erro auth: {e}")
+    metricas.token_renovacoes.inc(1, "erro")
+    return None
+
+async def consultar_ofertas(origem, destino, data_partida, data_retorno=None, adultos=ADULTOS, moeda=MOEDA):
+    token = await obter_token_amadeus()
+    if not token:
+        return None
+
+    url = f"{AMADEUS_URL}/v2/shopping/flight-offers"
+    params = {"originLocationCode": origem, "destinationLocationCode": destino,
+              "departureDate": data_partida, "adults": adultos, "currencyCode": moeda, "max": OFERTAS_POR_BUSCA}
+    if data_retorno:
+        params["returnDate"] = data_retorno
+
+    disjuntor = disjuntores["flight-offers"]
+    for tentativa in range(MAX_TENTATIVAS_429 + 1):
+        if not disjuntor.permitir():
+            return None
+        sonda = disjuntor.estado == SEMI_ABERTO
+        try:
+            await limitador.adquirir()
+            with metricas.amadeus_latencia.cronometrar("flight-offers"):
+                async with obter_sessao().get(url, headers={"Authorization": f"Bearer {token}"}, params=params) as response:
+                    metricas.amadeus_requisicoes.inc(1, "flight-offers", response.status)
+                    registrar_status(disjuntor, response.status)
+                    if response.status == 429:
+                        espera = tempo_retry_after(response, tentativa)
+                        print(f"⏳ Limite Amadeus (429) em {origem}-{destino}: aguardando {espera:.1f}s")
+                        # A cota e global, entao pausa todas as buscas
+                        limitador.pausar(espera)
+                        continue
+                    if response.status == 200:
+                        return decodificar_ofertas(await response.read(), data_partida, data_retorno)
+                    return None
+        except asyncio.CancelledError:
+            if sonda:
+                disjuntor.liberar()
+            raise
+        except Exception as e:
+            metricas.amadeus_requisicoes.inc(1, "flight-offers", "erro")
+            disjuntor.falha()
+            print(f"❌ Erro busca: {e}")
+            return None
+    return None
+
+# ==========================================
+# PROVEDORES DE TARIFA
+# ==========================================
+class ProvedorAmadeus(Provedor):
+    nome = "amadeus"
+
+    def disponivel(self):
+        return not amadeus_indisponivel()
+
+    async def consultar(self, origem, destino, data_partida, data_retorno=None, adultos=ADULTOS, moeda=MOEDA):
+        return await consultar_ofertas(origem, destino, data_partida, data_retorno, adultos, moeda)
+
+FABRICAS_PROVEDORES = {
+    "amadeus": ProvedorAmadeus,
+    "html": lambda: ProvedorHtml(obter_sessao),
+}
+
+def montar_provedores(nomes=PROVEDORES):
+    montados = []
+    for nome in nomes:
+        if nome not in FABRICAS_PROVEDORES:
+            print(f"⚠️ Provedor desconhecido ignorado: {nome}")
+            continue
+        montados.append(FABRICAS_PROVEDORES[nome]())
+    return montados
+
+provedores = montar_provedores()
+
+def dias_ate_partida(oferta, hoje=None):
+    if not oferta.get('data_partida'):
+        return None
+    return (datetime.strptime(oferta['data_partida'], "%Y-%m-%d") - (hoje or datetime.now())).days + 1
+
+async def buscar_ofertas(origem, destino, data_partida, data_retorno=None, adultos=ADULTOS, moeda=MOEDA):
+    # Scans sobrepostos e consultas repetidas dentro do TTL reaproveitam a mesma resposta
+    chave = (origem, destino, data_partida, data_retorno, adultos, moeda)
+    return await cache_ofertas.obter_ou_buscar(
+        chave, lambda: buscar_com_hedge(provedores, origem, destino, data_partida, data_retorno, adultos, moeda))
+
+def datas_calendario(dias_partida=None, dias_estadia=None, hoje=None):
+    hoje = hoje or datetime.now()
+    if dias_estadia is None:
+        dias_estadia = DIAS_ESTADIA
+    datas = []
+    for dias in dias_partida or DIAS_PARTIDA:
+        partida = hoje + timedelta(days=dias)
+        if not dias_estadia:
+            datas.append((partida.strftime("%Y-%m-%d"), None))
+        for estadia in dias_estadia:
+            datas.append((partida.strftime("%Y-%m-%d"), (partida + timedelta(days=estadia)).strftime("%Y-%m-%d")))
+    return datas
+
+async def buscar_calendario(origem, destino, datas=None):
+    # Todas as datas da janela em paralelo; devolve todas as ofertas, da mais barata para a mais cara
+    datas = datas or datas_calendario()
+    resultados = await asyncio.gather(*(buscar_ofertas(origem, destino, partida, retorno) for partida, retorno in datas))
+    if all(r is None for r in resultados):
+        return None
+    ofertas = [oferta for r in resultados if r for oferta in r]
+    ofertas.sort(key=lambda o: o['preco'])
+    return ofertas
+
+def ofertas_em_cache(origem, destino, datas=None, adultos=ADULTOS, moeda=MOEDA):
+    # Todas as ofertas ja buscadas da rota (cada data da janela), sem chamar a API
+    ofertas = []
+    for partida, retorno in datas or datas_calendario():
+        ofertas.extend(cache_ofertas.obter((origem, destino, partida, retorno, adultos, moeda)) or ())
+    return ofertas
+
+async def buscar_melhor_oferta(origem, destino):
+    rota_id = f"{origem}-{destino}"
+    with metricas.busca_latencia.cronometrar(rota_id):
+        ofertas = await buscar_calendario(origem, destino)
+    if not ofertas:
+        metricas.busca_resultados.inc(1, rota_id, "sem_preco")
+        return None
+    metricas.busca_resultados.inc(1, rota_id, "ok")
+    return ofertas[0]
+
+async def buscar_precos(rotas, max_simultaneas=MAX_BUSCAS_SIMULTANEAS):
+    # Dispara todas as rotas em paralelo (limitado pelo semaforo e pelo token bucket)
+    # e entrega (rota, melhor oferta) na ordem em que as respostas chegam
+    semaforo = asyncio.Semaphore(max_simultaneas)
+
+    async def _buscar(rota):
+        async with semaforo:
+            return rota, await buscar_melhor_oferta(rota['origem'], rota['destino'])
+
+    for tarefa in asyncio.as_completed([_buscar(rota) for rota in rotas]):
+        yield await tarefa
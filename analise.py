@@ -0,0 +1,43 @@
+import numpy as np
+
+from estatisticas import PONTOS_TENDENCIA
+
+# ==========================================
+# ANALISE EM LOTE (NumPy)
+# ==========================================
+# Junta os snapshots de todas as rotas em arrays uma unica vez para filtrar e
+# ranquear todas de uma vez, sem loop por rota.
+class PainelRotas:
+    def __init__(self, rota_ids, snapshots):
+        n = len(rota_ids)
+        self.rota_ids = list(rota_ids)
+        self.pontos = np.zeros(n, dtype=np.int64)
+        self.ultimo = np.full(n, np.nan)
+        self.media = np.full(n, np.nan)
+        self.percentual = np.full(n, np.nan)
+        self.score = np.full(n, np.nan)
+        self.variacao = np.zeros(n)
+        self.tendencia = np.full(n, "ESTAVEL", dtype=object)
+
+        for i, rota_id in enumerate(self.rota_ids):
+            snapshot = snapshots.get(rota_id)
+            if snapshot is None or not snapshot.media:
+                continue
+            self.pontos[i] = snapshot.pontos
+            self.ultimo[i] = snapshot.preco
+            self.media[i] = snapshot.media
+            self.percentual[i] = snapshot.percentual
+            self.score[i] = snapshot.score
+            self.variacao[i] = snapshot.variacao
+            self.tendencia[i] = snapshot.tendencia
+
+    def validas(self, min_pontos=PONTOS_TENDENCIA):
+        return (self.pontos >= min_pontos) & (self.media > 0)
+
+def top_k(valores, k, mascara=None):
+    # Indices dos k maiores (ordenados), via argpartition: O(n) + O(k log k)
+    candidatos = np.flatnonzero(mascara) if mascara is not None else np.arange(len(valores))
+    if len(candidatos) > k:
+        parte = np.argpartition(-valores[candidatos], k - 1)[:k]
+        candidatos = candidatos[parte]
+    return candidatos[np.argsort(-valores[candidatos], kind='stable')]
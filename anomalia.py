@@ -0,0 +1,166 @@
+import math
+import os
+import random
+import time
+from collections import defaultdict
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Falsos positivos aceitos por tipo de alerta: fracao das leituras que so com
+# ruido (sem promocao nenhuma) ainda disparariam o alerta
+TAXAS_FALSO_POSITIVO = {"critico": 0.0001, "excelente": 0.0005, "bom": 0.002}
+# z-scores (desvios robustos abaixo do esperado) para cada tipo de alerta, medidos
+# com calibrar_limiares(TAXAS_FALSO_POSITIVO) (python backtest.py --calibrar-z)
+Z_CRITICO = float(os.getenv("Z_CRITICO", "4.4"))
+Z_EXCELENTE = float(os.getenv("Z_EXCELENTE", "3.8"))
+Z_BOM = float(os.getenv("Z_BOM", "3.2"))
+
+MIN_OBSERVACOES = 20  # aquecimento antes de emitir z
+ALFA_NIVEL = 0.05
+BETA_ESCALA = 0.05
+GAMA_SAZONAL = 0.1
+LIMITE_HUBER = 3.0  # residuos acima disso (em desvios) entram cortados
+ESCALA_MINIMA = 0.01  # ~1% em escala log, evita z enorme em preco constante
+FATOR_MAD = 1.2533  # desvio medio absoluto -> desvio padrao (normal)
+
+# Faixas de dias ate a partida
+FAIXAS_ANTECEDENCIA = (7, 14, 30, 60)
+
+def faixa_antecedencia(dias):
+    if dias is None:
+        return None
+    for i, limite in enumerate(FAIXAS_ANTECEDENCIA):
+        if dias < limite:
+            return i
+    return len(FAIXAS_ANTECEDENCIA)
+
+# ==========================================
+# DETECTOR POR ROTA
+# ==========================================
+# Nivel (EWMA) e escala (desvio absoluto medio, EWMA) em log-preco, com
+# sazonalidade aditiva por dia da semana e por antecedencia. Residuos sao
+# cortados (Huber) antes de atualizar, entao um outlier isolado nao
+# contamina o nivel. Estado fixo por rota; O(1) por observacao.
+class DetectorAnomalia:
+    __slots__ = ('n', 'nivel', 'escala', 'semana', 'antecedencia', 'vistas', 'ultimo_ts')
+
+    def __init__(self):
+        self.ultimo_ts = None  # ts da ultima leitura incorporada
+        self.n = 0
+        self.nivel = 0.0
+        self.escala = 0.0
+        self.semana = [0.0] * 7
+        self.antecedencia = [0.0] * (len(FAIXAS_ANTECEDENCIA) + 1)
+        self.vistas = [False] * (len(FAIXAS_ANTECEDENCIA) + 1)  # faixas que ja tiveram preco
+
+    def _esperado(self, dia_semana, faixa):
+        esperado = self.nivel + self.semana[dia_semana]
+        if faixa is not None:
+            esperado += self.antecedencia[faixa]
+        return esperado
+
+    def desvio(self):
+        return max(self.escala * FATOR_MAD, ESCALA_MINIMA)
+
+    def observar(self, preco, ts, dias_partida=None):
+        # Devolve o z do preco novo (calculado antes de incorpora-lo) e atualiza o estado
+        x = math.log(preco)
+        dia_semana = time.localtime(ts).tm_wday
+        faixa = faixa_antecedencia(dias_partida)
+        self.n += 1
+        self.ultimo_ts = ts
+
+        if self.n <= MIN_OBSERVACOES:
+            # Aquecimento: media e desvio absoluto simples
+            self.nivel += (x - self.nivel) / self.n
+            self.escala += (abs(x - self.nivel) - self.escala) / self.n
+            return None
+
+        residuo = x - self._esperado(dia_semana, faixa)
+        desvio = self.desvio()
+        z = residuo / desvio
+        cortado = max(-LIMITE_HUBER * desvio, min(LIMITE_HUBER * desvio, residuo))
+
+        self.nivel += ALFA_NIVEL * cortado
+        self.escala += BETA_ESCALA * (abs(cortado) - self.escala)
+        self.semana[dia_semana] += GAMA_SAZONAL * cortado
+        if faixa is not None:
+            self.antecedencia[faixa] += GAMA_SAZONAL * cortado
+            self.vistas[faixa] = True
+
+        # Sazonalidades com media zero (a da antecedencia so entre as faixas ja
+        # vistas). A parte comum e descartada, nao repassada ao nivel, que ja levou
+        # ALFA_NIVEL do residuo: assim o nivel anda ALFA_NIVEL por leitura, e com uma
+        # faixa de antecedencia so ela fica em zero em vez de disputar o nivel
+        media_semana = sum(self.semana) / 7
+        self.semana = [s - media_semana for s in self.semana]
+        vistas = [i for i, vista in enumerate(self.vistas) if vista]
+        if vistas:
+            media_faixas = sum(self.antecedencia[i] for i in vistas) / len(vistas)
+            for i in vistas:
+                self.antecedencia[i] -= media_faixas
+        return z
+
+    def estado(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    @classmethod
+    def restaurar(cls, estado):
+        detector = cls()
+        for campo, valor in estado.items():
+            setattr(detector, campo, valor)
+        return detector
+
+detectores = defaultdict(DetectorAnomalia)
+alterados = set()  # rotas com estado novo ainda nao gravado
+
+def observar_preco(rota_id, preco, ts, dias_partida=None):
+    alterados.add(rota_id)
+    return detectores[rota_id].observar(preco, ts, dias_partida)
+
+def retirar_estados():
+    # {rota_id: estado} das rotas que mudaram desde a ultima gravacao
+    estados = {rota_id: detectores[rota_id].estado() for rota_id in alterados}
+    alterados.clear()
+    return estados
+
+def reconstruir_detectores(recentes, estados=None):
+    # estados: {rota_id: estado} gravados; recentes: linhas (rota_id, ts, preco,
+    # dias_partida) em ordem de ts. Cada rota parte do estado gravado e so
+    # reaplica as leituras depois dele, entao chega no mesmo estado do detector
+    # ao vivo por mais antigo que seja o historico. Rota sem estado gravado
+    # (banco de antes disso) e reconstruida so com a janela recente.
+    detectores.clear()
+    alterados.clear()
+    for rota_id, estado in (estados or {}).items():
+        detectores[rota_id] = DetectorAnomalia.restaurar(estado)
+    for rota_id, ts, preco, dias_partida in recentes:
+        detector = detectores[rota_id]
+        if detector.ultimo_ts is None or ts > detector.ultimo_ts:
+            detector.observar(preco, ts, dias_partida)
+            alterados.add(rota_id)
+
+def calibrar_limiares(taxas=TAXAS_FALSO_POSITIVO, ruido=0.03, pontos=400_000, rotas=20, dias_partida=30, semente=42):
+    # Mede a distribuicao de z de detectores alimentados so com ruido gaussiano
+    # relativo (leituras de hora em hora) e devolve, por tipo, o limiar que
+    # deixa passar a fracao pedida de falsos positivos
+    aleatorio = random.Random(semente)
+    zs = []
+    for _ in range(rotas):
+        detector = DetectorAnomalia()
+        for i in range(pontos // rotas):
+            z = detector.observar(1000 * (1 + aleatorio.gauss(0, ruido)), i * 3600, dias_partida)
+            if z is not None:
+                zs.append(z)
+    zs.sort()
+    return {tipo: round(-zs[int(taxa * len(zs))], 1) for tipo, taxa in taxas.items()}
+
+def classificar_z(z):
+    if z <= -Z_CRITICO:
+        return "critico"
+    elif z <= -Z_EXCELENTE:
+        return "excelente"
+    elif z <= -Z_BOM:
+        return "bom"
+    return None
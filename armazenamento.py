@@ -0,0 +1,210 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+# ==========================================
+# ARMAZENAMENTO (SQLite em modo WAL)
+# ==========================================
+# Cada checagem vira uma linha nova em `precos`; nada e reescrito.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS precos (
+    rota_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    preco REAL NOT NULL,
+    dias_partida INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_precos_rota_ts ON precos (rota_id, ts);
+
+CREATE TABLE IF NOT EXISTS detectores (
+    rota_id TEXT PRIMARY KEY,
+    estado TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS alertas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    rota TEXT NOT NULL,
+    preco_max REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alertas_rota ON alertas (rota);
+
+-- Arquivos JSON antigos ja importados (gravado na mesma transacao da importacao)
+CREATE TABLE IF NOT EXISTS migracoes (
+    arquivo TEXT PRIMARY KEY,
+    migrado_em INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS servidores (
+    guild_id INTEGER PRIMARY KEY,
+    canal_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS inscricoes (
+    guild_id INTEGER NOT NULL,
+    rota_id TEXT NOT NULL,
+    origem TEXT NOT NULL,
+    destino TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    PRIMARY KEY (guild_id, rota_id)
+);
+"""
+
+def para_timestamp(data_iso):
+    return int(datetime.fromisoformat(data_iso).timestamp())
+
+class ArmazemPrecos:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        # O bot usa a conexao so a partir da thread do gravador, mas ela pode ser aberta em outra
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Com WAL, NORMAL ainda garante que um commit nunca fica pela metade
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(ESQUEMA)
+        if "dias_partida" not in {coluna[1] for coluna in self.conn.execute("PRAGMA table_info(precos)")}:
+            # Bancos antigos: a antecedencia (usada pelo detector de anomalia) entrou depois
+            self.conn.execute("ALTER TABLE precos ADD COLUMN dias_partida INTEGER")
+
+    def fechar(self):
+        self.conn.close()
+
+    # ---------- precos ----------
+    def adicionar_precos(self, observacoes):
+        # observacoes: lista de (rota_id, ts, preco, dias_partida), gravada numa unica transacao
+        with self.conn:
+            self.conn.executemany("INSERT INTO precos (rota_id, ts, preco, dias_partida) VALUES (?, ?, ?, ?)", observacoes)
+
+    def carregar_recentes(self, desde):
+        return self.conn.execute(
+            "SELECT rota_id, ts, preco, dias_partida FROM precos WHERE ts >= ? ORDER BY ts", (desde,)
+        ).fetchall()
+
+    def carregar_historico(self):
+        # Tudo, agrupado por rota e em ordem de ts (usa o indice rota_id, ts)
+        return self.conn.execute("SELECT rota_id, ts, preco, dias_partida FROM precos ORDER BY rota_id, ts").fetchall()
+
+    def iterar_precos(self, rota_id=None, inicio=None, fim=None):
+        # Cursor (sem carregar tudo na memoria), em ordem de rota e ts
+        sql = "SELECT rota_id, ts, preco FROM precos WHERE 1 = 1"
+        params = []
+        if rota_id is not None:
+            sql += " AND rota_id = ?"
+            params.append(rota_id)
+        if inicio is not None:
+            sql += " AND ts >= ?"
+            params.append(inicio)
+        if fim is not None:
+            sql += " AND ts < ?"
+            params.append(fim)
+        return self.conn.execute(sql + " ORDER BY rota_id, ts", params)
+
+    def ultimos_por_rota(self):
+        # rota_id -> (ts, preco) da checagem mais recente (o SQLite devolve a linha do MAX)
+        return {rota_id: (ts, preco) for rota_id, ts, preco in self.conn.execute(
+            "SELECT rota_id, MAX(ts), preco FROM precos GROUP BY rota_id")}
+
+    def carregar_agregados(self, segundos, desde, ate):
+        # Baldes (rota_id, inicio, n, minimo, soma, maximo) calculados pelo proprio SQLite
+        return self.conn.execute(
+            """SELECT rota_id, (ts / ?) * ? AS inicio, COUNT(*), MIN(preco), SUM(preco), MAX(preco)
+               FROM precos WHERE ts >= ? AND ts < ?
+               GROUP BY rota_id, inicio ORDER BY rota_id, inicio""",
+            (segundos, segundos, desde, ate)
+        ).fetchall()
+
+    def totais_por_rota(self):
+        # (n, soma, soma dos quadrados, minimo, maximo) de todo o historico de cada rota
+        return {
+            rota_id: totais for rota_id, *totais in self.conn.execute(
+                "SELECT rota_id, COUNT(*), SUM(preco), SUM(preco * preco), MIN(preco), MAX(preco) FROM precos GROUP BY rota_id"
+            )
+        }
+
+    # ---------- detectores de anomalia ----------
+    def salvar_detectores(self, estados):
+        # estados: {rota_id: dict}, gravados numa unica transacao
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO detectores (rota_id, estado) VALUES (?, ?)",
+                                  [(rota_id, json.dumps(estado)) for rota_id, estado in estados.items()])
+
+    def carregar_detectores(self):
+        return {rota_id: json.loads(estado) for rota_id, estado in self.conn.execute("SELECT rota_id, estado FROM detectores")}
+
+    # ---------- alertas ----------
+    def adicionar_alerta(self, user_id, rota, preco_max):
+        with self.conn:
+            self.conn.execute("INSERT INTO alertas (user_id, rota, preco_max) VALUES (?, ?, ?)", (user_id, rota, preco_max))
+
+    def carregar_alertas(self):
+        alertas = {}
+        for user_id, rota, preco_max in self.conn.execute("SELECT user_id, rota, preco_max FROM alertas ORDER BY id"):
+            alertas.setdefault(user_id, []).append({'rota': rota, 'preco_max': preco_max})
+        return alertas
+
+    # ---------- servidores ----------
+    def definir_canal(self, guild_id, canal_id):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO servidores (guild_id, canal_id) VALUES (?, ?) ON CONFLICT (guild_id) DO UPDATE SET canal_id = excluded.canal_id",
+                (guild_id, canal_id)
+            )
+
+    def inscrever(self, guild_id, rotas):
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO servidores (guild_id) VALUES (?)", (guild_id,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO inscricoes (guild_id, rota_id, origem, destino, nome) VALUES (?, ?, ?, ?, ?)",
+                [(guild_id, f"{r['origem']}-{r['destino']}", r['origem'], r['destino'], r['nome']) for r in rotas]
+            )
+
+    def cancelar_inscricao(self, guild_id, rota_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM inscricoes WHERE guild_id = ? AND rota_id = ?", (guild_id, rota_id))
+
+    def remover_servidor(self, guild_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM inscricoes WHERE guild_id = ?", (guild_id,))
+            self.conn.execute("DELETE FROM servidores WHERE guild_id = ?", (guild_id,))
+
+    def carregar_servidores(self):
+        canais = dict(self.conn.execute("SELECT guild_id, canal_id FROM servidores"))
+        inscricoes = [
+            (guild_id, {'origem': origem, 'destino': destino, 'nome': nome})
+            for guild_id, origem, destino, nome in self.conn.execute(
+                "SELECT guild_id, origem, destino, nome FROM inscricoes ORDER BY rowid")
+        ]
+        return canais, inscricoes
+
+    # ---------- migracao ----------
+    def migrar_json(self, arquivo_precos, arquivo_alertas):
+        # Importa os JSON antigos uma unica vez e renomeia para *.migrado
+        migrou = False
+        if os.path.exists(arquivo_precos):
+            with open(arquivo_precos, 'r') as f:
+                data = json.load(f)
+            linhas = [(rota_id, para_timestamp(p['data']), p['preco'], None) for rota_id, hist in data.items() for p in hist]
+            if self._importar(arquivo_precos, "INSERT INTO precos (rota_id, ts, preco, dias_partida) VALUES (?, ?, ?, ?)", linhas):
+                print(f"📦 Migrados {len(linhas)} precos de {arquivo_precos}")
+            os.replace(arquivo_precos, arquivo_precos + ".migrado")
+            migrou = True
+        if os.path.exists(arquivo_alertas):
+            with open(arquivo_alertas, 'r') as f:
+                data = json.load(f)
+            linhas = [(user_id, a['rota'], a['preco_max']) for user_id, alertas in data.items() for a in alertas]
+            if self._importar(arquivo_alertas, "INSERT INTO alertas (user_id, rota, preco_max) VALUES (?, ?, ?)", linhas):
+                print(f"📦 Migrados {len(linhas)} alertas de {arquivo_alertas}")
+            os.replace(arquivo_alertas, arquivo_alertas + ".migrado")
+            migrou = True
+        return migrou
+
+    def _importar(self, arquivo, sql, linhas):
+        # Linhas e marcador na mesma transacao: se o processo cair antes de
+        # renomear o JSON, a proxima inicializacao so renomeia, sem duplicar
+        nome = os.path.basename(arquivo)
+        with self.conn:
+            if self.conn.execute("SELECT 1 FROM migracoes WHERE arquivo = ?", (nome,)).fetchone():
+                return False
+            self.conn.executemany(sql, linhas)
+            self.conn.execute("INSERT INTO migracoes (arquivo, migrado_em) VALUES (?, ?)", (nome, int(datetime.now().timestamp())))
+        return True
@@ -0,0 +1,471 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from agendador import INTERVALO_BASE, INTERVALO_MIN_HORAS, MODOS_ROTA
+from alertas import PERCENTUAL_ANOMALIA, PERCENTUAL_BOM, PERCENTUAL_DESCONTO, SCORES_ALERTA
+from analise import top_k
+from anomalia import TAXAS_FALSO_POSITIVO, Z_BOM, Z_CRITICO, Z_EXCELENTE, DetectorAnomalia, calibrar_limiares
+from armazenamento import ArmazemPrecos
+
+# Uso: python backtest.py --db precos.db [--varrer --processos 4] [--saida resultado.json]
+#      python backtest.py --calibrar-z [--ruido 0.03]
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Os mesmos valores que o bot usa (alertas.py, anomalia.py, agendador.py)
+PARAMETROS_ATUAIS = {
+    "anomalia": PERCENTUAL_ANOMALIA,
+    "desconto": PERCENTUAL_DESCONTO,
+    "bom": PERCENTUAL_BOM,
+    "scores": SCORES_ALERTA,  # critico, excelente, bom
+}
+Z_ATUAIS = (Z_CRITICO, Z_EXCELENTE, Z_BOM)
+# O cacador (varias rotas em queda ao mesmo tempo) depende das outras rotas e
+# nao entra na simulacao ponto a ponto: ali cada queda de ATIVO fica em ATIVO
+GATILHOS_ATUAIS = {nome.lower(): minimo for nome, minimo, _ in MODOS_ROTA}
+
+# Um alerta "acertou" se nenhum preco nos proximos HORIZONTE_DIAS ficou mais
+# de TOLERANCIA abaixo dele
+HORIZONTE_DIAS = 14
+TOLERANCIA = 0.02
+
+# Grade da varredura
+GRADE_ALERTAS = {
+    "anomalia": range(30, 72, 2),
+    "desconto": range(15, 57, 2),
+    "bom": range(5, 41),
+    "scores": [(9, 8, 7), (9.5, 8.5, 7.5), (10, 9, 8), (10, 9.5, 9), (9, 9, 9), (11, 11, 11)],  # 11 = so percentual
+}
+GRADE_INTERVALOS = {
+    "ultra": range(20, 61),
+    "ativo": range(10, 51),
+}
+# Limiar de z do alerta mais fraco (bom), depois do aquecimento do detector
+GRADE_Z = [round(2 + 0.1 * i, 1) for i in range(41)]
+
+# ==========================================
+# CARGA
+# ==========================================
+def carregar(caminho):
+    armazem = ArmazemPrecos(caminho)
+    try:
+        linhas = armazem.carregar_historico()
+        assinantes = Counter(a['rota'] for lista in armazem.carregar_alertas().values() for a in lista)
+    finally:
+        armazem.fechar()
+    return linhas, assinantes
+
+def montar_arrays(linhas, assinantes=None):
+    # linhas: (rota_id, ts, preco[, dias_partida]) agrupadas por rota e em ordem de ts
+    assinantes = assinantes or {}
+    rota_ids = [linha[0] for linha in linhas]
+    ts = np.fromiter((linha[1] for linha in linhas), dtype=np.int64, count=len(linhas))
+    precos = np.fromiter((linha[2] for linha in linhas), dtype=np.float64, count=len(linhas))
+    dias = np.fromiter((linha[3] if len(linha) > 3 and linha[3] is not None else np.nan for linha in linhas),
+                       dtype=np.float64, count=len(linhas))
+    novo = np.ones(len(linhas), dtype=bool)
+    novo[1:] = [a != b for a, b in zip(rota_ids[1:], rota_ids[:-1])]
+    inicios = np.flatnonzero(novo)
+    grupo = np.cumsum(novo) - 1
+    nomes = [rota_ids[i] for i in inicios]
+    return {
+        "rotas": nomes,
+        "grupo": grupo,
+        "inicios": inicios,
+        "ts": ts,
+        "precos": precos,
+        "dias": dias,
+        "assinantes": np.array([assinantes.get(r, 0) for r in nomes], dtype=np.float64)[grupo],
+    }
+
+# ==========================================
+# ESTATISTICAS EM JANELA EXPANSIVA (todas as rotas de uma vez)
+# ==========================================
+def _soma_acumulada(valores, grupo, inicios):
+    # cumsum que recomeca a cada rota: no inicio de cada rota desconta a soma da
+    # anterior, assim o erro de arredondamento nao se acumula entre rotas
+    ajustados = valores.copy()
+    ajustados[inicios[1:]] -= np.add.reduceat(valores, inicios)[:-1]
+    return np.cumsum(ajustados)
+
+def _maximo_acumulado(valores, grupo):
+    # Sobre o posto (inteiro) de cada valor, deslocar cada rota acima de todas as
+    # anteriores faz um unico accumulate respeitar as rotas, sem arredondamento
+    distintos, posto = np.unique(valores, return_inverse=True)
+    deslocamento = grupo.astype(np.int64) * len(distintos)
+    return distintos[np.maximum.accumulate(posto + deslocamento) - deslocamento]
+
+def estatisticas_expansivas(dados):
+    # Mesma visao do bot a cada preco: media/desvio/min/max de tudo ate ele (inclusive)
+    grupo, inicios, precos = dados["grupo"], dados["inicios"], dados["precos"]
+    n = np.arange(len(precos)) - inicios[grupo] + 1
+    centrados = precos - precos[inicios][grupo]  # evita cancelamento na variancia
+    soma = _soma_acumulada(centrados, grupo, inicios)
+    soma_q = _soma_acumulada(centrados * centrados, grupo, inicios)
+    media_c = soma / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        desvio = np.sqrt(np.maximum(soma_q - n * media_c * media_c, 0) / (n - 1))
+    media = media_c + precos[inicios][grupo]
+    maximo = _maximo_acumulado(precos, grupo)
+    minimo = -_maximo_acumulado(-precos, grupo)
+
+    valido = n >= 2
+    amplitude = maximo - minimo
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentual = np.where(valido, (media - precos) / media * 100, -np.inf)
+        score = np.where(amplitude > 0, np.clip(10 - (precos - minimo) / amplitude * 10, 0, 10), 5.0)
+        volatilidade = np.where(valido, desvio / media, 0.0)
+    return {"percentual": percentual, "score": np.where(valido, score, -np.inf), "volatilidade": volatilidade}
+
+def minimo_futuro(dados, horizonte):
+    # Menor preco em (i, i + horizonte] da mesma rota; NaN se nao ha preco depois.
+    # Consulta de minimo em intervalo por sparse table, nivel a nivel (memoria O(n)).
+    grupo, ts, precos = dados["grupo"], dados["ts"], dados["precos"]
+    chave = grupo.astype(np.int64) << 34 | ts
+    inicio = np.arange(1, len(precos) + 1)
+    fim = np.searchsorted(chave, chave + int(horizonte), side='right')
+    tamanho = fim - inicio
+    resultado = np.full(len(precos), np.nan)
+    com_futuro = tamanho > 0
+    nivel_de = np.zeros(len(precos), dtype=np.int64)
+    nivel_de[com_futuro] = np.floor(np.log2(tamanho[com_futuro])).astype(np.int64)
+
+    tabela = precos
+    for nivel in range(int(nivel_de.max(initial=0)) + 1):
+        passo = 1 << nivel
+        i = np.flatnonzero(com_futuro & (nivel_de == nivel))
+        resultado[i] = np.minimum(tabela[inicio[i]], tabela[fim[i] - passo])
+        if len(tabela) > passo:
+            tabela = np.concatenate([np.minimum(tabela[:-passo], tabela[passo:]), tabela[-passo:]])
+    return resultado
+
+def zscores(dados):
+    # z de cada preco como o detector do bot calcularia (NaN no aquecimento). O
+    # detector e sequencial por natureza: roda em Python, rota a rota
+    z = np.full(len(dados["precos"]), np.nan)
+    fins = np.append(dados["inicios"][1:], len(z))
+    ts, precos, dias = dados["ts"].tolist(), dados["precos"].tolist(), dados["dias"].tolist()
+    for a, b in zip(dados["inicios"].tolist(), fins.tolist()):
+        detector = DetectorAnomalia()
+        for i in range(a, b):
+            valor = detector.observar(precos[i], ts[i], None if dias[i] != dias[i] else int(dias[i]))
+            if valor is not None:
+                z[i] = valor
+    return z
+
+def preparar(dados, horizonte_dias=HORIZONTE_DIAS, tolerancia=TOLERANCIA, chamadas_por_rota=1):
+    # Tudo que nao depende dos limiares e calculado uma vez
+    stats = estatisticas_expansivas(dados)
+    futuro = minimo_futuro(dados, horizonte_dias * 86400)
+    grupo, ts = dados["grupo"], dados["ts"]
+    # Horas ate o proximo preco da mesma rota (peso de cada intervalo na conta de chamadas)
+    horas = np.zeros(len(ts))
+    mesma_rota = grupo[1:] == grupo[:-1]
+    horas[:-1] = np.where(mesma_rota, (ts[1:] - ts[:-1]) / 3600, 0)
+    return {
+        "percentual": stats["percentual"],
+        "score": stats["score"],
+        "z": zscores(dados),
+        "volatilidade": stats["volatilidade"],
+        "assinantes": dados["assinantes"],
+        "avaliavel": ~np.isnan(futuro),
+        "acerto": dados["precos"] <= np.nan_to_num(futuro, nan=np.inf) * (1 + tolerancia),
+        "horas": horas,
+        "chamadas_por_rota": chamadas_por_rota,
+    }
+
+# ==========================================
+# REGRAS VETORIZADAS
+# ==========================================
+def classificar(prep, anomalia, desconto, bom, scores, limites_z=Z_ATUAIS):
+    # Mesma ordem de determinar_tipo_alerta: regras por percentual/score so no
+    # aquecimento do detector, depois classificar_z
+    percentual, score, z = prep["percentual"], prep["score"], prep["z"]
+    regras = np.isnan(z)
+    e_critico = np.where(regras, (percentual >= anomalia) | (score >= scores[0]), z <= -limites_z[0])
+    e_excelente = ~e_critico & np.where(regras, (percentual >= desconto) | (score >= scores[1]), z <= -limites_z[1])
+    e_bom = ~e_critico & ~e_excelente & np.where(regras, (percentual >= bom) | (score >= scores[2]), z <= -limites_z[2])
+    return e_critico, e_excelente, e_bom
+
+def avaliar_alertas(prep, parametros):
+    critico, excelente, bom = classificar(prep, **parametros)
+    alerta = critico | excelente | bom
+    avaliados = int(np.count_nonzero(alerta & prep["avaliavel"]))
+    acertos = int(np.count_nonzero(alerta & prep["avaliavel"] & prep["acerto"]))
+    return {
+        **parametros,
+        "alertas": int(np.count_nonzero(alerta)),
+        "alertas_critico": int(np.count_nonzero(critico)),
+        "alertas_excelente": int(np.count_nonzero(excelente)),
+        "alertas_bom": int(np.count_nonzero(bom)),
+        "alertas_por_z": int(np.count_nonzero(alerta & ~np.isnan(prep["z"]))),
+        "acertos": acertos,
+        "taxa_acerto": acertos / avaliados if avaliados else None,
+    }
+
+def intervalos(prep, gatilhos, intervalo_base=INTERVALO_BASE):
+    # Mesma regra de intervalo_rota: o primeiro modo (na ordem de MODOS_ROTA) cujo gatilho bate
+    horas = np.full(len(prep["percentual"]), float(intervalo_base))
+    for nome, _, intervalo in reversed(MODOS_ROTA):
+        horas = np.where(prep["percentual"] >= gatilhos[nome.lower()], intervalo, horas)
+    horas = horas / (1 + 5 * prep["volatilidade"])
+    horas = horas / (1 + np.log1p(prep["assinantes"]) / 2)
+    return np.maximum(INTERVALO_MIN_HORAS, horas)
+
+def avaliar_intervalos(prep, gatilhos, intervalo_base=INTERVALO_BASE):
+    # Cada trecho entre dois precos e checado a cada `horas` pela politica dinamica
+    chamadas = float(np.sum(prep["horas"] / intervalos(prep, gatilhos, intervalo_base))) * prep["chamadas_por_rota"]
+    fixo = float(np.sum(prep["horas"]) / intervalo_base) * prep["chamadas_por_rota"]
+    return {**gatilhos, "chamadas_api": round(chamadas), "chamadas_intervalo_fixo": round(fixo)}
+
+# ==========================================
+# VARREDURA
+# ==========================================
+# Cada combinacao de limiares so muda em que faixa de percentual/score cada
+# ponto cai. O preparo conta pontos, acertos e chamadas por faixa (tabelas
+# pequenas); cada combinacao sai depois de somas acumuladas dessas tabelas,
+# sem voltar aos pontos, e a grade inteira e avaliada de uma vez. O preparo
+# e dividido por rotas entre processos e as tabelas parciais sao somadas.
+# As regras de percentual/score so contam no aquecimento do detector; depois
+# dele o ponto cai numa faixa de z, varrida a parte (GRADE_Z).
+def faixas_da_grade(grade_alertas=GRADE_ALERTAS, grade_intervalos=GRADE_INTERVALOS):
+    percentuais = {*grade_alertas["anomalia"], *grade_alertas["desconto"], *grade_alertas["bom"]}
+    percentuais |= {PARAMETROS_ATUAIS["anomalia"], PARAMETROS_ATUAIS["desconto"], PARAMETROS_ATUAIS["bom"]}
+    scores = {s for trio in [*grade_alertas["scores"], PARAMETROS_ATUAIS["scores"]] for s in trio}
+    gatilhos = {g for valores in grade_intervalos.values() for g in valores} | set(GATILHOS_ATUAIS.values())
+    return {
+        "percentual": np.array(sorted(percentuais), dtype=float),
+        "score": np.array(sorted(scores), dtype=float),
+        "gatilho": np.array(sorted(gatilhos), dtype=float),
+        "z": np.array(sorted({*GRADE_Z, *Z_ATUAIS}), dtype=float),
+    }
+
+def fatiar(dados, partes):
+    # Fatias contiguas com rotas inteiras
+    inicios = dados["inicios"]
+    fins = np.append(inicios[1:], len(dados["precos"]))
+    for rotas in np.array_split(np.arange(len(inicios)), partes):
+        if not len(rotas):
+            continue
+        a, b = inicios[rotas[0]], fins[rotas[-1]]
+        yield {
+            "rotas": [dados["rotas"][r] for r in rotas],
+            "grupo": dados["grupo"][a:b] - rotas[0],
+            "inicios": inicios[rotas] - a,
+            "ts": dados["ts"][a:b],
+            "precos": dados["precos"][a:b],
+            "dias": dados["dias"][a:b],
+            "assinantes": dados["assinantes"][a:b],
+        }
+
+def tabelas(dados, faixas, horizonte_dias=HORIZONTE_DIAS, tolerancia=TOLERANCIA, chamadas_por_rota=1):
+    prep = preparar(dados, horizonte_dias, tolerancia, chamadas_por_rota)
+    # Faixa k de um ponto = quantos limiares ele atinge (percentual >= limite[j] para j < k)
+    fp = np.searchsorted(faixas["percentual"], prep["percentual"], side='right')
+    fs = np.searchsorted(faixas["score"], prep["score"], side='right')
+    forma = (len(faixas["percentual"]) + 1, len(faixas["score"]) + 1)
+    aquecimento = np.isnan(prep["z"])
+    celula = (fp * forma[1] + fs)[aquecimento]
+
+    def contar(pesos=None):
+        pesos = None if pesos is None else pesos[aquecimento]
+        return np.bincount(celula, pesos, minlength=forma[0] * forma[1]).reshape(forma)
+
+    # Depois do aquecimento: faixa de -z (quantos limiares de z o ponto atinge)
+    fz = np.searchsorted(faixas["z"], -prep["z"][~aquecimento], side='right')
+
+    def contar_z(pesos=None):
+        pesos = None if pesos is None else pesos[~aquecimento]
+        return np.bincount(fz, pesos, minlength=len(faixas["z"]) + 1)
+
+    # Chamadas de cada trecho se o ponto estivesse em cada modo (NORMAL + MODOS_ROTA)
+    fg = np.searchsorted(faixas["gatilho"], prep["percentual"], side='right')
+    fator = (1 + 5 * prep["volatilidade"]) * (1 + np.log1p(prep["assinantes"]) / 2)
+    chamadas_modo = [
+        np.bincount(fg, prep["horas"] / np.maximum(INTERVALO_MIN_HORAS, horas / fator), minlength=len(faixas["gatilho"]) + 1)
+        for horas in (INTERVALO_BASE, *(intervalo for _, _, intervalo in MODOS_ROTA))
+    ]
+    avaliavel = prep["avaliavel"]
+    return {
+        "pontos": contar(),
+        "avaliados": contar(avaliavel.astype(float)),
+        "acertos": contar((avaliavel & prep["acerto"]).astype(float)),
+        "z_pontos": contar_z(),
+        "z_avaliados": contar_z(avaliavel.astype(float)),
+        "z_acertos": contar_z((avaliavel & prep["acerto"]).astype(float)),
+        "chamadas_modo": np.array(chamadas_modo) * chamadas_por_rota,
+        "chamadas_fixo": float(prep["horas"].sum()) / INTERVALO_BASE * chamadas_por_rota,
+    }
+
+def preparar_tabelas(dados, faixas, horizonte_dias, tolerancia, chamadas_por_rota, processos=1):
+    argumentos = dict(faixas=faixas, horizonte_dias=horizonte_dias, tolerancia=tolerancia, chamadas_por_rota=chamadas_por_rota)
+    if processos <= 1 or len(dados["rotas"]) < 2:
+        return tabelas(dados, **argumentos)
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processos, mp_context=contexto) as pool:
+        partes = list(pool.map(partial(tabelas, **argumentos), fatiar(dados, processos)))
+    return {chave: sum(parte[chave] for parte in partes) for chave in partes[0]}
+
+def varrer_alertas(tab, faixas, grade=GRADE_ALERTAS):
+    combos = np.array([(a, d, b, *scores) for a, d, b, scores in
+                       itertools.product(grade["anomalia"], grade["desconto"], grade["bom"], grade["scores"])], dtype=float)
+    a, d, b, sa, se, sb = combos.T
+    P, S = faixas["percentual"], faixas["score"]
+
+    def uniao(nome, limite_p, limite_s):
+        # Pontos com percentual >= limite_p OU score >= limite_s: total menos os que nao atingem nenhum
+        falham = tab[nome].cumsum(0).cumsum(1)
+        return tab[nome].sum() - falham[np.searchsorted(P, limite_p), np.searchsorted(S, limite_s)]
+
+    # critico | excelente | bom encadeados: cada nivel inclui os limiares dos anteriores
+    # Depois do aquecimento vale o z com os limiares atuais: igual em toda combinacao
+    criticos = uniao("pontos", a, sa) + acima_z(tab, "z_pontos", faixas, Z_CRITICO)
+    ate_excelente = uniao("pontos", np.minimum(a, d), np.minimum(sa, se)) + acima_z(tab, "z_pontos", faixas, Z_EXCELENTE)
+    limite_p, limite_s = np.minimum.reduce([a, d, b]), np.minimum.reduce([sa, se, sb])
+    alertas = uniao("pontos", limite_p, limite_s) + acima_z(tab, "z_pontos", faixas, Z_BOM)
+    avaliados = uniao("avaliados", limite_p, limite_s) + acima_z(tab, "z_avaliados", faixas, Z_BOM)
+    acertos = uniao("acertos", limite_p, limite_s) + acima_z(tab, "z_acertos", faixas, Z_BOM)
+    criticos, ate_excelente, alertas, avaliados, acertos = (
+        np.rint(x).astype(np.int64) for x in (criticos, ate_excelente, alertas, avaliados, acertos))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxa = np.where(avaliados > 0, acertos / avaliados, np.nan)
+    return combos, {
+        "alertas": alertas, "alertas_critico": criticos, "alertas_excelente": ate_excelente - criticos,
+        "alertas_bom": alertas - ate_excelente, "acertos": acertos, "taxa_acerto": taxa,
+    }
+
+def acima_z(tab, nome, faixas, limite):
+    # Soma da tabela `nome` nos pontos com z <= -limite (limite tem que estar na grade de z)
+    sufixo = np.append(np.cumsum(tab[nome][::-1])[::-1], 0)
+    return sufixo[np.searchsorted(faixas["z"], limite) + 1]
+
+def varrer_z(tab, faixas, grade=GRADE_Z):
+    # So os pontos depois do aquecimento (os que o detector classifica)
+    limites = np.array(grade, dtype=float)
+    alertas = acima_z(tab, "z_pontos", faixas, limites)
+    avaliados = acima_z(tab, "z_avaliados", faixas, limites)
+    acertos = acima_z(tab, "z_acertos", faixas, limites)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxa = np.where(avaliados > 0, acertos / avaliados, np.nan)
+    return [{"z": float(z), "alertas": int(round(n)), "acertos": int(round(k)),
+             "taxa_acerto": None if np.isnan(t) else float(t)}
+            for z, n, k, t in zip(limites, alertas, acertos, taxa)]
+
+def varrer_intervalos(tab, faixas, grade=GRADE_INTERVALOS):
+    nomes = [nome.lower() for nome, _, _ in MODOS_ROTA]
+    combos = np.array(list(itertools.product(*(grade[nome] for nome in nomes))), dtype=float)
+    G = faixas["gatilho"]
+    acumulado = np.concatenate([np.zeros((len(MODOS_ROTA) + 1, 1)), tab["chamadas_modo"].cumsum(1)], axis=1)
+
+    def soma(modo, de, ate):
+        return np.where(ate > de, acumulado[modo, ate] - acumulado[modo, np.minimum(de, ate)], 0.0)
+
+    # Primeiro modo cujo gatilho bate: cada um fica com a faixa acima do seu gatilho e abaixo dos anteriores
+    teto = np.full(len(combos), len(G) + 1)
+    chamadas = np.zeros(len(combos))
+    for j in range(len(MODOS_ROTA)):
+        faixa = np.searchsorted(G, combos[:, j]) + 1
+        chamadas += soma(j + 1, faixa, teto)
+        teto = np.minimum(teto, faixa)
+    chamadas += soma(0, np.zeros(len(combos), dtype=np.int64), teto)
+    return combos, nomes, np.rint(chamadas).astype(np.int64)
+
+def melhores(combos, nomes, metricas_combo, chave, k=10, mascara=None, crescente=False):
+    valores = np.nan_to_num(metricas_combo[chave], nan=-np.inf)
+    indices = top_k(-valores if crescente else valores, k, mascara)
+    return [{**dict(zip(nomes, (float(v) for v in combos[i]))),
+             **{m: valores_m[i].item() for m, valores_m in metricas_combo.items()}} for i in indices]
+
+# ==========================================
+# EXECUCAO
+# ==========================================
+def executar(args):
+    inicio = time.perf_counter()
+    if args.sintetico:
+        from benchmarks.sintetico import gerar_historico, gerar_rotas
+        rotas = gerar_rotas(args.sintetico[0])
+        linhas = sorted(gerar_historico(rotas, args.sintetico[1]))
+        assinantes = {}
+    else:
+        linhas, assinantes = carregar(args.db)
+    if not linhas:
+        print("❌ Nenhum preco no historico")
+        return None
+    dados = montar_arrays(linhas, assinantes)
+    del linhas
+    carga = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    prep = preparar(dados, args.horizonte_dias, args.tolerancia, args.chamadas_por_rota)
+    preparo = time.perf_counter() - inicio
+
+    relatorio = {
+        "rotas": len(dados["rotas"]),
+        "pontos": len(dados["precos"]),
+        "atual": {
+            **avaliar_alertas(prep, PARAMETROS_ATUAIS),
+            **avaliar_intervalos(prep, GATILHOS_ATUAIS),
+        },
+        "tempos_s": {"carga": carga, "preparo": preparo},
+    }
+    del prep
+    if args.varrer:
+        inicio = time.perf_counter()
+        faixas = faixas_da_grade()
+        tab = preparar_tabelas(dados, faixas, args.horizonte_dias, args.tolerancia, args.chamadas_por_rota,
+                               args.processos or os.cpu_count())
+        combos_a, resultado_a = varrer_alertas(tab, faixas)
+        combos_i, nomes_i, chamadas = varrer_intervalos(tab, faixas)
+        relatorio["limiares_z"] = varrer_z(tab, faixas)
+        relatorio["tempos_s"]["varredura"] = time.perf_counter() - inicio
+        relatorio["combinacoes"] = {"alertas": len(combos_a), "intervalos": len(combos_i)}
+        relatorio["melhores_alertas"] = melhores(
+            combos_a, ["anomalia", "desconto", "bom", "score_critico", "score_excelente", "score_bom"],
+            resultado_a, "taxa_acerto", mascara=resultado_a["alertas"] >= args.minimo_alertas)
+        relatorio["menos_chamadas"] = melhores(combos_i, nomes_i, {"chamadas_api": chamadas}, "chamadas_api", crescente=True)
+        relatorio["chamadas_intervalo_fixo"] = round(tab["chamadas_fixo"])
+    return relatorio
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest das regras de alerta e de intervalo sobre o historico")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "precos.db"))
+    parser.add_argument("--sintetico", type=int, nargs=2, metavar=("ROTAS", "PONTOS"),
+                        help="usa historico sintetico em vez do banco")
+    parser.add_argument("--horizonte-dias", type=float, default=HORIZONTE_DIAS)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--chamadas-por-rota", type=int, default=1, help="requisicoes por checagem (datas do calendario)")
+    parser.add_argument("--varrer", action="store_true", help="varre a grade de limiares")
+    parser.add_argument("--processos", type=int)
+    parser.add_argument("--minimo-alertas", type=int, default=20, help="ignora combinacoes com menos alertas")
+    parser.add_argument("--saida", help="arquivo JSON (padrao: stdout)")
+    parser.add_argument("--calibrar-z", action="store_true",
+                        help="mede os limiares de z do detector para TAXAS_FALSO_POSITIVO (so ruido, sem historico)")
+    parser.add_argument("--ruido", type=float, default=0.03, help="ruido relativo usado em --calibrar-z")
+    args = parser.parse_args()
+
+    if args.calibrar_z:
+        relatorio = {"taxas": TAXAS_FALSO_POSITIVO, "ruido": args.ruido, "z": calibrar_limiares(ruido=args.ruido)}
+    else:
+        relatorio = executar(args)
+    if relatorio is None:
+        return 1
+    texto = json.dumps(relatorio, indent=2, default=list)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import asyncio
+
+# ==========================================
+# DISCORD FALSO
+# ==========================================
+# Canais/usuarios que so contam o que receberiam, com latencia opcional.
+class DestinoFalso:
+    def __init__(self, id, latencia=0.0):
+        self.id = id
+        self.latencia = latencia
+        self.mensagens = 0
+        self.embeds = 0
+
+    async def send(self, content=None, embed=None, embeds=None):
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        self.mensagens += 1
+        self.embeds += len(embeds) if embeds else int(embed is not None)
+
+class BotFalso:
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.canais = {}
+        self.usuarios = {}
+        self.fetches = 0
+
+    def get_channel(self, canal_id):
+        return self.canais.setdefault(canal_id, DestinoFalso(canal_id, self.latencia))
+
+    def get_user(self, user_id):
+        return self.usuarios.get(user_id)
+
+    async def fetch_user(self, user_id):
+        self.fetches += 1
+        return self.usuarios.setdefault(user_id, DestinoFalso(user_id, self.latencia))
@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import amadeus
+import bot_profissional as bp
+import estatisticas
+import ofertas
+import provedores
+from agendador import AgendadorRotas
+from armazenamento import ArmazemPrecos
+from cache import CacheTTL
+from limitador import LimitadorTaxa
+
+from benchmarks.discord_falso import BotFalso
+from benchmarks.mock_amadeus import MockAmadeus
+from benchmarks.provedores_falsos import ProvedorFalso
+from benchmarks.sintetico import gerar_alertas, gerar_historico, gerar_rotas
+
+# Uso: python -m benchmarks.executar --escala media --saida resultado.json
+ESCALAS = {
+    "pequena": {"rotas": 10, "pontos": 1_000, "usuarios": 100},
+    "media": {"rotas": 1_000, "pontos": 100_000, "usuarios": 10_000},
+    "grande": {"rotas": 100_000, "pontos": 10_000_000, "usuarios": 100_000},
+}
+
+def rss_pico_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def popular_banco(caminho, linhas, lote=50_000):
+    armazem = ArmazemPrecos(caminho)
+    while True:
+        bloco = list(itertools.islice(linhas, lote))
+        if not bloco:
+            break
+        armazem.adicionar_precos([(rota_id, int(ts), preco, None) for rota_id, ts, preco in bloco])
+    armazem.fechar()
+
+def preparar_bot(pasta, rotas):
+    bp.DB_FILE = os.path.join(pasta, "precos.db")
+    bp.armazem = None
+    bp.gravador.sujas.clear()
+    bp.ROTAS[:] = rotas
+
+# ==========================================
+# CENARIOS
+# ==========================================
+async def cenario_varredura(rotas, latencia, taxa_erro, limite_rps, cota, servidores=1):
+    mock = MockAmadeus(latencia=latencia, taxa_erro=taxa_erro, limite_rps=limite_rps)
+    amadeus.AMADEUS_URL = await mock.iniciar()
+    amadeus.AMADEUS_TOKEN = amadeus.AMADEUS_TOKEN_EXPIRY = None
+    amadeus.limitador = LimitadorTaxa(cota, cota)
+    amadeus.cache_ofertas = CacheTTL(amadeus.CACHE_TTL_SEGUNDOS)
+
+    bot_falso = BotFalso()
+    bp.bot.get_channel = bot_falso.get_channel
+    bp.fila_entrega.bot = bot_falso
+    bp.agendador = AgendadorRotas(len(amadeus.datas_calendario()), limite_hora=10 ** 9)
+    bp.carregar_dados()
+    # Todos os servidores assinam as mesmas rotas: as buscas nao devem multiplicar
+    for guild_id in range(1, servidores + 1):
+        bp.servidores.definir_canal(guild_id, guild_id)
+        for rota in rotas:
+            bp.servidores.inscrever(guild_id, rota)
+    bp.fila_entrega.iniciar()
+    try:
+        inicio = time.perf_counter()
+        await bp.monitorar_precos()
+        duracao = time.perf_counter() - inicio
+    finally:
+        await bp.gravador.descarregar()
+        await bp.fila_entrega.parar()
+        await amadeus.fechar_sessao()
+        await mock.parar()
+    return {
+        "rotas": len(rotas),
+        "servidores": servidores,
+        "duracao_s": duracao,
+        "rotas_por_s": len(rotas) / duracao,
+        "requisicoes": dict(mock.contadores),
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+def cenario_estatisticas(rotas, linhas):
+    rota_ids = [f"{r['origem']}-{r['destino']}" for r in rotas]
+    estatisticas.acumuladores.clear()
+    inicio = time.perf_counter()
+    n = 0
+    for rota_id, _, preco in linhas:
+        estatisticas.atualizar_estatisticas(rota_id, preco)
+        n += 1
+    atualizacao = time.perf_counter() - inicio
+
+    consultas = max(10_000, len(rota_ids))
+    inicio = time.perf_counter()
+    for i in range(consultas):
+        rota_id = rota_ids[i % len(rota_ids)]
+        estatisticas.calcular_estatisticas(rota_id)
+        estatisticas.calcular_tendencia(rota_id)
+    consulta = time.perf_counter() - inicio
+    return {
+        "pontos": n,
+        "atualizacoes_por_s": n / atualizacao if atualizacao else None,
+        "consultas": consultas,
+        "consultas_por_s": consultas / consulta if consulta else None,
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+def cenario_persistencia(rotas, pontos):
+    with tempfile.TemporaryDirectory() as pasta:
+        preparar_bot(pasta, rotas)
+        popular_banco(bp.DB_FILE, gerar_historico(rotas, pontos))
+
+        inicio = time.perf_counter()
+        bp.carregar_dados()
+        carga = time.perf_counter() - inicio
+
+        # Um ciclo completo: um preco novo por rota
+        for rota in rotas:
+            rota_id = f"{rota['origem']}-{rota['destino']}"
+            bp.registrar_preco(rota_id, random.uniform(300, 3000))
+        inicio = time.perf_counter()
+        bp.salvar_dados()
+        salvamento = time.perf_counter() - inicio
+        bp.armazem.fechar()
+        bp.armazem = None
+        return {
+            "pontos": pontos,
+            "carregar_dados_s": carga,
+            "salvar_dados_s": salvamento,
+            "tamanho_banco_mb": os.path.getsize(bp.DB_FILE) / 2 ** 20,
+            "rss_pico_mb": rss_pico_mb(),
+        }
+
+async def cenario_alertas(rotas, usuarios):
+    alertas = gerar_alertas(rotas, usuarios)
+    bp.indice_alertas.reconstruir(alertas)
+    aleatorio = random.Random(7)
+    inicio = time.perf_counter()
+    for rota in rotas:
+        await bp.checar_alertas_personalizados(rota, aleatorio.uniform(200, 3000))
+    duracao = time.perf_counter() - inicio
+    disparados = bp.fila_entrega.profundidade()
+    await bp.fila_entrega.parar()
+    bp.fila_entrega.pendentes.clear()
+    return {
+        "usuarios": usuarios,
+        "alertas": sum(len(a) for a in alertas.values()),
+        "rotas_checadas": len(rotas),
+        "duracao_s": duracao,
+        "por_rota_us": duracao / len(rotas) * 1e6,
+        "disparados": disparados,
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+def cenario_leitura(ofertas_por_resposta, repeticoes=200):
+    # Payload de flight-offers parecido com o real; stdlib json vs decoder enxuto
+    query = {"originLocationCode": "GRU", "destinationLocationCode": "LIS", "departureDate": "2026-01-10",
+             "max": ofertas_por_resposta}
+    corpo = json.dumps(MockAmadeus().payload(query)).encode()
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        ofertas.extrair_ofertas(json.loads(corpo), "2026-01-10")
+    stdlib = (time.perf_counter() - inicio) / repeticoes
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        ofertas.decodificar_ofertas(corpo, "2026-01-10")
+    enxuto = (time.perf_counter() - inicio) / repeticoes
+    return {
+        "decoder": "msgspec" if ofertas.msgspec else "orjson" if ofertas.orjson else "json",
+        "ofertas_por_resposta": ofertas_por_resposta,
+        "tamanho_kb": len(corpo) / 1024,
+        "json_stdlib_ms": stdlib * 1000,
+        "enxuto_ms": enxuto * 1000,
+        "ganho": stdlib / enxuto if enxuto else None,
+    }
+
+async def cenario_hedge(buscas, latencia, cauda, latencia_cauda, simultaneas=20):
+    # Mesmo trafego com um provedor so e com hedge para um segundo provedor
+    def percentis(duracoes):
+        duracoes = sorted(duracoes)
+        return {f"p{q}_ms": duracoes[min(len(duracoes) - 1, int(len(duracoes) * q / 100))] * 1000 for q in (50, 95, 99)}
+
+    async def rodar(lista):
+        semaforo = asyncio.Semaphore(simultaneas)
+        duracoes = []
+
+        async def _buscar(i):
+            async with semaforo:
+                inicio = time.perf_counter()
+                await provedores.buscar_com_hedge(lista, "GRU", f"D{i % 50:02d}", "2026-01-10")
+                duracoes.append(time.perf_counter() - inicio)
+
+        # Aquecimento para o p95 de cada provedor ja existir
+        await asyncio.gather(*(_buscar(i) for i in range(provedores.PROVEDORES_MIN_AMOSTRAS * 2)))
+        duracoes.clear()
+        chamadas_antes = sum(p.chamadas for p in lista)
+        await asyncio.gather(*(_buscar(i) for i in range(buscas)))
+        await asyncio.gather(*provedores._comparacoes)
+        resultado = percentis(duracoes)
+        resultado["chamadas_por_busca"] = (sum(p.chamadas for p in lista) - chamadas_antes) / buscas
+        return resultado
+
+    primario = dict(latencia=latencia, cauda=cauda, latencia_cauda=latencia_cauda)
+    sozinho = await rodar([ProvedorFalso("primario", **primario)])
+    par = [ProvedorFalso("primario", **primario), ProvedorFalso("secundario", semente=7, ruido=0.01, **primario)]
+    com_hedge = await rodar(par)
+    return {
+        "buscas": buscas,
+        "sem_hedge": sozinho,
+        "com_hedge": com_hedge,
+        "provedores": {p.nome: p.estado() for p in par},
+    }
+
+# ==========================================
+# EXECUCAO
+# ==========================================
+async def executar(args):
+    rotas = gerar_rotas(args.rotas)
+    rotas_varredura = rotas[:args.rotas_varredura]
+    resultados = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultados["estatisticas"] = cenario_estatisticas(rotas, gerar_historico(rotas, args.pontos))
+        resultados["persistencia"] = cenario_persistencia(rotas, args.pontos)
+        resultados["alertas"] = await cenario_alertas(rotas, args.usuarios)
+        resultados["leitura"] = cenario_leitura(args.ofertas)
+        resultados["hedge"] = await cenario_hedge(args.buscas_hedge, args.latencia, 0.05, args.latencia * 20)
+        with tempfile.TemporaryDirectory() as pasta:
+            preparar_bot(pasta, rotas_varredura)
+            resultados["varredura"] = await cenario_varredura(
+                rotas_varredura, args.latencia, args.taxa_erro, args.limite_rps, args.cota, args.servidores)
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do monitor de passagens")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena")
+    parser.add_argument("--rotas", type=int)
+    parser.add_argument("--pontos", type=int)
+    parser.add_argument("--usuarios", type=int)
+    parser.add_argument("--rotas-varredura", type=int, default=200, help="rotas usadas no ciclo contra o mock")
+    parser.add_argument("--latencia", type=float, default=0.05, help="latencia do mock em segundos")
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--limite-rps", type=int, default=None, help="acima disso o mock responde 429")
+    parser.add_argument("--servidores", type=int, default=3, help="servidores assinando as rotas da varredura")
+    parser.add_argument("--cota", type=float, default=50, help="req/s do token bucket do cliente")
+    parser.add_argument("--ofertas", type=int, default=250, help="ofertas por resposta no cenario de leitura")
+    parser.add_argument("--buscas-hedge", type=int, default=2000, help="buscas no cenario de hedge entre provedores falsos")
+    parser.add_argument("--saida", help="arquivo JSON (padrao: stdout)")
+    args = parser.parse_args()
+    for campo, valor in ESCALAS[args.escala].items():
+        if getattr(args, campo) is None:
+            setattr(args, campo, valor)
+
+    inicio = time.time()
+    resultados = asyncio.run(executar(args))
+    relatorio = {
+        "commit": commit_atual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "inicio": inicio,
+        "parametros": vars(args),
+        "cenarios": resultados,
+    }
+    texto = json.dumps(relatorio, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    sys.exit(main())
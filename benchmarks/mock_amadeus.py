@@ -0,0 +1,93 @@
+import asyncio
+import random
+import time
+
+from aiohttp import web
+
+# ==========================================
+# SERVIDOR AMADEUS FALSO
+# ==========================================
+# Responde /v1/security/oauth2/token e /v2/shopping/flight-offers com
+# latencia, taxa de erro e limite de requisicoes (429) configuraveis.
+class MockAmadeus:
+    def __init__(self, latencia=0.05, taxa_erro=0.0, limite_rps=None, ofertas=10, semente=42):
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.limite_rps = limite_rps
+        self.ofertas = ofertas
+        self.aleatorio = random.Random(semente)
+        self.contadores = {'token': 0, 'ofertas': 0, 'erros': 0, '429': 0}
+        self._janela = []
+        self.runner = None
+        self.url = None
+
+    async def iniciar(self, host="127.0.0.1", porta=0):
+        app = web.Application()
+        app.router.add_post("/v1/security/oauth2/token", self.token)
+        app.router.add_get("/v2/shopping/flight-offers", self.flight_offers)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, porta)
+        await site.start()
+        porta = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{porta}"
+        return self.url
+
+    async def parar(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def token(self, request):
+        self.contadores['token'] += 1
+        await asyncio.sleep(self.latencia)
+        return web.json_response({"access_token": "token-falso", "expires_in": 1799})
+
+    def _estourou_limite(self):
+        if not self.limite_rps:
+            return False
+        agora = time.monotonic()
+        self._janela = [t for t in self._janela if t > agora - 1]
+        if len(self._janela) >= self.limite_rps:
+            return True
+        self._janela.append(agora)
+        return False
+
+    async def flight_offers(self, request):
+        if self._estourou_limite():
+            self.contadores['429'] += 1
+            return web.json_response({"errors": [{"status": 429}]}, status=429, headers={"Retry-After": "1"})
+        await asyncio.sleep(self.latencia * (0.5 + self.aleatorio.random()))
+        if self.aleatorio.random() < self.taxa_erro:
+            self.contadores['erros'] += 1
+            return web.json_response({"errors": [{"status": 500}]}, status=500)
+        self.contadores['ofertas'] += 1
+        return web.json_response(self.payload(request.query))
+
+    def payload(self, query):
+        # Estrutura parecida com a real: itinerarios, segmentos, tarifas e dicionarios
+        base = 300 + (hash((query.get("originLocationCode"), query.get("destinationLocationCode"))) % 2700)
+        data = []
+        for i in range(int(query.get("max", self.ofertas))):
+            preco = base * (0.7 + 0.6 * self.aleatorio.random())
+            paradas = self.aleatorio.randint(0, 2)
+            segmentos = [{
+                "departure": {"iataCode": query.get("originLocationCode"), "at": f"{query.get('departureDate')}T08:00:00"},
+                "arrival": {"iataCode": query.get("destinationLocationCode"), "at": f"{query.get('departureDate')}T18:00:00"},
+                "carrierCode": "LA", "number": str(1000 + i), "aircraft": {"code": "320"},
+                "duration": "PT10H", "id": str(s), "numberOfStops": 0, "blacklistedInEU": False,
+            } for s in range(paradas + 1)]
+            data.append({
+                "type": "flight-offer", "id": str(i + 1), "source": "GDS", "oneWay": False,
+                "lastTicketingDate": query.get("departureDate"), "numberOfBookableSeats": 9,
+                "itineraries": [{"duration": f"PT{10 + 3 * paradas}H", "segments": segmentos}],
+                "price": {"currency": query.get("currencyCode", "BRL"), "total": f"{preco:.2f}", "base": f"{preco * 0.8:.2f}",
+                          "fees": [{"amount": "0.00", "type": "SUPPLIER"}], "grandTotal": f"{preco:.2f}"},
+                "pricingOptions": {"fareType": ["PUBLISHED"], "includedCheckedBagsOnly": True},
+                "validatingAirlineCodes": ["LA"],
+                "travelerPricings": [{"travelerId": "1", "fareOption": "STANDARD", "travelerType": "ADULT",
+                                      "price": {"currency": "BRL", "total": f"{preco:.2f}"},
+                                      "fareDetailsBySegment": [{"segmentId": str(s), "cabin": "ECONOMY", "fareBasis": "Y",
+                                                                "class": "Y"} for s in range(paradas + 1)]}],
+            })
+        return {"meta": {"count": len(data)}, "data": data,
+                "dictionaries": {"carriers": {"LA": "LATAM AIRLINES GROUP"}, "aircraft": {"320": "AIRBUS A320"}}}
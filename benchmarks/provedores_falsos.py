@@ -0,0 +1,31 @@
+import asyncio
+import random
+
+from ofertas import montar_oferta
+from provedores import Provedor
+
+# ==========================================
+# PROVEDORES FALSOS
+# ==========================================
+# Respondem sem rede: latencia base com uma cauda lenta ocasional e preco
+# com ruido relativo, para medir o hedge sem depender de API nenhuma.
+class ProvedorFalso(Provedor):
+    def __init__(self, nome, latencia=0.02, cauda=0.05, latencia_cauda=0.5, ruido=0.0, taxa_vazio=0.0, semente=42):
+        super().__init__()
+        self.nome = nome
+        self.latencia = latencia
+        self.cauda = cauda
+        self.latencia_cauda = latencia_cauda
+        self.ruido = ruido
+        self.taxa_vazio = taxa_vazio
+        self.aleatorio = random.Random(semente)
+
+    async def consultar(self, origem, destino, data_partida, data_retorno=None, adultos=1, moeda="BRL"):
+        lento = self.aleatorio.random() < self.cauda
+        await asyncio.sleep(self.latencia_cauda if lento else self.latencia * self.aleatorio.uniform(0.5, 1.5))
+        if self.aleatorio.random() < self.taxa_vazio:
+            return None
+        # Preco base fixo por rota/data, para os provedores serem comparaveis
+        base = 500 + hash((origem, destino, data_partida)) % 2500
+        preco = base * (1 + self.aleatorio.uniform(-self.ruido, self.ruido))
+        return [montar_oferta(preco, self.nome, 1, None, None, None, data_partida, data_retorno)]
@@ -0,0 +1,47 @@
+import random
+import string
+import time
+
+# ==========================================
+# DADOS SINTETICOS
+# ==========================================
+def gerar_rotas(n, semente=42):
+    # Codigos IATA falsos porem unicos: AAA-AAB, AAA-AAC, ...
+    aleatorio = random.Random(semente)
+    letras = string.ascii_uppercase
+    aeroportos = [a + b + c for a in letras for b in letras for c in letras]
+    aleatorio.shuffle(aeroportos)
+    rotas = []
+    for i in range(n):
+        origem = aeroportos[i % 200]
+        destino = aeroportos[200 + i // 200]
+        rotas.append({"origem": origem, "destino": destino, "nome": f"{origem} → {destino}"})
+    return rotas
+
+def gerar_historico(rotas, pontos, intervalo=3600, fim=None, semente=42):
+    # Passeio aleatorio multiplicativo por rota, com quedas raras (promocoes/erros de preco).
+    # Gera (rota_id, ts, preco) em ordem de ts, `pontos` no total, sem materializar tudo.
+    aleatorio = random.Random(semente)
+    fim = int(fim or time.time())
+    por_rota = max(1, pontos // max(1, len(rotas)))
+    inicio = fim - por_rota * intervalo
+    precos = {f"{r['origem']}-{r['destino']}": aleatorio.uniform(300, 3000) for r in rotas}
+    for passo in range(por_rota):
+        ts = inicio + passo * intervalo
+        for rota_id, preco in precos.items():
+            preco *= 1 + aleatorio.gauss(0, 0.03)
+            precos[rota_id] = preco = min(max(preco, 100.0), 10000.0)
+            if aleatorio.random() < 0.002:
+                yield rota_id, ts, preco * 0.45
+            else:
+                yield rota_id, ts, preco
+
+def gerar_alertas(rotas, usuarios, alertas_por_usuario=3, semente=42):
+    aleatorio = random.Random(semente)
+    alertas = {}
+    for u in range(usuarios):
+        escolhidas = aleatorio.sample(rotas, min(alertas_por_usuario, len(rotas)))
+        alertas[str(100000 + u)] = [
+            {"rota": f"{r['origem']}-{r['destino']}", "preco_max": aleatorio.uniform(200, 2500)} for r in escolhidas
+        ]
+    return alertas
@@ -1,229 +1,172 @@
 import discord
 from discord.ext import commands, tasks
 import asyncio
-import aiohttp
-import json
 import os
+import time
+from functools import partial
 from collections import defaultdict
-import statistics
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from alertas import IndiceAlertas, determinar_tipo_alerta
+from analise import PainelRotas, top_k
+import metricas
+from agendador import AGENDA_TICK_SEGUNDOS, INTERVALO_BASE, AgendadorRotas, intervalo_rota
+from amadeus import api_degradada, api_indisponivel, buscar_precos, datas_calendario, dias_ate_partida, fechar_sessao, ofertas_em_cache, provedores, rotas_por_ciclo
+from anomalia import observar_preco, reconstruir_detectores, retirar_estados
+from armazenamento import ArmazemPrecos
+from coletor import COLETORES, PoolColetores
+from entrega import FilaEntrega
+from estatisticas import atualizar_estatisticas, reconstruir_estatisticas
+from grafo import GrafoTarifas
+from historico import DIA, HORA, RETENCAO_BRUTA_DIAS, RETENCAO_DIARIA_DIAS, RETENCAO_HORARIA_DIAS, SerieRota, carregar_series, compactar_historico, cortes
+from persistencia import GravadorPrecos
+from servidores import ROTAS, ServidoresInscritos
+from snapshots import atualizar_snapshot, determinar_urgencia, reconstruir_snapshots, snapshots
+from vigia import VigiaLoop
 
 # ==========================================
 # CONFIGURACOES
 # ==========================================
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
+# Canal de alertas inicial do servidor onde ele estiver; os outros usam !canal
 CANAL_ALERTAS_ID = int(os.getenv("CANAL_ALERTAS_ID", "0"))
-AMADEUS_API_KEY = os.getenv("AMADEUS_API_KEY")
-AMADEUS_API_SECRET = os.getenv("AMADEUS_API_SECRET")
-
-AMADEUS_TOKEN = None
-AMADEUS_TOKEN_EXPIRY = None
-
-# Rotas dinamicas (podem ser adicionadas/removidas)
-ROTAS = [
-    {"origem": "GRU", "destino": "SSA", "nome": "Sao Paulo → Salvador"},
-    {"origem": "GRU", "destino": "FOR", "nome": "Sao Paulo → Fortaleza"},
-    {"origem": "GRU", "destino": "REC", "nome": "Sao Paulo → Recife"},
-    {"origem": "GRU", "destino": "NAT", "nome": "Sao Paulo → Natal"},
-    {"origem": "GRU", "destino": "MCZ", "nome": "Sao Paulo → Maceio"},
-    {"origem": "GRU", "destino": "JFK", "nome": "Sao Paulo → Nova York"},
-    {"origem": "GRU", "destino": "MIA", "nome": "Sao Paulo → Miami"},
-    {"origem": "GRU", "destino": "LAX", "nome": "Sao Paulo → Los Angeles"},
-    {"origem": "GRU", "destino": "LIS", "nome": "Sao Paulo → Lisboa"},
-    {"origem": "GRU", "destino": "MAD", "nome": "Sao Paulo → Madrid"},
-    {"origem": "GRU", "destino": "CDG", "nome": "Sao Paulo → Paris"},
-    {"origem": "GRU", "destino": "LHR", "nome": "Sao Paulo → Londres"},
-]
 
 # Configuracoes
+# Limiares dos alertas em alertas.py e intervalo base em agendador.py (o backtest usa os mesmos)
 DIAS_APRENDIZADO = 0  # Ja passou dos 7 dias!
-PERCENTUAL_DESCONTO = 35
-PERCENTUAL_ANOMALIA = 50
-INTERVALO_BASE = 6  # Intervalo base em horas
 MODO_TESTE = False
 
-# Sistema dinamico de intervalos
+# Modo mais agressivo entre as rotas (so para exibicao; cada rota tem seu intervalo)
 MODO_ATUAL = "NORMAL"  # NORMAL, ATIVO, CACADOR, ULTRA
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix='!', intents=intents)
 
-historico_precos = defaultdict(list)
+class BotMonitor(commands.Bot):
+    async def close(self):
+        # Fecha o pool HTTP compartilhado e a fila de entrega antes de desconectar
+        await fila_entrega.parar()
+        await fechar_sessao()
+        if pool_coletores:
+            pool_coletores.parar()
+        vigia.parar()
+        await salvar_detectores()
+        await gravador.fechar()
+        await super().close()
+
+bot = BotMonitor(command_prefix='!', intents=intents)
+fila_entrega = FilaEntrega(bot)
+servidor_metricas = None
+vigia = VigiaLoop()
+pool_coletores = PoolColetores() if COLETORES else None
+tarefa_coletores = None
+metricas.Medidor("fila_entrega_profundidade", "Embeds aguardando entrega", funcao=fila_entrega.profundidade)
+
+# Rotas e canal de cada servidor; o catalogo (rotas unicas) e o que o monitor busca
+servidores = ServidoresInscritos()
+metricas.Medidor("catalogo_rotas", "Rotas unicas monitoradas", funcao=lambda: len(servidores.catalogo))
+metricas.Medidor("servidores", "Servidores inscritos", funcao=lambda: len(servidores.canais))
+
+historico_precos = defaultdict(SerieRota)
 alertas_personalizados = defaultdict(list)
+indice_alertas = IndiceAlertas()
+# Ofertas em cache de cada trecho, para achar conexoes com bilhetes separados
+grafo = GrafoTarifas()
+DB_FILE = os.getenv("DB_FILE", "precos.db")
+# Arquivos antigos, importados uma vez para o banco na primeira inicializacao
 DATA_FILE = "historico_precos.json"
 ALERTAS_FILE = "alertas_personalizados.json"
 
+armazem = None
+# Liberado quando os dados do banco ja estao em memoria; antes disso os comandos sao recusados
+carregamento = asyncio.Event()
+
+def ler_dados():
+    # Roda na thread do banco: abre, migra e le as linhas, sem tocar no estado em memoria
+    banco = armazem or ArmazemPrecos(DB_FILE)
+    if armazem is None:
+        banco.migrar_json(DATA_FILE, ALERTAS_FILE)
+    # So a janela recente vem crua; as camadas por hora/dia e os totais de todo
+    # o historico ja chegam agregados pelo banco
+    corte_diario, corte_horario, corte_bruto = cortes()
+    return {
+        "armazem": banco,
+        "recentes": banco.carregar_recentes(corte_bruto),
+        "horas": banco.carregar_agregados(HORA, corte_horario, corte_bruto),
+        "dias": banco.carregar_agregados(DIA, corte_diario, corte_horario),
+        "alertas": banco.carregar_alertas(),
+        "servidores": banco.carregar_servidores(),
+        "totais": banco.totais_por_rota(),
+        "detectores": banco.carregar_detectores(),
+    }
+
+def aplicar_dados(dados):
+    # Roda no event loop: monta as estruturas em memoria sem nenhum comando no meio
+    global historico_precos, alertas_personalizados, armazem
+    armazem = dados["armazem"]
+    recentes = dados["recentes"]
+    historico_precos = carregar_series(recentes, dados["horas"], dados["dias"])
+    alertas_personalizados = defaultdict(list, dados["alertas"])
+    servidores.carregar(*dados["servidores"])
+    indice_alertas.reconstruir(alertas_personalizados)
+    reconstruir_estatisticas(dados["totais"], recentes)
+    reconstruir_detectores(recentes, dados["detectores"])
+    reconstruir_snapshots(historico_precos)
+    carregamento.set()
+
 def carregar_dados():
-    global historico_precos, alertas_personalizados
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
-            historico_precos = defaultdict(list, {k: v for k, v in data.items()})
-    if os.path.exists(ALERTAS_FILE):
-        with open(ALERTAS_FILE, 'r') as f:
-            data = json.load(f)
-            alertas_personalizados = defaultdict(list, {k: v for k, v in data.items()})
+    # Leitura e montagem direto na thread atual (fora do event loop: benchmarks, scripts)
+    aplicar_dados(ler_dados())
 
-def salvar_dados():
-    with open(DATA_FILE, 'w') as f:
-        json.dump(dict(historico_precos), f)
-    with open(ALERTAS_FILE, 'w') as f:
-        json.dump(dict(alertas_personalizados), f)
+def registrar_preco(rota_id, preco, quando=None, dias_partida=None):
+    # Devolve o z-score robusto do preco (None enquanto o detector aquece)
+    quando = quando or datetime.now()
+    ts = int(quando.timestamp())
+    historico_precos[rota_id].adicionar(preco, ts)
+    atualizar_estatisticas(rota_id, preco)
+    atualizar_snapshot(rota_id, historico_precos[rota_id])
+    gravador.marcar(rota_id, ts, preco, dias_partida)
+    return observar_preco(rota_id, preco, ts, dias_partida)
 
-# ==========================================
-# AMADEUS API
-# ==========================================
-async def obter_token_amadeus():
-    global AMADEUS_TOKEN, AMADEUS_TOKEN_EXPIRY
-    if AMADEUS_TOKEN and AMADEUS_TOKEN_EXPIRY and datetime.now() < AMADEUS_TOKEN_EXPIRY:
-        return AMADEUS_TOKEN
-    
-    url = "https://test.api.amadeus.com/v1/security/oauth2/token"
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, 
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-                data={"grant_type": "client_credentials", "client_id": AMADEUS_API_KEY, "client_secret": AMADEUS_API_SECRET}
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    AMADEUS_TOKEN = result['access_token']
-                    AMADEUS_TOKEN_EXPIRY = datetime.now() + timedelta(seconds=result['expires_in'] - 60)
-                    return AMADEUS_TOKEN
-    except Exception as e:
-        print(f"❌ Erro auth: {e}")
-    return None
-
-async def buscar_preco(origem, destino):
-    token = await obter_token_amadeus()
-    if not token:
-        return None
-    
-    data_partida = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d")
-    url = "https://test.api.amadeus.com/v2/shopping/flight-offers"
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url,
-                headers={"Authorization": f"Bearer {token}"},
-                params={"originLocationCode": origem, "destinationLocationCode": destino,
-                       "departureDate": data_partida, "adults": 1, "currencyCode": "BRL", "max": 1}
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if result.get('data') and len(result['data']) > 0:
-                        return float(result['data'][0]['price']['total'])
-    except Exception as e:
-        print(f"❌ Erro busca: {e}")
-    return None
+def gravar_precos(lote):
+    # Roda na thread do gravador, numa unica transacao
+    with metricas.salvar_latencia.cronometrar():
+        armazem.adicionar_precos(lote)
 
-# ==========================================
-# ESTATISTICAS E SCORE
-# ==========================================
-def calcular_estatisticas(rota_id):
-    precos = [p['preco'] for p in historico_precos[rota_id]]
-    if len(precos) < 2:
-        return None, None, None, None
-    return statistics.mean(precos), statistics.stdev(precos), min(precos), max(precos)
-
-def calcular_score(preco_atual, media, minimo, maximo):
-    if not media or maximo == minimo:
-        return 5
-    score = 10 - ((preco_atual - minimo) / (maximo - minimo) * 10)
-    return max(0, min(10, score))
-
-def calcular_tendencia(rota_id):
-    hist = historico_precos[rota_id]
-    if len(hist) < 5:
-        return "ESTAVEL", 0
-    
-    ultimos_5 = [p['preco'] for p in hist[-5:]]
-    primeiros = statistics.mean(ultimos_5[:3])
-    recentes = statistics.mean(ultimos_5[2:])
-    
-    variacao = ((recentes - primeiros) / primeiros) * 100
-    
-    if variacao < -5:
-        return "CAINDO", variacao
-    elif variacao > 5:
-        return "SUBINDO", variacao
-    return "ESTAVEL", variacao
-
-def determinar_urgencia(score, tendencia):
-    if score >= 9:
-        return "🔥 COMPRE AGORA! Preco minimo historico!"
-    elif score >= 8:
-        if tendencia == "SUBINDO":
-            return "⚡ COMPRE HOJE! Preco excelente e subindo!"
-        return "⚡ COMPRE HOJE! Preco excelente!"
-    elif score >= 7:
-        return "✅ Boa oportunidade. Vale comprar."
-    elif score >= 6:
-        if tendencia == "CAINDO":
-            return "⏰ Preco OK mas CAINDO. Aguarde mais um pouco."
-        return "⏰ Preco OK. Pode esperar."
-    elif score >= 5:
-        return "📊 Preco na media. Aguarde melhores."
-    return "❌ Preco ALTO. NAO compre agora!"
-
-def determinar_tipo_alerta(preco_atual, media, score):
-    if not media:
-        return None
-    percentual = ((media - preco_atual) / media) * 100
-    
-    if percentual >= PERCENTUAL_ANOMALIA or score >= 9:
-        return "critico"
-    elif percentual >= PERCENTUAL_DESCONTO or score >= 8:
-        return "excelente"
-    elif percentual >= 20 or score >= 7:
-        return "bom"
-    return None
+# Precos vao para o banco em segundo plano; o loop so marca a rota como suja
+gravador = GravadorPrecos(gravar_precos)
+metricas.Medidor("persistencia_pendentes", "Precos aguardando gravacao no banco", funcao=lambda: gravador.pendentes())
+
+async def salvar_detectores():
+    # Estado dos detectores que mudaram, na thread do banco (uma vez por ciclo)
+    estados = retirar_estados()
+    if estados and armazem is not None:
+        await gravador.executar(armazem.salvar_detectores, estados)
+
+def salvar_dados():
+    # Grava ja o que estiver pendente (fora do event loop: benchmarks, scripts)
+    gravador.descarregar_agora()
 
 # ==========================================
 # SISTEMA DINAMICO DE INTERVALOS
 # ==========================================
-def determinar_intervalo():
-    global MODO_ATUAL
-    
-    # Analisa todas as rotas pra ver se tem algo interessante
-    quedas_grandes = 0
-    
-    for rota in ROTAS:
-        rota_id = f"{rota['origem']}-{rota['destino']}"
-        hist = historico_precos[rota_id]
-        
-        if len(hist) < 3:
-            continue
-        
-        media, _, _, _ = calcular_estatisticas(rota_id)
-        if not media:
-            continue
-        
-        ultimo_preco = hist[-1]['preco']
-        percentual = ((media - ultimo_preco) / media) * 100
-        
-        if percentual >= 40:
-            MODO_ATUAL = "ULTRA"
-            return 0.25  # 15 minutos
-        elif percentual >= 25:
-            quedas_grandes += 1
-    
-    if quedas_grandes >= 2:
-        MODO_ATUAL = "CACADOR"
-        return 0.5  # 30 minutos
-    elif quedas_grandes >= 1:
-        MODO_ATUAL = "ATIVO"
-        return 2  # 2 horas
-    
-    MODO_ATUAL = "NORMAL"
-    return INTERVALO_BASE
+# Cada rota tem seu proprio intervalo (queda, volatilidade, assinantes) e o
+# agendador respeita o teto global de chamadas por hora
+agendador = AgendadorRotas(chamadas_por_rota=len(datas_calendario()))
+
+def determinar_intervalo(rota_id):
+    snap = snapshots.get(rota_id)
+    if not snap or snap.pontos < 3 or not snap.media:
+        return INTERVALO_BASE, "NORMAL"
+    assinantes = indice_alertas.assinantes(rota_id) + servidores.assinantes(rota_id)
+    return intervalo_rota(snap.percentual, snap.desvio / snap.media, assinantes, INTERVALO_BASE,
+                          agendador.outras_quedas(rota_id))
 
 # ==========================================
 # ALERTAS
 # ==========================================
-async def enviar_alerta(canal, rota, preco, media, minimo, maximo, score, tipo, tendencia, var_tendencia):
+def montar_embed_alerta(rota, preco, media, minimo, maximo, score, tipo, tendencia, var_tendencia, modo, z=None):
     percentual = ((media - preco) / media) * 100
     urgencia = determinar_urgencia(score, tendencia)
     
@@ -263,35 +206,49 @@ async def enviar_alerta(canal, rota, preco, media, minimo, maximo, score, tipo,
     # Tendencia
     emoji_tend = "📉" if tendencia == "CAINDO" else "📈" if tendencia == "SUBINDO" else "➡️"
     embed.add_field(name=f"{emoji_tend} Tendencia", value=f"{tendencia} ({var_tendencia:+.1f}%)", inline=True)
+    if z is not None:
+        embed.add_field(name="📐 Anomalia", value=f"z = {z:+.1f}", inline=True)
     
     embed.add_field(name="⏰ Urgencia", value=urgencia, inline=False)
     embed.add_field(name="🔗 Comprar", value=f"[Google Flights](https://www.google.com/flights?q=flights+from+{rota['origem']}+to+{rota['destino']})", inline=False)
     
-    embed.set_footer(text=f"Monitor Profissional • Modo: {MODO_ATUAL} • {rota['origem']}→{rota['destino']}")
-    
-    await canal.send(embed=embed)
+    embed.set_footer(text=f"Monitor Profissional • Modo: {modo} • {rota['origem']}→{rota['destino']}")
+    return embed
+
+def canais_inscritos(rota_id):
+    return [canal for canal in map(bot.get_channel, servidores.canais_da_rota(rota_id)) if canal]
+
+async def enviar_alerta(rota, preco, media, minimo, maximo, score, tipo, tendencia, var_tendencia, z=None):
+    # So enfileira: montagem do embed e envio ficam com os trabalhadores da fila
+    rota_id = f"{rota['origem']}-{rota['destino']}"
+    with metricas.enviar_alerta_latencia.cronometrar():
+        fila_entrega.enviar_canais(canais_inscritos(rota_id), partial(
+            montar_embed_alerta, rota, preco, media, minimo, maximo, score, tipo, tendencia, var_tendencia, MODO_ATUAL, z))
+    metricas.alertas_enviados.inc(1, rota_id, tipo, MODO_ATUAL)
     
     # Checa alertas personalizados
-    await checar_alertas_personalizados(canal, rota, preco)
+    await checar_alertas_personalizados(rota, preco)
 
-async def checar_alertas_personalizados(canal, rota, preco):
+async def checar_alertas_personalizados(rota, preco):
     rota_id = f"{rota['origem']}-{rota['destino']}"
     
-    for user_id, alertas in alertas_personalizados.items():
-        for alerta in alertas:
-            if alerta['rota'] == rota_id and preco <= alerta['preco_max']:
-                try:
-                    user = await bot.fetch_user(int(user_id))
-                    embed = discord.Embed(
-                        title="🔔 SEU ALERTA PERSONALIZADO!",
-                        description=f"O preco de {rota['nome']} atingiu seu alerta!",
-                        color=discord.Color.blue()
-                    )
-                    embed.add_field(name="Preco Atual", value=f"R$ {preco:,.2f}")
-                    embed.add_field(name="Seu Alerta", value=f"R$ {alerta['preco_max']:,.2f}")
-                    await user.send(embed=embed)
-                except:
-                    pass
+    # Indice por rota: so percorre os alertas que esse preco dispara
+    with metricas.checar_alertas_latencia.cronometrar():
+        disparados = indice_alertas.disparados(rota_id, preco)
+        for preco_max, user_id in disparados:
+            fila_entrega.enviar_dm(int(user_id), partial(montar_embed_alerta_pessoal, rota, preco, preco_max))
+    if disparados:
+        metricas.alertas_pessoais.inc(len(disparados), rota_id)
+
+def montar_embed_alerta_pessoal(rota, preco, preco_max):
+    embed = discord.Embed(
+        title="🔔 SEU ALERTA PERSONALIZADO!",
+        description=f"O preco de {rota['nome']} atingiu seu alerta!",
+        color=discord.Color.blue()
+    )
+    embed.add_field(name="Preco Atual", value=f"R$ {preco:,.2f}")
+    embed.add_field(name="Seu Alerta", value=f"R$ {preco_max:,.2f}")
+    return embed
 
 # ==========================================
 # RELATORIO DIARIO
@@ -302,43 +259,30 @@ async def relatorio_diario():
     if now.hour != 20:  # Espera ate 20h
         return
     
-    canal = bot.get_channel(CANAL_ALERTAS_ID)
-    if not canal:
-        return
-    
-    # Coleta dados
-    promocoes = []
-    tendencias_alta = []
-    tendencias_baixa = []
-    
-    for rota in ROTAS:
-        rota_id = f"{rota['origem']}-{rota['destino']}"
-        hist = historico_precos[rota_id]
-        
-        if not hist or len(hist) < 5:
-            continue
-        
-        media, _, minimo, maximo = calcular_estatisticas(rota_id)
-        if not media:
-            continue
-        
-        ultimo = hist[-1]['preco']
-        score = calcular_score(ultimo, media, minimo, maximo)
-        percentual = ((media - ultimo) / media) * 100
-        tendencia, var = calcular_tendencia(rota_id)
-        
-        if percentual > 15:
-            promocoes.append({
-                'rota': rota,
-                'preco': ultimo,
-                'percentual': percentual,
-                'score': score
-            })
-        
-        if tendencia == "SUBINDO" and var > 5:
-            tendencias_alta.append({'rota': rota, 'var': var})
-        elif tendencia == "CAINDO" and var < -5:
-            tendencias_baixa.append({'rota': rota, 'var': var})
+    # Um relatorio por servidor, com as rotas que ele assina
+    for _, canal_id, rotas_por_id in servidores.com_canal():
+        canal = bot.get_channel(canal_id)
+        if canal and rotas_por_id:
+            await canal.send(embed=montar_relatorio(rotas_por_id, now))
+
+def montar_relatorio(rotas_por_id, now):
+    # Coleta dados: todas as rotas de uma vez em arrays
+    painel = PainelRotas(rotas_por_id, snapshots)
+    validas = painel.validas()
+    percentuais = painel.percentual
+    scores = painel.score
+    tendencias, variacoes = painel.tendencia, painel.variacao
+    
+    promocoes = [{
+        'rota': rotas_por_id[painel.rota_ids[i]],
+        'preco': painel.ultimo[i],
+        'percentual': percentuais[i],
+        'score': scores[i]
+    } for i in top_k(scores, 5, validas & (percentuais > 15))]
+    tendencias_alta = [{'rota': rotas_por_id[painel.rota_ids[i]], 'var': variacoes[i]}
+                       for i in top_k(variacoes, 3, validas & (tendencias == "SUBINDO"))]
+    tendencias_baixa = [{'rota': rotas_por_id[painel.rota_ids[i]], 'var': variacoes[i]}
+                        for i in top_k(-variacoes, 3, validas & (tendencias == "CAINDO"))]
     
     # Monta relatorio
     embed = discord.Embed(
@@ -350,8 +294,7 @@ async def relatorio_diario():
     
     # Top 5 promocoes
     if promocoes:
-        promocoes.sort(key=lambda x: x['score'], reverse=True)
-        top5 = promocoes[:5]
+        top5 = promocoes
         
         medals = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣"]
         promo_text = ""
@@ -375,16 +318,26 @@ async def relatorio_diario():
         
         embed.add_field(name="📈 TENDENCIAS", value=tend_text, inline=False)
     
+    # Conexoes com bilhetes separados: so aqui e no !conexoes (busca no grafo, sem API)
+    conexoes = [(rota, divisao) for rota in rotas_por_id.values()
+                for divisao in grafo.divisoes(rota['origem'], rota['destino'])[:1]]
+    conexoes.sort(key=lambda c: -c[1]['economia'])
+    if conexoes:
+        conexoes_text = ""
+        for rota, divisao in conexoes[:3]:
+            escalas = " → ".join([rota['origem']] + [t.destino for t in divisao['trechos']])
+            conexoes_text += f"🧩 **{rota['nome']}**: {escalas}\n   R$ {divisao['preco']:,.2f} ({divisao['economia']:.0f}% abaixo do direto)\n"
+        embed.add_field(name="🧩 CONEXOES", value=conexoes_text, inline=False)
+    
     # Estatisticas
-    total_checagens = sum(len(historico_precos[f"{r['origem']}-{r['destino']}"]) for r in ROTAS)
-    embed.add_field(name="📊 Estatisticas", value=f"Checagens hoje: ~{total_checagens//len(ROTAS)}\nRotas: {len(ROTAS)}\nModo: {MODO_ATUAL}", inline=False)
+    total_checagens = int(painel.pontos.sum())
+    embed.add_field(name="📊 Estatisticas", value=f"Checagens hoje: ~{total_checagens//len(rotas_por_id)}\nRotas: {len(rotas_por_id)}\nModo: {MODO_ATUAL}", inline=False)
     
     # Dica
     embed.add_field(name="💡 DICA DO DIA", value="Terças e quartas costumam ser 10-15% mais baratas!\nPróxima terça: configure seus alertas!", inline=False)
     
     embed.set_footer(text="Próximo relatório: amanhã às 20h")
-    
-    await canal.send(embed=embed)
+    return embed
 
 # ==========================================
 # EVENTOS
@@ -392,83 +345,205 @@ async def relatorio_diario():
 @bot.event
 async def on_ready():
     print(f'✅ Bot conectado: {bot.user}')
-    print(f'📊 Rotas: {len(ROTAS)}')
+    global servidor_metricas, tarefa_coletores
+    vigia.iniciar()
+    # Carrega uma vez (reconexoes nao recarregam): le na thread do banco para nao
+    # travar o gateway e monta as estruturas aqui no loop, onde os comandos rodam
+    if not carregamento.is_set():
+        aplicar_dados(await gravador.executar(ler_dados))
+    for guild in bot.guilds:
+        await preparar_servidor(guild)
+    print(f'📊 Rotas: {len(servidores.catalogo)} unicas em {len(servidores.canais)} servidor(es)')
     print(f'🔥 Sistema dinamico ativo')
     print(f'📚 Fase de aprendizado: CONCLUIDA')
-    carregar_dados()
+    if servidor_metricas is None:
+        servidor_metricas = await metricas.iniciar_servidor()
+    fila_entrega.iniciar()
+    if pool_coletores and tarefa_coletores is None:
+        pool_coletores.iniciar()
+        tarefa_coletores = asyncio.create_task(consumir_coletores())
+        print(f"🛰️ Modo coletor: {COLETORES} processos")
     monitorar_precos.start()
     relatorio_diario.start()
 
-@tasks.loop(hours=INTERVALO_BASE)
+@bot.event
+async def on_guild_join(guild):
+    await carregamento.wait()
+    await preparar_servidor(guild)
+
+@bot.event
+async def on_guild_remove(guild):
+    # Sem o bot no servidor ninguem recebe; as rotas so dele saem do catalogo
+    await carregamento.wait()
+    servidores.remover(guild.id)
+    await gravador.executar(armazem.remover_servidor, guild.id)
+
+async def preparar_servidor(guild):
+    # Servidor novo comeca com as rotas padrao; o canal do .env vale se for dele
+    if servidores.conhecido(guild.id):
+        return
+    for rota in ROTAS:
+        servidores.inscrever(guild.id, dict(rota))
+    await gravador.executar(armazem.inscrever, guild.id, ROTAS)
+    if guild.get_channel(CANAL_ALERTAS_ID):
+        servidores.definir_canal(guild.id, CANAL_ALERTAS_ID)
+        await gravador.executar(armazem.definir_canal, guild.id, CANAL_ALERTAS_ID)
+    print(f"🏠 Servidor {guild.name}: {len(ROTAS)} rotas padrao")
+
+@tasks.loop(seconds=AGENDA_TICK_SEGUNDOS)
 async def monitorar_precos():
-    # Determina intervalo dinamico
-    novo_intervalo = determinar_intervalo()
-    if novo_intervalo != monitorar_precos.hours:
-        monitorar_precos.change_interval(hours=novo_intervalo)
-        print(f"⚡ Modo alterado: {MODO_ATUAL} (intervalo: {novo_intervalo}h)")
-    
-    print(f"\n🔍 Checagem [{MODO_ATUAL}] - {datetime.now().strftime('%d/%m %H:%M')}")
+    # So as rotas vencidas na agenda (e que cabem no orcamento da hora); cada
+    # rota do catalogo e buscada uma vez, nao importa quantos servidores a assinem
+    rotas_por_id = servidores.catalogo
+    agendador.sincronizar(rotas_por_id)
+    # API fora (disjuntor aberto): as rotas ficam na agenda ate a sonda ser liberada
+    if not pool_coletores and api_indisponivel():
+        return
+    # Disjuntor semi-aberto: so a rota da sonda sai; as outras continuam vencidas
+    devidas = agendador.devidas(limite=None if pool_coletores else rotas_por_ciclo())
     
-    canal = bot.get_channel(CANAL_ALERTAS_ID)
-    if not canal:
+    if pool_coletores:
+        distribuir_coletores(rotas_por_id, devidas)
+        await salvar_detectores()
+        return
+    if not devidas:
         return
     
-    for rota in ROTAS:
-        rota_id = f"{rota['origem']}-{rota['destino']}"
-        preco = await buscar_preco(rota['origem'], rota['destino'])
-        
-        if not preco:
-            continue
-        
-        historico_precos[rota_id].append({'preco': preco, 'data': datetime.now().isoformat()})
-        
-        media, _, minimo, maximo = calcular_estatisticas(rota_id)
-        if not media:
-            print(f"📚 {rota['nome']}: R$ {preco:.2f} (coletando dados...)")
-            continue
-        
-        score = calcular_score(preco, media, minimo, maximo)
-        tendencia, var_tend = calcular_tendencia(rota_id)
-        tipo = determinar_tipo_alerta(preco, media, score)
-        
-        if tipo or MODO_TESTE:
-            print(f"🔔 ALERTA! {rota['nome']}: R$ {preco:.2f} (score: {score:.1f}/10)")
-            await enviar_alerta(canal, rota, preco, media, minimo, maximo, score, tipo or "bom", tendencia, var_tend)
+    print(f"\n🔍 Checagem [{MODO_ATUAL}] - {datetime.now().strftime('%d/%m %H:%M')} - {len(devidas)} rota(s)")
+    inicio_ciclo = time.perf_counter()
+    for rota_id in devidas:
+        metricas.ciclo_rotas.inc(1, agendador.modos.get(rota_id, "NORMAL"))
+    
+    # Buscas em paralelo; cada resultado e processado assim que chega
+    sem_preco = set()
+    async for rota, oferta in buscar_precos([rotas_por_id[rota_id] for rota_id in devidas]):
+        if oferta:
+            await processar_oferta(rota, oferta)
+            # Todas as datas e horarios ja em cache, nao so a oferta mais barata
+            grafo.atualizar(rota['origem'], rota['destino'], ofertas_em_cache(rota['origem'], rota['destino']))
         else:
-            print(f"✓ {rota['nome']}: R$ {preco:.2f} | Score: {score:.1f}/10 | {tendencia}")
-        
-        await asyncio.sleep(2)
+            sem_preco.add(f"{rota['origem']}-{rota['destino']}")
+    
+    metricas.ciclo_duracao.observar(time.perf_counter() - inicio_ciclo, MODO_ATUAL)
+    
+    # Sem preco com a API fora/em teste: a busca foi recusada, entao a rota continua vencida
+    api_fora = api_degradada()
+    for rota_id in devidas:
+        if rota_id in sem_preco and api_fora:
+            agendador.devolver(rota_id)
+        else:
+            agendador.reagendar(rota_id, *determinar_intervalo(rota_id))
+    fechar_ciclo()
+    await salvar_detectores()
+    
+    estado = fila_entrega.estado()
+    print(f"📬 Fila de entrega: {estado['profundidade']} pendentes | latencia media {estado['latencia_media']:.1f}s | falhas {estado['falhas']}")
+
+async def processar_oferta(rota, oferta):
+    rota_id = f"{rota['origem']}-{rota['destino']}"
+    preco = oferta['preco']
+    z = registrar_preco(rota_id, preco, dias_partida=dias_ate_partida(oferta))
     
-    salvar_dados()
+    snap = snapshots[rota_id]
+    if not snap.media:
+        print(f"📚 {rota['nome']}: R$ {preco:.2f} (coletando dados...)")
+        return
+    
+    media, minimo, maximo, score = snap.media, snap.minimo, snap.maximo, snap.score
+    tendencia, var_tend = snap.tendencia, snap.variacao
+    tipo = determinar_tipo_alerta(preco, media, score, z)
+    
+    if tipo or MODO_TESTE:
+        print(f"🔔 ALERTA! {rota['nome']}: R$ {preco:.2f} (score: {score:.1f}/10)")
+        await enviar_alerta(rota, preco, media, minimo, maximo, score, tipo or "bom", tendencia, var_tend, z)
+    else:
+        print(f"✓ {rota['nome']}: R$ {preco:.2f} | Score: {score:.1f}/10 | {tendencia}")
+
+def fechar_ciclo():
+    global MODO_ATUAL
+    novo_modo = agendador.modo_geral()
+    if novo_modo != MODO_ATUAL:
+        MODO_ATUAL = novo_modo
+        print(f"⚡ Modo alterado: {MODO_ATUAL} (orcamento: {agendador.orcamento_restante()} chamadas na hora)")
+    # Pontos antigos viram baldes por hora/dia; a memoria fica limitada pela retencao
+    compactar_historico(historico_precos)
+
+# ==========================================
+# MODO COLETOR (varios processos)
+# ==========================================
+# As buscas rodam em processos separados (uma rota sempre no mesmo shard);
+# o bot so distribui as rotas vencidas e processa as observacoes que voltam.
+def distribuir_coletores(rotas_por_id, devidas):
+    pool_coletores.verificar()
+    for rota_id in pool_coletores.expirados():
+        print(f"⏱️ {rota_id}: sem resposta do coletor, reagendando")
+        agendador.reagendar(rota_id, *determinar_intervalo(rota_id))
+    for rota_id in devidas:
+        metricas.ciclo_rotas.inc(1, agendador.modos.get(rota_id, "NORMAL"))
+        snap = snapshots.get(rota_id)
+        pool_coletores.enviar(rotas_por_id[rota_id], snap.media if snap else None)
+    fechar_ciclo()
+
+async def consumir_coletores():
+    async for rota, preco, data_partida, trechos in pool_coletores.resultados():
+        rota_id = f"{rota['origem']}-{rota['destino']}"
+        grafo.atualizar(rota['origem'], rota['destino'], trechos)
+        if preco:
+            try:
+                await processar_oferta(rota, {'preco': preco, 'data_partida': data_partida})
+            except Exception as e:
+                print(f"❌ Erro processando {rota_id}: {e}")
+        agendador.reagendar(rota_id, *determinar_intervalo(rota_id))
 
 # ==========================================
 # COMANDOS
 # ==========================================
+@bot.check
+async def dados_carregados(ctx):
+    # Ate o banco terminar de carregar, rotas/alertas/snapshots ainda estao vazios
+    if not carregamento.is_set():
+        await ctx.send("⏳ Carregando dados, tente de novo em alguns segundos.")
+        return False
+    return True
+
 @bot.command(name='adicionar')
+@commands.guild_only()
 async def adicionar_rota(ctx, origem: str, destino: str, *, nome: str = None):
     origem, destino = origem.upper(), destino.upper()
     
-    if any(r['origem'] == origem and r['destino'] == destino for r in ROTAS):
-        await ctx.send(f"❌ Rota {origem}→{destino} ja existe!")
-        return
-    
     if not nome:
         nome = f"{origem} → {destino}"
     
-    ROTAS.append({"origem": origem, "destino": destino, "nome": nome})
+    rota = {"origem": origem, "destino": destino, "nome": nome}
+    if not servidores.inscrever(ctx.guild.id, rota):
+        await ctx.send(f"❌ Rota {origem}→{destino} ja existe!")
+        return
+    
+    await gravador.executar(armazem.inscrever, ctx.guild.id, [rota])
     await ctx.send(f"✅ Rota adicionada: {nome}")
 
 @bot.command(name='remover')
+@commands.guild_only()
 async def remover_rota(ctx, origem: str, destino: str):
     origem, destino = origem.upper(), destino.upper()
+    rota_id = f"{origem}-{destino}"
     
-    for i, r in enumerate(ROTAS):
-        if r['origem'] == origem and r['destino'] == destino:
-            ROTAS.pop(i)
-            await ctx.send(f"✅ Rota removida: {r['nome']}")
-            return
+    rota = servidores.cancelar(ctx.guild.id, rota_id)
+    if rota is None:
+        await ctx.send(f"❌ Rota {origem}→{destino} nao encontrada!")
+        return
     
-    await ctx.send(f"❌ Rota {origem}→{destino} nao encontrada!")
+    await gravador.executar(armazem.cancelar_inscricao, ctx.guild.id, rota_id)
+    await ctx.send(f"✅ Rota removida: {rota['nome']}")
+
+@bot.command(name='canal')
+@commands.guild_only()
+@commands.has_permissions(manage_guild=True)
+async def definir_canal(ctx, canal: discord.TextChannel = None):
+    canal = canal or ctx.channel
+    servidores.definir_canal(ctx.guild.id, canal.id)
+    await gravador.executar(armazem.definir_canal, ctx.guild.id, canal.id)
+    await ctx.send(f"✅ Alertas deste servidor serao enviados em {canal.mention}")
 
 @bot.command(name='alerta')
 async def criar_alerta(ctx, origem: str, destino: str, preco_max: float):
@@ -484,35 +559,122 @@ async def criar_alerta(ctx, origem: str, destino: str, preco_max: float):
         'preco_max': preco_max
     })
     
-    salvar_dados()
+    indice_alertas.adicionar(user_id, rota_id, preco_max)
+    await gravador.executar(armazem.adicionar_alerta, user_id, rota_id, preco_max)
     await ctx.send(f"✅ Alerta criado! Voce sera notificado quando {origem}→{destino} ficar abaixo de R$ {preco_max:,.2f}")
 
+def montar_embed_deal(snap):
+    origem, destino = snap.rota_id.split("-", 1)
+    embed = discord.Embed(title=f"💎 ANALISE: {origem} → {destino}", color=discord.Color.purple())
+    embed.add_field(name="💰 Preco Atual", value=f"R$ {snap.preco:,.2f}", inline=True)
+    embed.add_field(name="📊 Media", value=f"R$ {snap.media:,.2f}", inline=True)
+    embed.add_field(name="🏆 Score", value=f"**{snap.score:.1f}/10**", inline=True)
+    embed.add_field(name="💎 Min. Historico", value=f"R$ {snap.minimo:,.2f}", inline=True)
+    embed.add_field(name="📈 Max. Historico", value=f"R$ {snap.maximo:,.2f}", inline=True)
+    if snap.media_recente:
+        embed.add_field(name=f"📅 Ultimos {RETENCAO_BRUTA_DIAS} dias", value=f"Media R$ {snap.media_recente:,.2f} | Min. R$ {snap.minimo_recente:,.2f}", inline=False)
+    
+    emoji_tend = "📉" if snap.tendencia == "CAINDO" else "📈" if snap.tendencia == "SUBINDO" else "➡️"
+    embed.add_field(name=f"{emoji_tend} Tendencia", value=f"{snap.tendencia} ({snap.variacao:+.1f}%)", inline=True)
+    embed.add_field(name="⏰ Recomendacao", value=snap.urgencia, inline=False)
+    return embed
+
 @bot.command(name='deal')
 async def deal_comando(ctx, origem: str, destino: str):
     origem, destino = origem.upper(), destino.upper()
     rota_id = f"{origem}-{destino}"
     
-    hist = historico_precos[rota_id]
-    if not hist or len(hist) < 5:
+    snap = snapshots.get(rota_id)
+    if not snap or snap.pontos < 5 or not snap.media:
         await ctx.send("❌ Dados insuficientes para analise!")
         return
     
-    media, _, minimo, maximo = calcular_estatisticas(rota_id)
-    ultimo = hist[-1]['preco']
-    score = calcular_score(ultimo, media, minimo, maximo)
-    tendencia, var = calcular_tendencia(rota_id)
-    urgencia = determinar_urgencia(score, tendencia)
+    # Embed montado uma vez por preco novo; os pedidos seguintes so copiam
+    if snap.embed is None:
+        snap.embed = montar_embed_deal(snap).to_dict()
+    embed = discord.Embed.from_dict(snap.embed)
     
-    embed = discord.Embed(title=f"💎 ANALISE: {origem} → {destino}", color=discord.Color.purple())
-    embed.add_field(name="💰 Preco Atual", value=f"R$ {ultimo:,.2f}", inline=True)
-    embed.add_field(name="📊 Media", value=f"R$ {media:,.2f}", inline=True)
-    embed.add_field(name="🏆 Score", value=f"**{score:.1f}/10**", inline=True)
-    embed.add_field(name="💎 Min. Historico", value=f"R$ {minimo:,.2f}", inline=True)
-    embed.add_field(name="📈 Max. Historico", value=f"R$ {maximo:,.2f}", inline=True)
+    # Sempre responde com o historico local; com a API degradada ou cotacao velha, avisa
+    idade_horas = (time.time() - snap.ts) / 3600
+    if api_degradada() or idade_horas > 2 * INTERVALO_BASE:
+        embed.set_footer(text=f"⚠️ Dados em cache (API Amadeus instavel) - ultima cotacao ha {idade_horas:.1f}h")
     
-    emoji_tend = "📉" if tendencia == "CAINDO" else "📈" if tendencia == "SUBINDO" else "➡️"
-    embed.add_field(name=f"{emoji_tend} Tendencia", value=f"{tendencia} ({var:+.1f}%)", inline=True)
-    embed.add_field(name="⏰ Recomendacao", value=urgencia, inline=False)
+    await ctx.send(embed=embed)
+
+def montar_embed_conexoes(origem, destino, divisoes):
+    embed = discord.Embed(title=f"🧩 CONEXOES: {origem} → {destino}", color=discord.Color.teal(),
+                          description=f"Voo direto mais barato: R$ {divisoes[0]['direto']:,.2f}")
+    for i, divisao in enumerate(divisoes, 1):
+        linhas = [f"{t.origem}→{t.destino} {t.data_partida or '?'} R$ {t.preco:,.2f}" + (f" ({t.companhia})" if t.companhia else "")
+                  for t in divisao['trechos']]
+        embed.add_field(name=f"{i}. R$ {divisao['preco']:,.2f} (-{divisao['economia']:.0f}%)", value="\n".join(linhas), inline=False)
+    embed.set_footer(text="⚠️ Bilhetes separados: sem protecao de conexao, bagagem precisa ser despachada de novo")
+    return embed
+
+@bot.command(name='conexoes')
+async def conexoes_comando(ctx, origem: str, destino: str):
+    origem, destino = origem.upper(), destino.upper()
+    
+    # So usa tarifas ja coletadas; nenhuma chamada extra a API
+    divisoes = grafo.divisoes(origem, destino)
+    if not divisoes:
+        await ctx.send(f"❌ Nenhuma combinacao de trechos mais barata que o voo direto {origem}→{destino} nos dados atuais.")
+        return
+    
+    await ctx.send(embed=montar_embed_conexoes(origem, destino, divisoes))
+
+def montar_embed_historico(origem, destino, serie):
+    # Janela bruta e as camadas por hora/dia que sobram dela, cada uma com min/media/max
+    embed = discord.Embed(title=f"🗄️ HISTORICO: {origem} → {destino}", color=discord.Color.dark_grey(), timestamp=datetime.now())
+    if len(serie):
+        media, minimo = serie.resumo()
+        embed.add_field(name=f"📍 Ultimos {RETENCAO_BRUTA_DIAS} dias", value=f"{len(serie)} pontos\nMin. R$ {minimo:,.2f} | Media R$ {media:,.2f} | Max. R$ {max(serie.precos):,.2f}", inline=False)
+    for nome, camada, dias in (("🕐 Por hora", serie.horas, RETENCAO_HORARIA_DIAS), ("📅 Por dia", serie.dias, RETENCAO_DIARIA_DIAS)):
+        resumo = camada.resumo()
+        if resumo:
+            n, minimo, media, maximo = resumo
+            embed.add_field(name=f"{nome} (ate {dias} dias)", value=f"{len(camada)} baldes, {n} pontos\nMin. R$ {minimo:,.2f} | Media R$ {media:,.2f} | Max. R$ {maximo:,.2f}", inline=False)
+    return embed
+
+@bot.command(name='stats')
+async def stats_comando(ctx, origem: str = None, destino: str = None):
+    def ms(valor):
+        return f"{valor * 1000:.0f}ms" if valor is not None else "-"
+    
+    # Com uma rota: historico dela em memoria (bruto + camadas agregadas)
+    if origem and destino:
+        origem, destino = origem.upper(), destino.upper()
+        serie = historico_precos.get(f"{origem}-{destino}")
+        if serie is None:
+            await ctx.send(f"❌ Sem historico para {origem}→{destino}!")
+            return
+        await ctx.send(embed=montar_embed_historico(origem, destino, serie))
+        return
+    
+    lat = metricas.amadeus_latencia
+    ciclo = metricas.ciclo_duracao
+    req = metricas.amadeus_requisicoes.valores
+    erros = sum(n for (_, status), n in req.items() if status != 200)
+    entrega = fila_entrega.estado()
+    
+    embed = discord.Embed(title="📈 ESTATISTICAS DO BOT", color=discord.Color.dark_grey(), timestamp=datetime.now())
+    embed.add_field(name="🌐 API Amadeus", value=f"Requisicoes: {sum(req.values())}\nErros: {erros}\np50: {ms(lat.quantil(0.5))} | p95: {ms(lat.quantil(0.95))}", inline=True)
+    embed.add_field(name="🔑 Token", value=f"Renovacoes: {metricas.token_renovacoes.total()}", inline=True)
+    media_ciclo = ciclo.soma() / ciclo.contagem() if ciclo.contagem() else None
+    embed.add_field(name="🔍 Ciclos", value=f"Total: {ciclo.contagem()}\nMedia: {ms(media_ciclo)}\nModo: {MODO_ATUAL}", inline=True)
+    embed.add_field(name="📬 Entrega", value=f"Pendentes: {entrega['profundidade']}\nEnviadas: {entrega['enviadas']} | Falhas: {entrega['falhas']}\nLatencia p95: {entrega['latencia_p95']:.1f}s", inline=True)
+    embed.add_field(name="🔔 Alertas", value=f"Promocoes: {metricas.alertas_enviados.total()}\nPersonalizados: {metricas.alertas_pessoais.total()}", inline=True)
+    series = historico_precos.values()
+    embed.add_field(name="🗄️ Historico", value=f"Pontos brutos: {sum(map(len, series))}\nBaldes/hora: {sum(len(s.horas) for s in series)}\nBaldes/dia: {sum(len(s.dias) for s in series)}", inline=True)
+    # No modo coletor os provedores rodam nos processos coletores: os contadores
+    # deles chegam ao /metrics, mas p95 e concordancia por provedor ficam la
+    if len(provedores) > 1 and not pool_coletores:
+        linhas = []
+        for provedor in provedores:
+            estado = provedor.estado()
+            concordancia = f"{estado['concordancia']:.0%}" if estado['concordancia'] is not None else "-"
+            linhas.append(f"{provedor.nome}: p95 {ms(estado['p95'])} | vitorias {estado['vitorias']}/{estado['chamadas']} | hedges {estado['hedges']} | concordancia {concordancia}")
+        embed.add_field(name="🔀 Provedores", value="\n".join(linhas), inline=False)
     
     await ctx.send(embed=embed)
 
@@ -528,6 +690,9 @@ async def modo_teste(ctx, acao: str):
         MODO_TESTE = False
         await ctx.send("✅ Modo teste DESATIVADO. Voltando ao normal.")
 
-if __name__ == "__main__":
+def main():
     print("🚀 Bot Final Completo...")
     bot.run(DISCORD_TOKEN)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+# ==========================================
+# CACHE COM TTL
+# ==========================================
+class CacheTTL:
+    def __init__(self, ttl, max_itens=10000):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.itens = {}  # chave -> (expira_em, valor)
+        self.em_andamento = {}  # chave -> Future de quem ja esta buscando
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        item = self.itens.get(chave)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self.itens[chave]
+            return None
+        return item[1]
+
+    def guardar(self, chave, valor):
+        if len(self.itens) >= self.max_itens:
+            self.limpar_expirados()
+            if len(self.itens) >= self.max_itens:
+                # Descarta o item mais antigo (dict preserva ordem de insercao)
+                del self.itens[next(iter(self.itens))]
+        self.itens[chave] = (time.monotonic() + self.ttl, valor)
+
+    def limpar_expirados(self):
+        agora = time.monotonic()
+        for chave in [c for c, (expira, _) in self.itens.items() if expira < agora]:
+            del self.itens[chave]
+
+    async def obter_ou_buscar(self, chave, buscar):
+        # Chamadas simultaneas para a mesma chave compartilham uma unica busca;
+        # resultados None (erro) nao sao guardados
+        valor = self.obter(chave)
+        if valor is not None:
+            self.acertos += 1
+            return valor
+        if chave in self.em_andamento:
+            self.acertos += 1
+            return await asyncio.shield(self.em_andamento[chave])
+
+        self.falhas += 1
+        futuro = asyncio.get_running_loop().create_future()
+        self.em_andamento[chave] = futuro
+        try:
+            valor = await buscar()
+            if valor is not None:
+                self.guardar(chave, valor)
+            futuro.set_result(valor)
+            return valor
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            futuro.set_exception(e)
+            # Marca a excecao como consumida se ninguem mais estiver esperando
+            futuro.exception()
+            raise
+        finally:
+            del self.em_andamento[chave]
@@ -0,0 +1,289 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+# Uso: python cli.py {escanear,estatisticas,exportar,config,bot} --help
+#
+# Cada subcomando importa so o que usa: estatisticas/exportar/config abrem o
+# banco e pronto; escanear carrega o cliente HTTP; so `bot` carrega o discord.py.
+
+DB_PADRAO = os.getenv("DB_FILE", "precos.db")
+
+# Modulos que leem variaveis de ambiente ao importar (valor invalido = ValueError)
+MODULOS_CONFIG = ["amadeus", "provedores", "agendador", "coletor", "disjuntor", "entrega", "grafo",
+                  "historico", "metricas", "persistencia", "vigia"]
+
+def para_timestamp(data):
+    return int(datetime.fromisoformat(data).timestamp()) if data else None
+
+def abrir_armazem(caminho, criar=False):
+    from armazenamento import ArmazemPrecos
+    if not criar and not os.path.exists(caminho):
+        sys.exit(f"❌ Banco nao encontrado: {caminho}")
+    return ArmazemPrecos(caminho)
+
+def rotas_monitoradas(armazem, filtro=None):
+    # As mesmas rotas unicas que o bot busca; sem servidores cadastrados, as rotas padrao
+    if filtro:
+        rotas = []
+        for rota_id in filtro.upper().split(","):
+            origem, destino = rota_id.strip().split("-", 1)
+            rotas.append({"origem": origem, "destino": destino, "nome": f"{origem} → {destino}"})
+        return rotas
+    from servidores import ROTAS
+    catalogo = {}
+    for _, rota in armazem.carregar_servidores()[1]:
+        catalogo.setdefault(f"{rota['origem']}-{rota['destino']}", rota)
+    return list(catalogo.values()) or ROTAS
+
+def imprimir_json(dados):
+    import json
+    print(json.dumps(dados, indent=2, ensure_ascii=False))
+
+# ==========================================
+# ESCANEAR (uma varredura, sem Discord)
+# ==========================================
+async def escanear(args):
+    import amadeus
+    armazem = abrir_armazem(args.db, criar=True)
+    rotas = rotas_monitoradas(armazem, args.rotas)
+    totais = armazem.totais_por_rota()
+    observacoes = []
+    resultados = []
+    try:
+        async for rota, oferta in amadeus.buscar_precos(rotas):
+            rota_id = f"{rota['origem']}-{rota['destino']}"
+            if not oferta:
+                resultados.append({'rota': rota_id, 'preco': None})
+                if not args.json:
+                    print(f"❌ {rota['nome']}: sem preco")
+                continue
+            preco = oferta['preco']
+            observacoes.append((rota_id, int(time.time()), preco, amadeus.dias_ate_partida(oferta)))
+            n, soma = (totais.get(rota_id) or (0, 0))[:2]
+            media = soma / n if n else None
+            desconto = (media - preco) / media * 100 if media else None
+            resultados.append({'rota': rota_id, 'preco': preco, 'media': media, 'desconto': desconto,
+                               'data_partida': oferta.get('data_partida'), 'companhia': oferta.get('companhia')})
+            if not args.json:
+                comparacao = f" | media R$ {media:,.2f} (desconto {desconto:.1f}%)" if media else " | sem historico"
+                print(f"✓ {rota['nome']}: R$ {preco:,.2f} em {oferta.get('data_partida')}{comparacao}")
+    finally:
+        await amadeus.fechar_sessao()
+    if observacoes and not args.nao_gravar:
+        armazem.adicionar_precos(observacoes)
+    armazem.fechar()
+    if args.json:
+        imprimir_json(resultados)
+    else:
+        print(f"📊 {len(observacoes)}/{len(rotas)} rotas com preco" + ("" if args.nao_gravar else " (gravadas no banco)"))
+    # Codigo de saida para cron/health check: nenhuma rota respondeu = falha
+    return 0 if observacoes or not rotas else 1
+
+# ==========================================
+# ESTATISTICAS
+# ==========================================
+def estatisticas(args):
+    armazem = abrir_armazem(args.db)
+    totais = armazem.totais_por_rota()
+    ultimos = armazem.ultimos_por_rota()
+    canais, inscricoes = armazem.carregar_servidores()
+    alertas = sum(len(a) for a in armazem.carregar_alertas().values())
+    armazem.fechar()
+
+    rotas = []
+    for rota_id in sorted(totais):
+        if args.rota and rota_id != args.rota.upper():
+            continue
+        n, soma, soma_q, minimo, maximo = totais[rota_id]
+        media = soma / n
+        # Desvio amostral, igual ao do bot (estatisticas.EstatisticasRota)
+        desvio = max(0.0, (soma_q - n * media * media) / (n - 1)) ** 0.5 if n >= 2 else None
+        ts, ultimo = ultimos[rota_id]
+        rotas.append({'rota': rota_id, 'pontos': n, 'media': media, 'desvio': desvio, 'minimo': minimo,
+                      'maximo': maximo, 'ultimo': ultimo, 'ultimo_em': datetime.fromtimestamp(ts).isoformat(),
+                      'desconto': (media - ultimo) / media * 100})
+
+    if args.json:
+        imprimir_json({'servidores': len(canais), 'inscricoes': len(inscricoes), 'alertas': alertas, 'rotas': rotas})
+        return 0
+    print(f"🗄️ {args.db}: {os.path.getsize(args.db) / 2 ** 20:.1f} MB | {sum(r['pontos'] for r in rotas)} precos em {len(rotas)} rotas")
+    print(f"🏠 Servidores: {len(canais)} | Inscricoes: {len(inscricoes)} | Alertas personalizados: {alertas}")
+    print(f"\n{'ROTA':<10}{'PONTOS':>8}{'MEDIA':>11}{'MIN':>11}{'MAX':>11}{'ULTIMO':>11}{'DESC.':>8}  ULTIMA CHECAGEM")
+    for r in rotas:
+        print(f"{r['rota']:<10}{r['pontos']:>8}{r['media']:>11,.2f}{r['minimo']:>11,.2f}{r['maximo']:>11,.2f}"
+              f"{r['ultimo']:>11,.2f}{r['desconto']:>7.1f}%  {r['ultimo_em'][:16]}")
+    return 0
+
+# ==========================================
+# EXPORTAR HISTORICO
+# ==========================================
+def exportar(args):
+    import csv
+    import json
+    armazem = abrir_armazem(args.db)
+    linhas = armazem.iterar_precos(args.rota.upper() if args.rota else None, para_timestamp(args.desde), para_timestamp(args.ate))
+    saida = open(args.saida, "w", newline="") if args.saida else sys.stdout
+    n = 0
+    try:
+        if args.formato == "csv":
+            escritor = csv.writer(saida)
+            escritor.writerow(["rota_id", "data", "ts", "preco"])
+            for rota_id, ts, preco in linhas:
+                escritor.writerow([rota_id, datetime.fromtimestamp(ts).isoformat(), ts, preco])
+                n += 1
+        else:
+            for rota_id, ts, preco in linhas:
+                saida.write(json.dumps({'rota_id': rota_id, 'data': datetime.fromtimestamp(ts).isoformat(), 'ts': ts, 'preco': preco}) + "\n")
+                n += 1
+    finally:
+        if args.saida:
+            saida.close()
+        armazem.fechar()
+    print(f"📤 {n} precos exportados", file=sys.stderr)
+    return 0
+
+# ==========================================
+# VALIDAR CONFIGURACAO
+# ==========================================
+def validar_token(erros):
+    token = os.getenv("DISCORD_TOKEN")
+    print("\n📋 DISCORD_TOKEN:")
+    if not token:
+        erros.append("DISCORD_TOKEN nao definido")
+        print("❌ VARIAVEL NAO ENCONTRADA!")
+        return
+    if len(token) <= 30:
+        erros.append("DISCORD_TOKEN curto demais")
+        print(f"❌ Token muito curto: {len(token)} caracteres (um token valido tem 70-80)")
+        return
+    print(f"✅ Token encontrado: {token[:20]}...{token[-10:]} ({len(token)} caracteres)")
+    partes = token.split('.')
+    if len(partes) == 3:
+        print(f"✅ Estrutura correta: 3 partes ({', '.join(str(len(p)) for p in partes)} caracteres)")
+    else:
+        erros.append("DISCORD_TOKEN deve ter 3 partes separadas por ponto")
+        print(f"❌ Token deve ter 3 partes separadas por ponto (tem {len(partes)})")
+
+def validar_config(args):
+    import importlib
+    erros = []
+    print("=" * 50)
+    print("VERIFICACAO DE CONFIGURACAO")
+    print("=" * 50)
+
+    validar_token(erros)
+
+    print("\n📺 CANAL_ALERTAS_ID:")
+    canal_id = os.getenv("CANAL_ALERTAS_ID")
+    if not canal_id:
+        print("⚠️ Nao definido: cada servidor precisa escolher o canal com !canal")
+    elif canal_id.isdigit():
+        print(f"✅ Canal ID: {canal_id}")
+    else:
+        erros.append("CANAL_ALERTAS_ID deve ser numerico")
+        print("❌ ID deve ser apenas numeros!")
+
+    print("\n⚙️ Variaveis numericas e modulos:")
+    antes = len(erros)
+    for nome in MODULOS_CONFIG:
+        try:
+            importlib.import_module(nome)
+        except Exception as e:
+            erros.append(f"{nome}: {e}")
+            print(f"❌ {nome}: {type(e).__name__}: {e}")
+    if len(erros) == antes:
+        print("✅ Todas validas")
+
+    print("\n🔀 Provedores:")
+    amadeus = sys.modules.get("amadeus")
+    if amadeus:
+        for nome in amadeus.PROVEDORES:
+            if nome not in amadeus.FABRICAS_PROVEDORES:
+                erros.append(f"provedor desconhecido: {nome}")
+                print(f"❌ {nome}: desconhecido (opcoes: {', '.join(amadeus.FABRICAS_PROVEDORES)})")
+            elif nome == "amadeus" and not (amadeus.AMADEUS_API_KEY and amadeus.AMADEUS_API_SECRET):
+                erros.append("AMADEUS_API_KEY/AMADEUS_API_SECRET nao definidos")
+                print("❌ amadeus: AMADEUS_API_KEY/AMADEUS_API_SECRET nao definidos")
+            elif nome == "html" and "{origem}" not in os.getenv("SCRAPER_URL", ""):
+                erros.append("SCRAPER_URL ausente ou sem {origem}/{destino}")
+                print("❌ html: SCRAPER_URL ausente ou sem {origem}/{destino}")
+            else:
+                print(f"✅ {nome}")
+
+    print(f"\n🗄️ Banco ({args.db}):")
+    try:
+        armazem = abrir_armazem(args.db, criar=True)
+        armazem.fechar()
+        print("✅ Abre em modo WAL")
+    except Exception as e:
+        erros.append(f"banco: {e}")
+        print(f"❌ {e}")
+
+    if args.rede and amadeus and "amadeus" in amadeus.PROVEDORES:
+        import asyncio
+
+        async def testar_token():
+            try:
+                return await amadeus.obter_token_amadeus()
+            finally:
+                await amadeus.fechar_sessao()
+
+        print("\n🌐 Amadeus:")
+        if asyncio.run(testar_token()):
+            print("✅ Token OAuth obtido")
+        else:
+            erros.append("nao foi possivel obter token da Amadeus")
+            print("❌ Nao foi possivel obter o token")
+
+    print("\n" + "=" * 50)
+    print(f"❌ {len(erros)} problema(s) encontrado(s)" if erros else "✅ Configuracao OK")
+    return 1 if erros else 0
+
+# ==========================================
+# EXECUCAO
+# ==========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor de passagens sem Discord")
+    parser.add_argument("--db", default=DB_PADRAO)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("escanear", help="busca os precos uma vez e grava no banco")
+    p.add_argument("--rotas", help="ex: GRU-LIS,GRU-MIA (padrao: rotas dos servidores)")
+    p.add_argument("--nao-gravar", action="store_true")
+    p.add_argument("--json", action="store_true")
+
+    p = sub.add_parser("estatisticas", aliases=["stats"], help="resumo do historico por rota")
+    p.add_argument("--rota")
+    p.add_argument("--json", action="store_true")
+
+    p = sub.add_parser("exportar", help="exporta o historico de precos")
+    p.add_argument("--rota")
+    p.add_argument("--desde", help="AAAA-MM-DD")
+    p.add_argument("--ate", help="AAAA-MM-DD (exclusivo)")
+    p.add_argument("--formato", choices=["csv", "jsonl"], default="csv")
+    p.add_argument("--saida", help="arquivo (padrao: stdout)")
+
+    p = sub.add_parser("config", help="valida variaveis de ambiente e banco")
+    p.add_argument("--rede", action="store_true", help="tambem tenta obter um token da Amadeus")
+
+    sub.add_parser("bot", help="roda o bot do Discord")
+
+    args = parser.parse_args(argv)
+    if args.comando == "escanear":
+        import asyncio
+        return asyncio.run(escanear(args))
+    if args.comando in ("estatisticas", "stats"):
+        return estatisticas(args)
+    if args.comando == "exportar":
+        return exportar(args)
+    if args.comando == "config":
+        return validar_config(args)
+    import bot_profissional
+    bot_profissional.main()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import queue
+import time
+from bisect import bisect
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Numero de processos coletores (0 = busca no proprio processo do bot)
+COLETORES = int(os.getenv("COLETORES", "0"))
+COLETOR_TIMEOUT_SEGUNDOS = int(os.getenv("COLETOR_TIMEOUT_SEGUNDOS", "300"))
+REPLICAS_ANEL = 100
+
+# ==========================================
+# HASH CONSISTENTE
+# ==========================================
+# Cada rota cai sempre no mesmo shard (mesmo cache, token e conexoes);
+# mudar o numero de shards so remaneja ~1/N das rotas.
+def _hash(chave):
+    return int.from_bytes(hashlib.md5(chave.encode()).digest()[:8], "big")
+
+class AnelConsistente:
+    def __init__(self, shards, replicas=REPLICAS_ANEL):
+        pontos = sorted((_hash(f"{shard}#{r}"), shard) for shard in range(shards) for r in range(replicas))
+        self.hashes = [h for h, _ in pontos]
+        self.shards = [s for _, s in pontos]
+
+    def shard_de(self, rota_id):
+        return self.shards[bisect(self.hashes, _hash(rota_id)) % len(self.hashes)]
+
+# ==========================================
+# PROCESSO COLETOR
+# ==========================================
+def _principal_coletor(indice, total, entrada, saida):
+    asyncio.run(_loop_coletor(indice, total, entrada, saida))
+
+async def _loop_coletor(indice, total, entrada, saida):
+    import amadeus
+    import metricas
+    import provedores
+    from grafo import trechos_com_horario
+    from limitador import LimitadorTaxa
+
+    # A cota da API e dividida entre os shards
+    amadeus.limitador = LimitadorTaxa(amadeus.AMADEUS_REQ_POR_SEGUNDO / total, amadeus.AMADEUS_RAJADA)
+    semaforo = asyncio.Semaphore(amadeus.MAX_BUSCAS_SIMULTANEAS)
+    loop = asyncio.get_running_loop()
+    tarefas = set()
+
+    def telemetria():
+        # O que o bot nao ve daqui: metricas acumuladas desde o ultimo envio e
+        # o estado dos disjuntores deste shard (api_degradada no bot)
+        return {
+            "deltas": metricas.retirar_deltas(),
+            "medidores": metricas.leituras(),
+            "disjuntores": {nome: d.estado for nome, d in amadeus.disjuntores.items()},
+        }
+
+    async def coletar(rota):
+        rota_id = f"{rota['origem']}-{rota['destino']}"
+        try:
+            async with semaforo:
+                oferta = await amadeus.buscar_melhor_oferta(rota['origem'], rota['destino'])
+        except Exception as e:
+            print(f"❌ Coletor {indice}: erro em {rota_id}: {e}")
+            oferta = None
+        # Observacao compacta: o preco para registrar e os trechos com horario para o grafo
+        if oferta:
+            trechos = trechos_com_horario(amadeus.ofertas_em_cache(rota['origem'], rota['destino']))
+            saida.put((indice, rota_id, oferta['preco'], oferta['data_partida'], trechos, telemetria()))
+        else:
+            saida.put((indice, rota_id, None, None, [], telemetria()))
+
+    print(f"🛰️ Coletor {indice + 1}/{total} iniciado (pid {os.getpid()})")
+    while True:
+        trabalho = await loop.run_in_executor(None, entrada.get)
+        if trabalho is None:
+            break
+        rota, media = trabalho
+        # Sem snapshots aqui: a faixa de preco do scraper usa a media enviada pelo bot
+        provedores.medias_referencia[f"{rota['origem']}-{rota['destino']}"] = media
+        tarefa = asyncio.create_task(coletar(rota))
+        tarefas.add(tarefa)
+        tarefa.add_done_callback(tarefas.discard)
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    await amadeus.fechar_sessao()
+
+# ==========================================
+# POOL (lado do bot)
+# ==========================================
+class PoolColetores:
+    def __init__(self, total=COLETORES):
+        self.total = total
+        self.anel = AnelConsistente(total)
+        self.contexto = multiprocessing.get_context("spawn")
+        self.saida = None
+        self.entradas = []
+        self.processos = []
+        self.em_voo = {}  # rota_id -> (rota, enviado_em)
+
+    def iniciar(self):
+        if self.processos:
+            return
+        self.saida = self.contexto.Queue()
+        self.entradas = [self.contexto.Queue() for _ in range(self.total)]
+        self.processos = [self._criar(i) for i in range(self.total)]
+
+    def _criar(self, indice):
+        processo = self.contexto.Process(
+            target=_principal_coletor, args=(indice, self.total, self.entradas[indice], self.saida), daemon=True)
+        processo.start()
+        return processo
+
+    def verificar(self):
+        # Shard que morreu e recriado; as rotas dele expiram e voltam pela agenda
+        for i, processo in enumerate(self.processos):
+            if not processo.is_alive():
+                print(f"⚠️ Coletor {i + 1} caiu (exit {processo.exitcode}), reiniciando")
+                self.processos[i] = self._criar(i)
+
+    def enviar(self, rota, media=None):
+        # `media` da rota segue junto para o coletor conferir a faixa de preco do scraper
+        rota_id = f"{rota['origem']}-{rota['destino']}"
+        self.em_voo[rota_id] = (rota, time.monotonic())
+        self.entradas[self.anel.shard_de(rota_id)].put((rota, media))
+
+    def expirados(self, timeout=COLETOR_TIMEOUT_SEGUNDOS):
+        limite = time.monotonic() - timeout
+        vencidos = [rota_id for rota_id, (_, enviado) in self.em_voo.items() if enviado < limite]
+        for rota_id in vencidos:
+            del self.em_voo[rota_id]
+        return vencidos
+
+    def _ler(self):
+        try:
+            return self.saida.get(timeout=1)
+        except queue.Empty:
+            return None
+
+    async def resultados(self):
+        # Entrega (rota, preco, data_partida, trechos) conforme cada shard responde
+        loop = asyncio.get_running_loop()
+        while self.processos:
+            item = await loop.run_in_executor(None, self._ler)
+            if item is None:
+                continue
+            indice, rota_id, preco, data_partida, trechos, telemetria = item
+            self._absorver(indice, telemetria)
+            rota, _ = self.em_voo.pop(rota_id, (None, None))
+            if rota is not None:
+                yield rota, preco, data_partida, trechos
+
+    def _absorver(self, indice, telemetria):
+        # Metricas e disjuntores do shard entram no registro do bot (/metrics, !stats)
+        import amadeus
+        import metricas
+        metricas.absorver(f"coletor{indice}", telemetria["deltas"], telemetria["medidores"])
+        amadeus.disjuntores_coletores[indice] = telemetria["disjuntores"]
+
+    def parar(self):
+        for entrada in self.entradas:
+            entrada.put(None)
+        for processo in self.processos:
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        self.processos = []
@@ -0,0 +1,85 @@
+import os
+import random
+import time
+
+import metricas
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+DISJUNTOR_FALHAS = int(os.getenv("DISJUNTOR_FALHAS", "5"))  # falhas seguidas para abrir
+DISJUNTOR_ESPERA_SEGUNDOS = float(os.getenv("DISJUNTOR_ESPERA_SEGUNDOS", "30"))
+DISJUNTOR_ESPERA_MAX_SEGUNDOS = float(os.getenv("DISJUNTOR_ESPERA_MAX_SEGUNDOS", "900"))
+
+FECHADO = "fechado"
+SEMI_ABERTO = "semi_aberto"
+ABERTO = "aberto"
+CODIGO_ESTADO = {FECHADO: 0, SEMI_ABERTO: 1, ABERTO: 2}
+
+# ==========================================
+# DISJUNTOR
+# ==========================================
+# Depois de N falhas seguidas o endpoint fica "aberto": as chamadas voltam na
+# hora, sem esperar timeout. Passado o tempo de espera, uma unica sonda e
+# liberada (semi-aberto); se ela falhar, a espera dobra (com jitter).
+class Disjuntor:
+    def __init__(self, nome, limite_falhas=DISJUNTOR_FALHAS, espera=DISJUNTOR_ESPERA_SEGUNDOS,
+                 espera_max=DISJUNTOR_ESPERA_MAX_SEGUNDOS):
+        self.nome = nome
+        self.limite_falhas = limite_falhas
+        self.espera = espera
+        self.espera_max = espera_max
+        self.falhas = 0
+        self.aberturas = 0  # aberturas seguidas, define o backoff
+        self.reabrir_em = 0.0
+        self.sonda_em_voo = False
+        self._mudar(FECHADO)
+
+    def _mudar(self, estado):
+        self.estado = estado
+        metricas.disjuntor_estado.set(CODIGO_ESTADO[estado], self.nome)
+
+    def permitir(self):
+        if self.estado == FECHADO:
+            return True
+        if self.estado == ABERTO and time.monotonic() >= self.reabrir_em:
+            self._mudar(SEMI_ABERTO)
+        if self.estado == SEMI_ABERTO and not self.sonda_em_voo:
+            self.sonda_em_voo = True
+            return True
+        metricas.disjuntor_rejeitadas.inc(1, self.nome)
+        return False
+
+    def aberto(self):
+        # True enquanto nem a sonda pode sair
+        return self.estado == ABERTO and time.monotonic() < self.reabrir_em
+
+    def liberar(self):
+        # Chamada cancelada no meio (hedge, cache, desligamento): sem resultado,
+        # mas a sonda precisa ser devolvida ou o semi-aberto nunca mais libera outra
+        self.sonda_em_voo = False
+
+    def sucesso(self):
+        self.falhas = 0
+        self.aberturas = 0
+        self.sonda_em_voo = False
+        if self.estado != FECHADO:
+            print(f"✅ Disjuntor {self.nome}: fechado")
+            self._mudar(FECHADO)
+
+    def falha(self):
+        self.falhas += 1
+        self.sonda_em_voo = False
+        if self.estado == SEMI_ABERTO or self.falhas >= self.limite_falhas:
+            self._abrir()
+
+    def _abrir(self):
+        # Backoff exponencial com jitter: evita que todos voltem ao mesmo tempo
+        teto = min(self.espera_max, self.espera * 2 ** self.aberturas)
+        espera = random.uniform(teto / 2, teto)
+        self.aberturas += 1
+        self.falhas = 0
+        self.reabrir_em = time.monotonic() + espera
+        metricas.disjuntor_aberturas.inc(1, self.nome)
+        print(f"⛔ Disjuntor {self.nome}: aberto por {espera:.0f}s")
+        self._mudar(ABERTO)
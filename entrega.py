@@ -0,0 +1,163 @@
+import asyncio
+import functools
+import os
+import time
+from collections import defaultdict, deque
+
+import metricas
+from limitador import LimitadorTaxa
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Limite global do Discord e 50 req/s por bot; fica uma folga
+DISCORD_REQ_POR_SEGUNDO = float(os.getenv("DISCORD_REQ_POR_SEGUNDO", "40"))
+ENTREGA_TRABALHADORES = int(os.getenv("ENTREGA_TRABALHADORES", "5"))
+# Espera para juntar varios alertas do mesmo destino numa so mensagem
+ENTREGA_JANELA_SEGUNDOS = float(os.getenv("ENTREGA_JANELA_SEGUNDOS", "2"))
+ENTREGA_MAX_TENTATIVAS = 4
+EMBEDS_POR_MENSAGEM = 10  # limite do Discord
+# Limite por canal do Discord: 5 mensagens a cada 5s
+CANAL_REQ_POR_SEGUNDO = 1
+CANAL_RAJADA = 5
+
+# ==========================================
+# FILA DE ENTREGA
+# ==========================================
+# O loop de varredura so enfileira (destino, montar_embed); os trabalhadores
+# montam os embeds, agrupam ate 10 por destino e fazem o envio com retry.
+class FilaEntrega:
+    def __init__(self, bot, trabalhadores=ENTREGA_TRABALHADORES, taxa=DISCORD_REQ_POR_SEGUNDO,
+                 janela=ENTREGA_JANELA_SEGUNDOS):
+        self.bot = bot
+        self.trabalhadores = trabalhadores
+        self.janela = janela
+        self.limitador = LimitadorTaxa(taxa, taxa)
+        self.limitadores_destino = defaultdict(lambda: LimitadorTaxa(CANAL_REQ_POR_SEGUNDO, CANAL_RAJADA))
+        self.usuarios = {}  # user_id -> User, evita um fetch_user (REST) por alerta
+
+        self.pendentes = defaultdict(list)  # chave -> [(criado_em, destino, montar_embed)]
+        self.timers = {}
+        self.agendados = set()  # chaves na fila de prontos ou sendo enviadas
+        self.prontos = asyncio.Queue()
+        self.tarefas = []
+
+        # Metricas
+        self.enviadas = 0
+        self.mensagens = 0
+        self.falhas = 0
+        self.latencias = deque(maxlen=1000)
+
+    def iniciar(self):
+        if not self.tarefas:
+            self.tarefas = [asyncio.create_task(self._trabalhador()) for _ in range(self.trabalhadores)]
+
+    async def parar(self):
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        for tarefa in self.tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self.tarefas, return_exceptions=True)
+        self.tarefas = []
+
+    # ---------- produtores ----------
+    def enviar_canal(self, canal, montar_embed):
+        self._enfileirar(("canal", canal.id), canal, montar_embed)
+
+    def enviar_canais(self, canais, montar_embed):
+        # Mesmo alerta para varios servidores: o embed e montado uma vez so
+        montar_uma_vez = functools.cache(montar_embed)
+        for canal in canais:
+            self.enviar_canal(canal, montar_uma_vez)
+
+    def enviar_dm(self, user_id, montar_embed):
+        self._enfileirar(("dm", user_id), user_id, montar_embed)
+
+    def _enfileirar(self, chave, destino, montar_embed):
+        fila = self.pendentes[chave]
+        fila.append((time.monotonic(), destino, montar_embed))
+        if len(fila) >= EMBEDS_POR_MENSAGEM:
+            self._pronto(chave)
+        elif chave not in self.timers and chave not in self.agendados:
+            self.timers[chave] = asyncio.get_running_loop().call_later(self.janela, self._pronto, chave)
+
+    def _pronto(self, chave):
+        timer = self.timers.pop(chave, None)
+        if timer:
+            timer.cancel()
+        if chave not in self.agendados:
+            self.agendados.add(chave)
+            self.prontos.put_nowait(chave)
+
+    # ---------- metricas ----------
+    def profundidade(self):
+        return sum(len(fila) for fila in self.pendentes.values())
+
+    def estado(self):
+        latencias = sorted(self.latencias)
+        return {
+            'profundidade': self.profundidade(),
+            'enviadas': self.enviadas,
+            'mensagens': self.mensagens,
+            'falhas': self.falhas,
+            'latencia_media': sum(latencias) / len(latencias) if latencias else 0.0,
+            'latencia_p95': latencias[int(len(latencias) * 0.95)] if latencias else 0.0,
+        }
+
+    # ---------- consumidores ----------
+    async def obter_usuario(self, user_id):
+        user = self.usuarios.get(user_id) or self.bot.get_user(user_id)
+        if user is None:
+            await self.limitador.adquirir()
+            user = await self.bot.fetch_user(user_id)
+        self.usuarios[user_id] = user
+        return user
+
+    async def _trabalhador(self):
+        while True:
+            chave = await self.prontos.get()
+            fila = self.pendentes[chave]
+            lote = fila[:EMBEDS_POR_MENSAGEM]
+            del fila[:EMBEDS_POR_MENSAGEM]
+            try:
+                await self._entregar(chave, lote)
+            except Exception as e:
+                self.falhas += len(lote)
+                metricas.entrega_falhas.inc(len(lote), chave[0])
+                print(f"❌ Erro entrega {chave[0]} {chave[1]}: {e}")
+            finally:
+                self.agendados.discard(chave)
+                if fila:
+                    self._pronto(chave)
+                else:
+                    self.pendentes.pop(chave, None)
+
+    async def _entregar(self, chave, lote):
+        destino = lote[0][1]
+        if chave[0] == "dm":
+            destino = await self.obter_usuario(destino)
+        embeds = [montar() for _, _, montar in lote]
+
+        for tentativa in range(ENTREGA_MAX_TENTATIVAS):
+            await self.limitadores_destino[chave].adquirir()
+            await self.limitador.adquirir()
+            try:
+                await destino.send(embeds=embeds)
+                break
+            except Exception as e:
+                status = getattr(e, 'status', None)
+                # 4xx (sem permissao, DM fechada...) nao adianta repetir
+                if status and 400 <= status < 500 and status != 429 or tentativa == ENTREGA_MAX_TENTATIVAS - 1:
+                    raise
+                espera = getattr(e, 'retry_after', None) or 2 ** tentativa
+                if status == 429:
+                    self.limitadores_destino[chave].pausar(espera)
+                await asyncio.sleep(espera)
+
+        agora = time.monotonic()
+        for criado_em, _, _ in lote:
+            self.latencias.append(agora - criado_em)
+            metricas.entrega_latencia.observar(agora - criado_em, chave[0])
+        self.enviadas += len(lote)
+        self.mensagens += 1
@@ -0,0 +1,89 @@
+import math
+from collections import defaultdict, deque
+
+# ==========================================
+# ESTATISTICAS INCREMENTAIS POR ROTA
+# ==========================================
+# Cada preco novo atualiza os acumuladores em O(1); o historico completo
+# chega agregado pelo banco, ao carregar. A janela recente (media/minimo
+# dos ultimos dias) fica na propria serie de pontos (historico.SerieRota).
+PONTOS_TENDENCIA = 5
+
+class EstatisticasRota:
+    def __init__(self):
+        # Welford para media/variancia de todo o historico
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = None
+        self.maximo = None
+        self.ultimos = deque(maxlen=PONTOS_TENDENCIA)
+
+    def adicionar(self, preco):
+        self.n += 1
+        delta = preco - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (preco - self.media)
+        self.minimo = preco if self.minimo is None else min(self.minimo, preco)
+        self.maximo = preco if self.maximo is None else max(self.maximo, preco)
+        self.ultimos.append(preco)
+
+    def semear(self, n, soma, soma_q, minimo, maximo):
+        # Inicializa o Welford a partir dos totais agregados no banco
+        self.n = n
+        self.media = soma / n
+        self.m2 = max(0.0, soma_q - n * self.media * self.media)
+        self.minimo = minimo
+        self.maximo = maximo
+
+    def adicionar_recente(self, preco):
+        # Pontos ja contados em semear(): so alimentam a tendencia
+        self.ultimos.append(preco)
+
+    def resumo(self):
+        if self.n < 2:
+            return None, None, None, None
+        return self.media, math.sqrt(self.m2 / (self.n - 1)), self.minimo, self.maximo
+
+acumuladores = defaultdict(EstatisticasRota)
+
+def atualizar_estatisticas(rota_id, preco):
+    acumuladores[rota_id].adicionar(preco)
+
+def reconstruir_estatisticas(totais, recentes):
+    # totais: {rota_id: (n, soma, soma_q, min, max)}; recentes: linhas (rota_id, ts, preco, dias_partida) em ordem de ts
+    acumuladores.clear()
+    for rota_id, (n, soma, soma_q, minimo, maximo) in totais.items():
+        acumuladores[rota_id].semear(n, soma, soma_q, minimo, maximo)
+    for rota_id, _, preco, _ in recentes:
+        acumuladores[rota_id].adicionar_recente(preco)
+
+# ==========================================
+# ESTATISTICAS E SCORE
+# ==========================================
+def calcular_estatisticas(rota_id):
+    if rota_id not in acumuladores:
+        return None, None, None, None
+    return acumuladores[rota_id].resumo()
+
+def calcular_score(preco_atual, media, minimo, maximo):
+    if not media or maximo == minimo:
+        return 5
+    score = 10 - ((preco_atual - minimo) / (maximo - minimo) * 10)
+    return max(0, min(10, score))
+
+def calcular_tendencia(rota_id):
+    if rota_id not in acumuladores or len(acumuladores[rota_id].ultimos) < PONTOS_TENDENCIA:
+        return "ESTAVEL", 0
+
+    ultimos_5 = list(acumuladores[rota_id].ultimos)
+    primeiros = sum(ultimos_5[:3]) / 3
+    recentes = sum(ultimos_5[2:]) / 3
+
+    variacao = ((recentes - primeiros) / primeiros) * 100
+
+    if variacao < -5:
+        return "CAINDO", variacao
+    elif variacao > 5:
+        return "SUBINDO", variacao
+    return "ESTAVEL", variacao
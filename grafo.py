@@ -0,0 +1,163 @@
+import heapq
+import itertools
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+GRAFO_MAX_TRECHOS = 3
+# Bilhetes separados: precisa retirar bagagem e fazer novo check-in
+GRAFO_CONEXAO_MIN_HORAS = float(os.getenv("GRAFO_CONEXAO_MIN_HORAS", "3"))
+GRAFO_CONEXAO_MAX_HORAS = float(os.getenv("GRAFO_CONEXAO_MAX_HORAS", "24"))
+# Tarifas mais velhas que isso nao entram na busca
+GRAFO_IDADE_MAX_HORAS = float(os.getenv("GRAFO_IDADE_MAX_HORAS", "24"))
+# So mostra combinacoes pelo menos tantos % mais baratas que o voo direto
+GRAFO_ECONOMIA_MIN = float(os.getenv("GRAFO_ECONOMIA_MIN", "5"))
+GRAFO_K = 3
+GRAFO_CACHE_SEGUNDOS = 600
+
+def _horario(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor)
+    except ValueError:
+        return None
+
+# ==========================================
+# TRECHO (aresta do grafo)
+# ==========================================
+CAMPOS_TRECHO = ('preco', 'data_partida', 'partida', 'chegada', 'companhia')
+
+def trechos_com_horario(ofertas):
+    # So as ofertas com horario de partida e chegada servem para montar conexao;
+    # versao compacta (o coletor manda isso de volta ao bot)
+    return [{campo: oferta.get(campo) for campo in CAMPOS_TRECHO}
+            for oferta in ofertas if _horario(oferta.get('partida')) and _horario(oferta.get('chegada'))]
+
+class Trecho:
+    __slots__ = ('origem', 'destino', 'preco', 'ts', 'data_partida', 'partida', 'chegada', 'companhia')
+
+    def __init__(self, origem, destino, oferta, ts):
+        self.origem = origem
+        self.destino = destino
+        self.preco = oferta['preco']
+        self.ts = ts
+        self.data_partida = oferta.get('data_partida')
+        self.partida = _horario(oferta.get('partida'))
+        self.chegada = _horario(oferta.get('chegada'))
+        self.companhia = oferta.get('companhia')
+
+# ==========================================
+# GRAFO DE TARIFAS
+# ==========================================
+# Aeroportos sao nos; cada rota monitorada vira arestas com todas as ofertas
+# em cache de cada data de partida (cada horario e um trecho). Trecho sem
+# horario fica de fora: nao da para saber se a conexao fecha. Atualizar
+# invalida so as buscas que poderiam passar pela rota alterada (uma busca em
+# largura de ate max_trechos - 1 passos a partir de cada ponta). Nenhuma
+# chamada a API: tudo sai dos precos que o monitor ja coletou.
+class GrafoTarifas:
+    def __init__(self, max_trechos=GRAFO_MAX_TRECHOS, conexao_min=GRAFO_CONEXAO_MIN_HORAS,
+                 conexao_max=GRAFO_CONEXAO_MAX_HORAS, idade_max=GRAFO_IDADE_MAX_HORAS):
+        self.max_trechos = max_trechos
+        self.conexao_min = timedelta(hours=conexao_min)
+        self.conexao_max = timedelta(hours=conexao_max)
+        self.idade_max = idade_max * 3600
+        self.saidas = defaultdict(dict)  # origem -> {(destino, data_partida): [Trecho]}
+        self.entradas = defaultdict(set)  # destino -> origens com trecho ate ele
+        self.cache = {}  # (origem, destino) -> (calculado_em, divisoes)
+
+    def atualizar(self, origem, destino, ofertas, ts=None):
+        # As ofertas novas de cada data substituem as antigas da mesma data;
+        # datas que nao vieram continuam ate passar de idade_max
+        ts = ts or time.time()
+        por_data = defaultdict(list)
+        for oferta in ofertas:
+            trecho = Trecho(origem, destino, oferta, ts)
+            if trecho.partida and trecho.chegada:
+                por_data[trecho.data_partida].append(trecho)
+        if not por_data:
+            return 0
+        for data_partida, trechos in por_data.items():
+            self.saidas[origem][(destino, data_partida)] = trechos
+        self.entradas[destino].add(origem)
+        self._invalidar(origem, destino)
+        return sum(map(len, por_data.values()))
+
+    def _alcance(self, inicio, vizinhos):
+        # Aeroportos a ate max_trechos - 1 passos de `inicio`
+        vistos = {inicio}
+        fronteira = {inicio}
+        for _ in range(self.max_trechos - 1):
+            fronteira = {v for no in fronteira for v in vizinhos(no)} - vistos
+            vistos |= fronteira
+        return vistos
+
+    def _invalidar(self, origem, destino):
+        antes = self._alcance(origem, lambda no: self.entradas.get(no, ()))
+        depois = self._alcance(destino, lambda no: (d for d, _ in self.saidas.get(no, {})))
+        for par in [par for par in self.cache if par[0] in antes and par[1] in depois]:
+            del self.cache[par]
+
+    def trechos(self, origem, agora=None):
+        agora = agora or time.time()
+        hoje = datetime.fromtimestamp(agora)
+        for trechos in self.saidas.get(origem, {}).values():
+            for trecho in trechos:
+                if agora - trecho.ts <= self.idade_max and trecho.partida >= hoje - timedelta(days=1):
+                    yield trecho
+
+    def direto(self, origem, destino, agora=None):
+        diretos = [t for t in self.trechos(origem, agora) if t.destino == destino]
+        return min(diretos, key=lambda t: t.preco) if diretos else None
+
+    def itinerarios(self, origem, destino, k=GRAFO_K, agora=None):
+        # k caminhos mais baratos (Dijkstra com ate k rotulos por aeroporto),
+        # respeitando conexao minima/maxima e sem repetir aeroporto
+        sequencia = itertools.count()
+        fila = [(0.0, next(sequencia), origem, ())]
+        rotulos = defaultdict(int)
+        encontrados = []
+        while fila and len(encontrados) < k:
+            custo, _, no, caminho = heapq.heappop(fila)
+            if no == destino:
+                encontrados.append((custo, list(caminho)))
+                continue
+            rotulos[no] += 1
+            if rotulos[no] > k or len(caminho) >= self.max_trechos:
+                continue
+            visitados = {origem, *(t.destino for t in caminho)}
+            anterior = caminho[-1] if caminho else None
+            for trecho in self.trechos(no, agora):
+                if trecho.destino in visitados:
+                    continue
+                if anterior and not (anterior.chegada + self.conexao_min <= trecho.partida <= anterior.chegada + self.conexao_max):
+                    continue
+                heapq.heappush(fila, (custo + trecho.preco, next(sequencia), trecho.destino, caminho + (trecho,)))
+        return encontrados
+
+    def divisoes(self, origem, destino, k=GRAFO_K, economia_min=GRAFO_ECONOMIA_MIN, agora=None):
+        # Combinacoes de 2+ trechos mais baratas que o melhor voo direto
+        calculado = self.cache.get((origem, destino))
+        agora = agora or time.time()
+        if calculado and agora - calculado[0] < GRAFO_CACHE_SEGUNDOS:
+            return calculado[1]
+        direto = self.direto(origem, destino, agora)
+        resultado = []
+        if direto:
+            limite = direto.preco * (1 - economia_min / 100)
+            for custo, caminho in self.itinerarios(origem, destino, k + 1, agora):
+                if len(caminho) > 1 and custo <= limite:
+                    resultado.append({
+                        'preco': custo,
+                        'trechos': caminho,
+                        'direto': direto.preco,
+                        'economia': (direto.preco - custo) / direto.preco * 100,
+                    })
+        resultado = resultado[:k]
+        self.cache[(origem, destino)] = (agora, resultado)
+        return resultado
@@ -0,0 +1,147 @@
+import os
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, deque
+
+# ==========================================
+# RETENCAO
+# ==========================================
+# Pontos brutos ficam N dias em memoria; depois viram baldes por hora,
+# e mais tarde baldes por dia. Os totais de todo o historico chegam agregados
+# pelo banco (estatisticas.reconstruir_estatisticas). O banco continua com tudo.
+RETENCAO_BRUTA_DIAS = int(os.getenv("RETENCAO_BRUTA_DIAS", "30"))
+RETENCAO_HORARIA_DIAS = int(os.getenv("RETENCAO_HORARIA_DIAS", "180"))
+RETENCAO_DIARIA_DIAS = int(os.getenv("RETENCAO_DIARIA_DIAS", "730"))
+
+HORA = 3600
+DIA = 86400
+
+def cortes(agora=None):
+    # Inicio de cada camada: (diaria, horaria, bruta)
+    agora = int(agora or time.time())
+    return agora - RETENCAO_DIARIA_DIAS * DIA, agora - RETENCAO_HORARIA_DIAS * DIA, agora - RETENCAO_BRUTA_DIAS * DIA
+
+class SerieAgregada:
+    # Baldes min/media/max em colunas: inicio, n, minimo, soma, maximo
+    __slots__ = ('segundos', 'inicio', 'n', 'minimo', 'soma', 'maximo')
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+        self.inicio = array('q')
+        self.n = array('q')
+        self.minimo = array('d')
+        self.soma = array('d')
+        self.maximo = array('d')
+
+    def __len__(self):
+        return len(self.inicio)
+
+    def adicionar(self, ts, n, minimo, soma, maximo):
+        inicio = ts - ts % self.segundos
+        if self.inicio and self.inicio[-1] == inicio:
+            self.n[-1] += n
+            self.minimo[-1] = min(self.minimo[-1], minimo)
+            self.soma[-1] += soma
+            self.maximo[-1] = max(self.maximo[-1], maximo)
+            return
+        self.inicio.append(inicio)
+        self.n.append(n)
+        self.minimo.append(minimo)
+        self.soma.append(soma)
+        self.maximo.append(maximo)
+
+    def retirar_ate(self, corte):
+        # Remove e devolve os baldes que comecam antes de `corte`
+        i = bisect_left(self.inicio, corte)
+        if not i:
+            return []
+        removidos = list(zip(self.inicio[:i], self.n[:i], self.minimo[:i], self.soma[:i], self.maximo[:i]))
+        for coluna in (self.inicio, self.n, self.minimo, self.soma, self.maximo):
+            del coluna[:i]
+        return removidos
+
+    def baldes(self):
+        for inicio, n, minimo, soma, maximo in zip(self.inicio, self.n, self.minimo, self.soma, self.maximo):
+            yield inicio, n, minimo, soma / n, maximo
+
+    def resumo(self):
+        # (pontos, minimo, media, maximo) de todos os baldes da camada
+        if not self.inicio:
+            return None
+        n = sum(self.n)
+        return n, min(self.minimo), sum(self.soma) / n, max(self.maximo)
+
+class SerieRota:
+    # Pontos brutos em colunas (array('d') + epoch int64) em vez de dicts.
+    # Unica copia crua da rota: a media/minimo da janela recente sai daqui,
+    # por soma movel e deque monotonico, sem guardar os pontos de novo. O que
+    # sai da janela bruta so sobrevive agregado em `horas` e depois em `dias`.
+    __slots__ = ('ts', 'precos', 'soma', 'mins', 'horas', 'dias')
+
+    def __init__(self):
+        self.ts = array('q')
+        self.precos = array('d')
+        self.soma = 0.0
+        self.mins = deque()  # (ts, preco) com precos crescentes
+        self.horas = SerieAgregada(HORA)
+        self.dias = SerieAgregada(DIA)
+
+    def __len__(self):
+        return len(self.precos)
+
+    def adicionar(self, preco, ts):
+        self.ts.append(ts)
+        self.precos.append(preco)
+        self.soma += preco
+        while self.mins and self.mins[-1][1] >= preco:
+            self.mins.pop()
+        self.mins.append((ts, preco))
+
+    def ultimo_preco(self):
+        return self.precos[-1] if self.precos else None
+
+    def ultimo_ts(self):
+        return self.ts[-1] if self.ts else None
+
+    def resumo(self):
+        # (media, minimo) dos pontos retidos
+        if not self.precos:
+            return None, None
+        return self.soma / len(self.precos), self.mins[0][1]
+
+    def compactar(self, agora):
+        corte_diario, corte_horario, corte = cortes(agora)
+        i = bisect_left(self.ts, corte)
+        if i:
+            for ts, preco in zip(self.ts[:i], self.precos[:i]):
+                self.horas.adicionar(ts, 1, preco, preco, preco)
+            self.soma -= sum(self.precos[:i])
+            del self.ts[:i]
+            del self.precos[:i]
+        while self.mins and self.mins[0][0] < corte:
+            self.mins.popleft()
+
+        for inicio, n, minimo, soma, maximo in self.horas.retirar_ate(corte_horario):
+            self.dias.adicionar(inicio, n, minimo, soma, maximo)
+        self.dias.retirar_ate(corte_diario)
+
+def compactar_historico(historico, agora=None):
+    agora = agora or time.time()
+    for serie in historico.values():
+        serie.compactar(agora)
+
+def carregar_series(recentes, horas=(), dias=(), agora=None):
+    # `recentes` sao as linhas (rota_id, ts, preco, dias_partida) ja lidas do banco em
+    # ordem de ts; `horas` e `dias`, os baldes (rota_id, inicio, n, minimo, soma, maximo)
+    # de armazem.carregar_agregados para as janelas de cortes()
+    corte = cortes(agora)[2]
+    historico = defaultdict(SerieRota)
+    for rota_id, inicio, n, minimo, soma, maximo in dias:
+        historico[rota_id].dias.adicionar(inicio, n, minimo, soma, maximo)
+    for rota_id, inicio, n, minimo, soma, maximo in horas:
+        historico[rota_id].horas.adicionar(inicio, n, minimo, soma, maximo)
+    for rota_id, ts, preco, _ in recentes:
+        if ts >= corte:
+            historico[rota_id].adicionar(preco, ts)
+    return historico
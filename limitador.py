@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+# ==========================================
+# LIMITE DE TAXA
+# ==========================================
+class LimitadorTaxa:
+    # Token bucket: libera `taxa` requisicoes por segundo, acumulando ate `capacidade`
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.atualizado = time.monotonic()
+        self.pausado_ate = 0
+        self._lock = asyncio.Lock()
+
+    def pausar(self, segundos):
+        self.pausado_ate = max(self.pausado_ate, time.monotonic() + segundos)
+
+    async def adquirir(self):
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                if agora < self.pausado_ate:
+                    await asyncio.sleep(self.pausado_ate - agora)
+                    continue
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+                self.atualizado = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.taxa)
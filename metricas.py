@@ -0,0 +1,225 @@
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Endpoint /metrics no formato Prometheus (porta 0 desliga)
+METRICAS_HOST = os.getenv("METRICAS_HOST", "127.0.0.1")
+METRICAS_PORTA = int(os.getenv("METRICAS_PORTA", "9108"))
+
+BALDES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# ==========================================
+# TIPOS DE METRICA
+# ==========================================
+# Registrar custa um acesso a dict; a formatacao so acontece quando alguem le.
+registro = []
+
+def _rotulos(nomes, valores):
+    if not nomes:
+        return ""
+    pares = ",".join(f'{n}="{str(v).replace(chr(34), chr(39))}"' for n, v in zip(nomes, valores))
+    return "{" + pares + "}"
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.valores = {}
+        registro.append(self)
+
+    def inc(self, valor=1, *rotulos):
+        self.valores[rotulos] = self.valores.get(rotulos, 0) + valor
+
+    def total(self):
+        return sum(self.valores.values())
+
+    def amostras(self):
+        for chave, valor in self.valores.items():
+            yield f"{self.nome}{_rotulos(self.rotulos, chave)} {valor}"
+
+class Medidor:
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, rotulos=(), funcao=None, combinar=sum):
+        # Com `funcao`, o valor e lido so na hora da coleta. `combinar` junta o
+        # valor local com o dos processos coletores (soma para contagens, max
+        # para estados, em que o pior vale)
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.funcao = funcao
+        self.combinar = combinar
+        self.valores = {}
+        self.remotos = {}  # origem -> ultima leitura recebida de outro processo
+        registro.append(self)
+
+    def set(self, valor, *rotulos):
+        self.valores[rotulos] = valor
+
+    def leitura(self):
+        return self.funcao() if self.funcao else dict(self.valores)
+
+    def amostras(self):
+        if self.funcao:
+            yield f"{self.nome} {self.combinar([self.funcao(), *self.remotos.values()])}"
+            return
+        por_chave = {}
+        for valores in (self.valores, *self.remotos.values()):
+            for chave, valor in valores.items():
+                por_chave.setdefault(chave, []).append(valor)
+        for chave, valores in por_chave.items():
+            yield f"{self.nome}{_rotulos(self.rotulos, chave)} {self.combinar(valores)}"
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), baldes=BALDES_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.baldes = baldes
+        self.series = {}  # rotulos -> [contagens por balde..., +Inf, soma]
+        registro.append(self)
+
+    def observar(self, valor, *rotulos):
+        serie = self.series.get(rotulos)
+        if serie is None:
+            serie = self.series[rotulos] = [0] * (len(self.baldes) + 2)
+        serie[bisect_left(self.baldes, valor)] += 1
+        serie[-1] += valor
+
+    @contextmanager
+    def cronometrar(self, *rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *rotulos)
+
+    def contagem(self):
+        return sum(sum(serie[:-1]) for serie in self.series.values())
+
+    def soma(self):
+        return sum(serie[-1] for serie in self.series.values())
+
+    def quantil(self, q):
+        # Estimativa pelo limite superior do balde, somando todas as series
+        totais = [0] * (len(self.baldes) + 1)
+        for serie in self.series.values():
+            for i, n in enumerate(serie[:-1]):
+                totais[i] += n
+        alvo = q * sum(totais)
+        acumulado = 0
+        for i, n in enumerate(totais):
+            acumulado += n
+            if n and acumulado >= alvo:
+                return self.baldes[i] if i < len(self.baldes) else float("inf")
+        return None
+
+    def amostras(self):
+        for chave, serie in self.series.items():
+            acumulado = 0
+            for limite, n in zip(self.baldes, serie):
+                acumulado += n
+                yield f"{self.nome}_bucket{_rotulos(self.rotulos + ('le',), chave + (limite,))} {acumulado}"
+            acumulado += serie[len(self.baldes)]
+            yield f"{self.nome}_bucket{_rotulos(self.rotulos + ('le',), chave + ('+Inf',))} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {serie[-1]}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, chave)} {acumulado}"
+
+def exportar():
+    linhas = []
+    for metrica in registro:
+        linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+        linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+        linhas.extend(metrica.amostras())
+    return "\n".join(linhas) + "\n"
+
+# ==========================================
+# METRICAS DOS COLETORES
+# ==========================================
+# Os processos coletores tem o proprio registro; eles mandam ao bot o que
+# acumularam desde o ultimo envio (contadores e histogramas) e a leitura atual
+# dos medidores, e o bot soma tudo no registro dele antes do /metrics.
+def retirar_deltas():
+    deltas = {}
+    for metrica in registro:
+        if isinstance(metrica, Contador) and metrica.valores:
+            deltas[metrica.nome], metrica.valores = metrica.valores, {}
+        elif isinstance(metrica, Histograma) and metrica.series:
+            deltas[metrica.nome], metrica.series = metrica.series, {}
+    return deltas
+
+def leituras():
+    return {metrica.nome: metrica.leitura() for metrica in registro if isinstance(metrica, Medidor)}
+
+def absorver(origem, deltas, medidores):
+    por_nome = {metrica.nome: metrica for metrica in registro}
+    for nome, valores in deltas.items():
+        metrica = por_nome.get(nome)
+        if isinstance(metrica, Contador):
+            for chave, valor in valores.items():
+                metrica.inc(valor, *chave)
+        elif isinstance(metrica, Histograma):
+            for chave, serie in valores.items():
+                atual = metrica.series.setdefault(chave, [0] * len(serie))
+                for i, n in enumerate(serie):
+                    atual[i] += n
+    for nome, leitura in medidores.items():
+        metrica = por_nome.get(nome)
+        if isinstance(metrica, Medidor):
+            metrica.remotos[origem] = leitura
+
+# ==========================================
+# METRICAS DO BOT
+# ==========================================
+amadeus_requisicoes = Contador("amadeus_requisicoes_total", "Requisicoes a API Amadeus", ("endpoint", "status"))
+amadeus_latencia = Histograma("amadeus_latencia_segundos", "Latencia das requisicoes a API Amadeus", ("endpoint",))
+token_renovacoes = Contador("amadeus_token_renovacoes_total", "Renovacoes do token OAuth", ("resultado",))
+busca_latencia = Histograma("busca_preco_segundos", "Tempo de buscar_melhor_oferta por rota (calendario inteiro)", ("rota",))
+busca_resultados = Contador("busca_preco_total", "Resultados de buscar_melhor_oferta", ("rota", "resultado"))
+ciclo_duracao = Histograma("ciclo_segundos", "Duracao de um ciclo de monitorar_precos", ("modo",))
+ciclo_rotas = Contador("ciclo_rotas_total", "Rotas checadas por modo", ("modo",))
+salvar_latencia = Histograma("salvar_dados_segundos", "Tempo de salvar_dados")
+alertas_enviados = Contador("alertas_total", "Alertas de promocao enfileirados", ("rota", "tipo", "modo"))
+enviar_alerta_latencia = Histograma("enviar_alerta_segundos", "Tempo de enviar_alerta (enfileiramento)")
+checar_alertas_latencia = Histograma("checar_alertas_personalizados_segundos", "Tempo de checar_alertas_personalizados")
+alertas_pessoais = Contador("alertas_personalizados_total", "Alertas personalizados disparados", ("rota",))
+entrega_latencia = Histograma("entrega_latencia_segundos", "Tempo entre enfileirar e entregar no Discord", ("tipo",))
+disjuntor_estado = Medidor("amadeus_disjuntor_estado", "Estado do disjuntor (0 fechado, 1 semi-aberto, 2 aberto)", ("endpoint",), combinar=max)
+disjuntor_aberturas = Contador("amadeus_disjuntor_aberturas_total", "Vezes que o disjuntor abriu", ("endpoint",))
+disjuntor_rejeitadas = Contador("amadeus_disjuntor_rejeitadas_total", "Chamadas recusadas com o disjuntor aberto", ("endpoint",))
+loop_atraso = Histograma("event_loop_atraso_segundos", "Atraso de agendamento do event loop")
+entrega_falhas = Contador("entrega_falhas_total", "Embeds descartados apos falha de entrega", ("tipo",))
+provedor_latencia = Histograma("provedor_latencia_segundos", "Latencia das consultas por provedor de tarifas", ("provedor",))
+provedor_resultados = Contador("provedor_consultas_total", "Consultas por provedor e resultado", ("provedor", "resultado"))
+provedor_vitorias = Contador("provedor_vitorias_total", "Buscas respondidas primeiro por cada provedor", ("provedor",))
+provedor_hedges = Contador("provedor_hedges_total", "Consultas extras porque o provedor anterior passou do p95", ("provedor",))
+provedor_divergencia = Histograma("provedor_divergencia_relativa", "Diferenca relativa entre o menor preco de dois provedores",
+                                  ("provedor",), baldes=(0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5))
+
+# ==========================================
+# SERVIDOR /metrics
+# ==========================================
+async def iniciar_servidor(host=METRICAS_HOST, porta=METRICAS_PORTA):
+    if not porta:
+        return None
+    from aiohttp import web
+
+    async def metrics(request):
+        return web.Response(text=exportar(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, porta).start()
+    print(f"📈 Metricas em http://{host}:{porta}/metrics")
+    return runner
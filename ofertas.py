@@ -0,0 +1,103 @@
+import json
+import re
+
+# Decodificadores opcionais (pip install msgspec / orjson); sem eles usa o json da stdlib
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ==========================================
+# LEITURA ENXUTA DE FLIGHT-OFFERS
+# ==========================================
+# A resposta traz itinerarios, tarifas por passageiro e dicionarios, mas so
+# usamos preco, companhia, escalas, duracao e horarios de partida/chegada.
+# Com msgspec o decoder tipado pula o resto sem criar objetos; com
+# orjson/json o payload e decodificado inteiro e so esses campos sao lidos.
+DURACAO_ISO = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?")
+
+def duracao_minutos(duracao):
+    # "PT12H30M" -> 750
+    m = DURACAO_ISO.match(duracao or "")
+    if not m or not any(m.groups()):
+        return None
+    dias, horas, minutos = (int(g or 0) for g in m.groups())
+    return dias * 1440 + horas * 60 + minutos
+
+def montar_oferta(preco, companhia, segmentos, duracao, partida, chegada, data_partida, data_retorno):
+    return {
+        'preco': float(preco),
+        'data_partida': partida[:10] if partida else data_partida,
+        'partida': partida or None,  # horarios locais da ida (ISO), quando vierem
+        'chegada': chegada or None,
+        'data_retorno': data_retorno,
+        'companhia': companhia,
+        'escalas': segmentos - 1 if segmentos else None,
+        'duracao_min': duracao_minutos(duracao),
+    }
+
+if msgspec:
+    class _Ponto(msgspec.Struct, frozen=True):
+        at: str = ""
+
+    class _Segmento(msgspec.Struct):
+        departure: _Ponto = _Ponto()
+        arrival: _Ponto = _Ponto()
+        numberOfStops: int = 0
+
+    class _Itinerario(msgspec.Struct):
+        duration: str = ""
+        segments: list[_Segmento] = []
+
+    class _Preco(msgspec.Struct):
+        total: str
+
+    class _Oferta(msgspec.Struct):
+        price: _Preco
+        validatingAirlineCodes: list[str] = []
+        itineraries: list[_Itinerario] = []
+
+    class _Resposta(msgspec.Struct):
+        data: list[_Oferta] = []
+
+    _decoder = msgspec.json.Decoder(_Resposta)
+
+    def decodificar_ofertas(corpo, data_partida, data_retorno=None):
+        ofertas = []
+        for oferta in _decoder.decode(corpo).data:
+            # Escalas e duracao sao as da ida; paradas tecnicas contam como escala
+            ida = oferta.itineraries[0] if oferta.itineraries else _Itinerario()
+            segmentos = len(ida.segments) + sum(s.numberOfStops for s in ida.segments)
+            ofertas.append(montar_oferta(
+                oferta.price.total,
+                oferta.validatingAirlineCodes[0] if oferta.validatingAirlineCodes else None,
+                segmentos, ida.duration,
+                ida.segments[0].departure.at if ida.segments else None,
+                ida.segments[-1].arrival.at if ida.segments else None,
+                data_partida, data_retorno))
+        return ofertas
+else:
+    _loads = orjson.loads if orjson else json.loads
+
+    def decodificar_ofertas(corpo, data_partida, data_retorno=None):
+        return extrair_ofertas(_loads(corpo), data_partida, data_retorno)
+
+def extrair_ofertas(result, data_partida, data_retorno=None):
+    ofertas = []
+    for oferta in result.get('data') or []:
+        ida = (oferta.get('itineraries') or [{}])[0]
+        segmentos = ida.get('segments') or []
+        ofertas.append(montar_oferta(
+            oferta['price']['total'],
+            (oferta.get('validatingAirlineCodes') or [None])[0],
+            len(segmentos) + sum(s.get('numberOfStops', 0) for s in segmentos),
+            ida.get('duration'),
+            segmentos[0].get('departure', {}).get('at') if segmentos else None,
+            segmentos[-1].get('arrival', {}).get('at') if segmentos else None,
+            data_partida, data_retorno))
+    return ofertas
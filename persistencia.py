@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Espera sem precos novos antes de gravar (debounce) e teto de atraso de um preco sujo
+PERSISTENCIA_JANELA_SEGUNDOS = float(os.getenv("PERSISTENCIA_JANELA_SEGUNDOS", "2"))
+PERSISTENCIA_MAX_ESPERA_SEGUNDOS = float(os.getenv("PERSISTENCIA_MAX_ESPERA_SEGUNDOS", "30"))
+
+# ==========================================
+# GRAVACAO EM SEGUNDO PLANO (write-behind)
+# ==========================================
+# Os precos ficam num buffer por rota e sao gravados juntos, numa thread
+# propria, depois que o fluxo acalma (ou no teto de espera). Todo acesso ao
+# banco passa pela mesma thread, entao o SQLite nunca e usado em paralelo e o
+# event loop nunca espera disco.
+class GravadorPrecos:
+    def __init__(self, gravar, janela=PERSISTENCIA_JANELA_SEGUNDOS, max_espera=PERSISTENCIA_MAX_ESPERA_SEGUNDOS):
+        self.gravar = gravar  # gravar(lote) com lote = [(rota_id, ts, preco, dias_partida)]
+        self.janela = janela
+        self.max_espera = max_espera
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persistencia")
+        self.sujas = defaultdict(list)  # rota_id -> [(ts, preco, dias_partida)]
+        self.primeira_suja = None
+        self.timer = None
+        self.gravados = 0
+
+    def marcar(self, rota_id, ts, preco, dias_partida=None):
+        self.sujas[rota_id].append((ts, preco, dias_partida))
+        if self.primeira_suja is None:
+            self.primeira_suja = time.monotonic()
+        self._agendar()
+
+    def _agendar(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # fora do loop quem chama grava com descarregar_agora()
+        if self.timer:
+            self.timer.cancel()
+        limite = self.primeira_suja + self.max_espera - time.monotonic()
+        self.timer = loop.call_later(max(0.0, min(self.janela, limite)), self._disparar)
+
+    def _disparar(self):
+        self.timer = None
+        asyncio.ensure_future(self.descarregar())
+
+    def pendentes(self):
+        return sum(len(pontos) for pontos in self.sujas.values())
+
+    def _retirar(self):
+        lote = [(rota_id, *ponto) for rota_id, pontos in self.sujas.items() for ponto in pontos]
+        self.sujas.clear()
+        self.primeira_suja = None
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        return lote
+
+    async def descarregar(self):
+        lote = self._retirar()
+        if not lote:
+            return
+        try:
+            await self.executar(self.gravar, lote)
+            self.gravados += len(lote)
+        except Exception as e:
+            # Volta para o buffer e tenta de novo na proxima janela
+            print(f"❌ Erro gravando {len(lote)} precos: {e}")
+            for observacao in lote:
+                self.marcar(*observacao)
+
+    def descarregar_agora(self):
+        # Versao sincrona, para uso fora do event loop
+        lote = self._retirar()
+        if lote:
+            self.executor.submit(self.gravar, lote).result()
+            self.gravados += len(lote)
+
+    async def executar(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(funcao, *args))
+
+    async def fechar(self):
+        await self.descarregar()
+        self.executor.shutdown(wait=True)
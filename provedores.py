@@ -0,0 +1,269 @@
+import asyncio
+import os
+import random
+import re
+import time
+from collections import deque
+
+import metricas
+from limitador import LimitadorTaxa
+from ofertas import montar_oferta
+from snapshots import snapshots
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Latencias recentes guardadas por provedor (o p95 delas define o hedge)
+PROVEDORES_JANELA = 500
+PROVEDORES_MIN_AMOSTRAS = 20
+# Antes de ter amostras suficientes, espera isso antes de acionar o proximo provedor
+HEDGE_PADRAO_SEGUNDOS = float(os.getenv("HEDGE_PADRAO_SEGUNDOS", "3"))
+HEDGE_MIN_SEGUNDOS = 0.05
+# Fracao das buscas em que todos os provedores respondem, para medir a concordancia de precos
+PROVEDORES_AMOSTRA = float(os.getenv("PROVEDORES_AMOSTRA", "0.05"))
+PROVEDORES_TOLERANCIA = 0.02  # diferenca relativa que ainda conta como "mesmo preco"
+# Provedor secundario que concorda com o principal menos que isso sai do hedge
+# (continua nas comparacoes amostradas, e volta quando a concordancia subir)
+PROVEDORES_CONCORDANCIA_MIN = float(os.getenv("PROVEDORES_CONCORDANCIA_MIN", "0.5"))
+# Provedores menos confiaveis (scraper): preco fora desta faixa da media da rota e descartado
+FAIXA_PRECO_MIN = 0.3
+FAIXA_PRECO_MAX = 3.0
+
+# Scraper HTML generico: URL com {origem} {destino} {data_partida} {data_retorno}
+# e seletores CSS do bloco de cada oferta, do preco e (opcional) da companhia
+SCRAPER_URL = os.getenv("SCRAPER_URL", "")
+SCRAPER_SELETOR_OFERTA = os.getenv("SCRAPER_SELETOR_OFERTA", ".oferta")
+SCRAPER_SELETOR_PRECO = os.getenv("SCRAPER_SELETOR_PRECO", ".preco")
+SCRAPER_SELETOR_COMPANHIA = os.getenv("SCRAPER_SELETOR_COMPANHIA", "")
+SCRAPER_REQ_POR_SEGUNDO = float(os.getenv("SCRAPER_REQ_POR_SEGUNDO", "1"))
+
+# Media de cada rota para a faixa de preco. No bot vem dos snapshots; num
+# processo coletor (sem snapshots) chega junto com cada rota enviada pelo bot.
+medias_referencia = {}
+
+def media_referencia(rota_id):
+    if rota_id in medias_referencia:
+        return medias_referencia[rota_id]
+    snap = snapshots.get(rota_id)
+    return snap.media if snap else None
+
+# ==========================================
+# PROVEDOR (interface)
+# ==========================================
+# Cada fonte de tarifas implementa consultar() e devolve a lista de ofertas
+# (mesmo formato de ofertas.montar_oferta) ou None. medir() embrulha a
+# chamada e guarda latencia, vitorias e concordancia com o provedor principal.
+class Provedor:
+    nome = "provedor"
+    # A API oficial passa direto (erro de preco de verdade e o que o bot procura);
+    # fontes que dependem de parse de texto sao conferidas contra o historico
+    conferir_faixa = False
+
+    def __init__(self):
+        self.latencias = deque(maxlen=PROVEDORES_JANELA)  # so respostas validas
+        self.diferencas = deque(maxlen=PROVEDORES_JANELA)  # |preco - outro| / outro
+        self.chamadas = 0
+        self.vitorias = 0
+        self.hedges = 0
+
+    def disponivel(self):
+        return True
+
+    async def consultar(self, origem, destino, data_partida, data_retorno=None, adultos=1, moeda="BRL"):
+        raise NotImplementedError
+
+    async def medir(self, *args):
+        self.chamadas += 1
+        inicio = time.perf_counter()
+        try:
+            ofertas = await self.consultar(*args)
+        except asyncio.CancelledError:
+            metricas.provedor_resultados.inc(1, self.nome, "cancelado")
+            raise
+        except Exception as e:
+            print(f"❌ Erro no provedor {self.nome}: {e}")
+            ofertas = None
+        duracao = time.perf_counter() - inicio
+        metricas.provedor_latencia.observar(duracao, self.nome)
+        if ofertas and self.conferir_faixa and not self.plausivel(ofertas, *args[:2]):
+            metricas.provedor_resultados.inc(1, self.nome, "fora_da_faixa")
+            return None
+        metricas.provedor_resultados.inc(1, self.nome, "ok" if ofertas else "vazio")
+        if ofertas:
+            self.latencias.append(duracao)
+        return ofertas
+
+    def plausivel(self, ofertas, origem, destino):
+        media = media_referencia(f"{origem}-{destino}")
+        if not media:
+            return True
+        preco = min(o['preco'] for o in ofertas)
+        if FAIXA_PRECO_MIN * media <= preco <= FAIXA_PRECO_MAX * media:
+            return True
+        print(f"⚠️ {self.nome}: R$ {preco:,.2f} em {origem}-{destino} fora da faixa (media R$ {media:,.2f}), descartado")
+        return False
+
+    def p95(self):
+        if len(self.latencias) < PROVEDORES_MIN_AMOSTRAS:
+            return None
+        latencias = sorted(self.latencias)
+        return latencias[int(len(latencias) * 0.95)]
+
+    def atraso_hedge(self):
+        p95 = self.p95()
+        return HEDGE_PADRAO_SEGUNDOS if p95 is None else max(HEDGE_MIN_SEGUNDOS, p95)
+
+    def comparar(self, preco, referencia):
+        diferenca = abs(preco - referencia) / referencia
+        self.diferencas.append(diferenca)
+        metricas.provedor_divergencia.observar(diferenca, self.nome)
+
+    def concordancia(self):
+        # Fracao das comparacoes em que o menor preco bateu com o do provedor principal
+        if not self.diferencas:
+            return None
+        return sum(d <= PROVEDORES_TOLERANCIA for d in self.diferencas) / len(self.diferencas)
+
+    def confiavel(self):
+        # Sem amostras suficientes ainda vale o beneficio da duvida
+        if len(self.diferencas) < PROVEDORES_MIN_AMOSTRAS:
+            return True
+        return self.concordancia() >= PROVEDORES_CONCORDANCIA_MIN
+
+    def estado(self):
+        return {
+            'chamadas': self.chamadas,
+            'vitorias': self.vitorias,
+            'hedges': self.hedges,
+            'p95': self.p95(),
+            'concordancia': self.concordancia(),
+        }
+
+# ==========================================
+# SCRAPER HTML
+# ==========================================
+def ler_preco(texto):
+    # "R$ 1.234,56" / "1,234.56" -> 1234.56 ; "R$ 2.399" / "12,345" -> milhar, nao decimal
+    numero = re.sub(r"[^\d.,]", "", texto)
+    separadores = [c for c in numero if c in ".,"]
+    if not separadores:
+        decimal = None
+    elif len(set(separadores)) == 2:
+        decimal = separadores[-1]  # o ultimo separador e o decimal
+    elif len(separadores) > 1 or re.search(r"[.,]\d{3}$", numero):
+        decimal = None  # separador repetido ou seguido de 3 digitos: so milhar
+    else:
+        decimal = separadores[0]
+    if decimal:
+        inteiro, _, centavos = numero.rpartition(decimal)
+        numero = re.sub(r"[.,]", "", inteiro) + "." + centavos
+    else:
+        numero = re.sub(r"[.,]", "", numero)
+    try:
+        return float(numero)
+    except ValueError:
+        return None
+
+class ProvedorHtml(Provedor):
+    nome = "html"
+    conferir_faixa = True
+
+    def __init__(self, obter_sessao, url=SCRAPER_URL, seletor_oferta=SCRAPER_SELETOR_OFERTA,
+                 seletor_preco=SCRAPER_SELETOR_PRECO, seletor_companhia=SCRAPER_SELETOR_COMPANHIA,
+                 req_por_segundo=SCRAPER_REQ_POR_SEGUNDO):
+        super().__init__()
+        self.obter_sessao = obter_sessao
+        self.url = url
+        self.seletor_oferta = seletor_oferta
+        self.seletor_preco = seletor_preco
+        self.seletor_companhia = seletor_companhia
+        self.limitador = LimitadorTaxa(req_por_segundo, 1)
+
+    def disponivel(self):
+        return bool(self.url)
+
+    async def consultar(self, origem, destino, data_partida, data_retorno=None, adultos=1, moeda="BRL"):
+        url = self.url.format(origem=origem, destino=destino, data_partida=data_partida,
+                              data_retorno=data_retorno or "", adultos=adultos, moeda=moeda)
+        await self.limitador.adquirir()
+        async with self.obter_sessao().get(url) as response:
+            if response.status != 200:
+                return None
+            html = await response.text()
+        # bs4 e lento em paginas grandes: o parse roda fora do event loop
+        return await asyncio.to_thread(self.extrair, html, data_partida, data_retorno) or None
+
+    def extrair(self, html, data_partida, data_retorno=None):
+        # bs4 so e carregado por quem usa o scraper (a CLI importa este modulo sem ele)
+        from bs4 import BeautifulSoup
+        ofertas = []
+        for bloco in BeautifulSoup(html, "html.parser").select(self.seletor_oferta):
+            preco = bloco.select_one(self.seletor_preco)
+            valor = ler_preco(preco.get_text()) if preco else None
+            if not valor:
+                continue
+            companhia = bloco.select_one(self.seletor_companhia) if self.seletor_companhia else None
+            ofertas.append(montar_oferta(valor, companhia.get_text(strip=True) if companhia else None,
+                                         None, None, None, None, data_partida, data_retorno))
+        ofertas.sort(key=lambda o: o['preco'])
+        return ofertas
+
+# ==========================================
+# BUSCA COM HEDGE
+# ==========================================
+# Dispara o primeiro provedor (o principal); se ele passar do proprio p95 (ou
+# falhar), dispara o seguinte, e assim por diante. A primeira resposta valida
+# vence e as demais sao canceladas. Secundarios que nao concordam com o
+# principal ficam fora da corrida. Numa amostra das buscas todos os provedores
+# vao ate o fim (em segundo plano) so para medir a concordancia de precos.
+_comparacoes = set()
+
+async def buscar_com_hedge(provedores, *args):
+    ativos = [p for p in provedores if p.disponivel()]
+    corrida = ativos[:1] + [p for p in ativos[1:] if p.confiavel()]
+    loop = asyncio.get_running_loop()
+    tarefas = {}  # Task -> provedor
+    vencedora = None
+    try:
+        for i, provedor in enumerate(corrida):
+            if i:
+                provedor.hedges += 1
+                metricas.provedor_hedges.inc(1, provedor.nome)
+            tarefas[asyncio.create_task(provedor.medir(*args))] = provedor
+            prazo = loop.time() + provedor.atraso_hedge() if i < len(corrida) - 1 else None
+            pendentes = {t for t in tarefas if not t.done()}
+            while pendentes and vencedora is None:
+                espera = None if prazo is None else max(0.0, prazo - loop.time())
+                feitas, pendentes = await asyncio.wait(pendentes, timeout=espera, return_when=asyncio.FIRST_COMPLETED)
+                if not feitas:
+                    break  # passou do p95: aciona o proximo sem cancelar este
+                vencedora = next((t for t in feitas if t.result()), None)
+            if vencedora:
+                tarefas[vencedora].vitorias += 1
+                metricas.provedor_vitorias.inc(1, tarefas[vencedora].nome)
+                return vencedora.result()
+        return None
+    finally:
+        if vencedora and len(ativos) > 1 and random.random() < PROVEDORES_AMOSTRA:
+            tarefa = asyncio.create_task(_comparar(vencedora, tarefas, ativos, args))
+            _comparacoes.add(tarefa)
+            tarefa.add_done_callback(_comparacoes.discard)
+        else:
+            for tarefa in tarefas:
+                tarefa.cancel()
+
+async def _comparar(vencedora, tarefas, ativos, args):
+    # Deixa os perdedores terminarem (e aciona quem nem chegou a ser chamado)
+    acionados = set(tarefas.values())
+    for provedor in ativos:
+        if provedor not in acionados:
+            tarefas[asyncio.create_task(provedor.medir(*args))] = provedor
+    outras = [t for t in tarefas if t is not vencedora]
+    await asyncio.wait(outras)
+    # Tudo e medido contra o principal: e a concordancia com ele que decide o hedge
+    respostas = {tarefas[t]: t.result() for t in tarefas if not t.cancelled() and t.result()}
+    if ativos[0] not in respostas:
+        return
+    referencia = min(o['preco'] for o in respostas.pop(ativos[0]))
+    for provedor, ofertas in respostas.items():
+        provedor.comparar(min(o['preco'] for o in ofertas), referencia)
@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Rotas iniciais de cada servidor novo (depois cada um adiciona/remove as suas)
+ROTAS = [
+    {"origem": "GRU", "destino": "SSA", "nome": "Sao Paulo → Salvador"},
+    {"origem": "GRU", "destino": "FOR", "nome": "Sao Paulo → Fortaleza"},
+    {"origem": "GRU", "destino": "REC", "nome": "Sao Paulo → Recife"},
+    {"origem": "GRU", "destino": "NAT", "nome": "Sao Paulo → Natal"},
+    {"origem": "GRU", "destino": "MCZ", "nome": "Sao Paulo → Maceio"},
+    {"origem": "GRU", "destino": "JFK", "nome": "Sao Paulo → Nova York"},
+    {"origem": "GRU", "destino": "MIA", "nome": "Sao Paulo → Miami"},
+    {"origem": "GRU", "destino": "LAX", "nome": "Sao Paulo → Los Angeles"},
+    {"origem": "GRU", "destino": "LIS", "nome": "Sao Paulo → Lisboa"},
+    {"origem": "GRU", "destino": "MAD", "nome": "Sao Paulo → Madrid"},
+    {"origem": "GRU", "destino": "CDG", "nome": "Sao Paulo → Paris"},
+    {"origem": "GRU", "destino": "LHR", "nome": "Sao Paulo → Londres"},
+]
+
+# ==========================================
+# SERVIDORES (varios guilds no mesmo bot)
+# ==========================================
+# Cada servidor assina suas rotas e escolhe o canal de alertas. O catalogo
+# guarda cada rota uma vez so, com os servidores inscritos: o monitor busca
+# o catalogo (custo da API por rota unica, nao servidor x rota) e espalha o
+# resultado para os canais de quem assina.
+class ServidoresInscritos:
+    def __init__(self):
+        self.canais = {}  # guild_id -> canal_id (None ate alguem usar !canal)
+        self.rotas = defaultdict(dict)  # guild_id -> {rota_id: rota}
+        self.catalogo = {}  # rota_id -> rota (nome de quem assinou primeiro)
+        self.inscritos = defaultdict(set)  # rota_id -> {guild_id}
+
+    def carregar(self, canais, inscricoes):
+        self.__init__()
+        self.canais.update(canais)
+        for guild_id, rota in inscricoes:
+            self.inscrever(guild_id, rota)
+
+    def conhecido(self, guild_id):
+        return guild_id in self.canais
+
+    def definir_canal(self, guild_id, canal_id):
+        self.canais[guild_id] = canal_id
+
+    def inscrever(self, guild_id, rota):
+        rota_id = f"{rota['origem']}-{rota['destino']}"
+        self.canais.setdefault(guild_id, None)
+        if rota_id in self.rotas[guild_id]:
+            return False
+        self.rotas[guild_id][rota_id] = rota
+        self.catalogo.setdefault(rota_id, rota)
+        self.inscritos[rota_id].add(guild_id)
+        return True
+
+    def cancelar(self, guild_id, rota_id):
+        rota = self.rotas[guild_id].pop(rota_id, None)
+        if rota is None:
+            return None
+        self.inscritos[rota_id].discard(guild_id)
+        if not self.inscritos[rota_id]:
+            # Ultimo servidor saiu: a rota deixa de ser buscada
+            del self.inscritos[rota_id]
+            del self.catalogo[rota_id]
+        elif self.catalogo[rota_id] is rota:
+            outro = next(iter(self.inscritos[rota_id]))
+            self.catalogo[rota_id] = self.rotas[outro][rota_id]
+        return rota
+
+    def remover(self, guild_id):
+        for rota_id in list(self.rotas.get(guild_id, ())):
+            self.cancelar(guild_id, rota_id)
+        self.rotas.pop(guild_id, None)
+        self.canais.pop(guild_id, None)
+
+    def canais_da_rota(self, rota_id):
+        return [self.canais[g] for g in self.inscritos.get(rota_id, ()) if self.canais.get(g)]
+
+    def assinantes(self, rota_id):
+        return len(self.inscritos.get(rota_id, ()))
+
+    def com_canal(self):
+        # (guild_id, canal_id, {rota_id: rota}) de cada servidor que recebe alertas
+        return [(g, canal_id, self.rotas[g]) for g, canal_id in self.canais.items() if canal_id]
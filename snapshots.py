@@ -0,0 +1,56 @@
+from estatisticas import calcular_estatisticas, calcular_score, calcular_tendencia
+
+# ==========================================
+# URGENCIA
+# ==========================================
+def determinar_urgencia(score, tendencia):
+    if score >= 9:
+        return "🔥 COMPRE AGORA! Preco minimo historico!"
+    elif score >= 8:
+        if tendencia == "SUBINDO":
+            return "⚡ COMPRE HOJE! Preco excelente e subindo!"
+        return "⚡ COMPRE HOJE! Preco excelente!"
+    elif score >= 7:
+        return "✅ Boa oportunidade. Vale comprar."
+    elif score >= 6:
+        if tendencia == "CAINDO":
+            return "⏰ Preco OK mas CAINDO. Aguarde mais um pouco."
+        return "⏰ Preco OK. Pode esperar."
+    elif score >= 5:
+        return "📊 Preco na media. Aguarde melhores."
+    return "❌ Preco ALTO. NAO compre agora!"
+
+# ==========================================
+# SNAPSHOT POR ROTA
+# ==========================================
+# Tudo o que !deal, o relatorio e a agenda leem de uma rota, calculado uma vez
+# quando chega preco novo. O embed do !deal e montado na primeira consulta e
+# fica guardado (serializado) ate o proximo preco trocar o snapshot.
+class SnapshotRota:
+    __slots__ = ('rota_id', 'pontos', 'preco', 'ts', 'media', 'desvio', 'minimo', 'maximo',
+                 'media_recente', 'minimo_recente', 'percentual', 'score', 'tendencia', 'variacao', 'urgencia', 'embed')
+
+    def __init__(self, rota_id, serie):
+        self.rota_id = rota_id
+        self.pontos = len(serie)
+        self.preco = serie.ultimo_preco()
+        self.ts = serie.ultimo_ts()
+        self.media, self.desvio, self.minimo, self.maximo = calcular_estatisticas(rota_id)
+        self.media_recente, self.minimo_recente = serie.resumo()
+        self.percentual = (self.media - self.preco) / self.media * 100 if self.media else None
+        self.score = calcular_score(self.preco, self.media, self.minimo, self.maximo)
+        self.tendencia, self.variacao = calcular_tendencia(rota_id)
+        self.urgencia = determinar_urgencia(self.score, self.tendencia)
+        self.embed = None
+
+snapshots = {}
+
+def atualizar_snapshot(rota_id, serie):
+    snapshot = snapshots[rota_id] = SnapshotRota(rota_id, serie)
+    return snapshot
+
+def reconstruir_snapshots(historico):
+    snapshots.clear()
+    for rota_id, serie in historico.items():
+        if len(serie):
+            atualizar_snapshot(rota_id, serie)
@@ -0,0 +1,72 @@
+import math
+import os
+import random
+import tempfile
+import unittest
+
+import anomalia
+from anomalia import ALFA_NIVEL, TAXAS_FALSO_POSITIVO, DetectorAnomalia, classificar_z
+from armazenamento import ArmazemPrecos
+
+def aquecido(preco=1000.0, leituras=200, dias_partida=30):
+    detector = DetectorAnomalia()
+    for i in range(leituras):
+        detector.observar(preco, i * 3600, dias_partida)
+    return detector
+
+class TestDetectorAnomalia(unittest.TestCase):
+    def test_nivel_anda_alfa_com_uma_faixa_de_antecedencia(self):
+        detector = aquecido()
+        antes = detector.nivel
+        detector.observar(1005.0, 200 * 3600, 30)
+        self.assertAlmostEqual((detector.nivel - antes) / (math.log(1005.0) - antes), ALFA_NIVEL, places=6)
+        self.assertEqual(detector.antecedencia, [0.0] * len(detector.antecedencia))
+
+    def test_antecedencia_centrada_nas_faixas_vistas(self):
+        detector = aquecido()
+        for i in range(200, 400):
+            detector.observar(1200.0 if i % 2 else 1000.0, i * 3600, 5 if i % 2 else 45)
+        vistas = [a for a, vista in zip(detector.antecedencia, detector.vistas) if vista]
+        self.assertEqual(len(vistas), 2)
+        self.assertAlmostEqual(sum(vistas), 0.0, places=9)
+        self.assertGreater(vistas[0], vistas[1])  # perto da partida e mais caro
+
+    def test_falsos_positivos_so_com_ruido(self):
+        aleatorio = random.Random(1)
+        alertas = leituras = 0
+        for _ in range(5):
+            detector = DetectorAnomalia()
+            for i in range(10_000):
+                z = detector.observar(1000 * (1 + aleatorio.gauss(0, 0.03)), i * 3600, 30)
+                if z is not None:
+                    leituras += 1
+                    alertas += classificar_z(z) is not None
+        self.assertLess(alertas / leituras, 2 * TAXAS_FALSO_POSITIVO["bom"])
+
+class TestReconstrucao(unittest.TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.armazem = ArmazemPrecos(os.path.join(pasta.name, "precos.db"))
+        self.addCleanup(self.armazem.fechar)
+        self.addCleanup(anomalia.detectores.clear)
+
+    def test_estado_gravado_mais_leituras_novas_igual_ao_ao_vivo(self):
+        # Historico bem mais longo que a janela recente: so o replay nao bastaria
+        aleatorio = random.Random(3)
+        linhas = [("GRU-LIS", i * 3600, 1000 * (1 + aleatorio.gauss(0, 0.03)), aleatorio.choice([None, 5, 20, 45]))
+                  for i in range(2000)]
+        ao_vivo = DetectorAnomalia()
+        for n, (rota_id, ts, preco, dias) in enumerate(linhas):
+            anomalia.observar_preco(rota_id, preco, ts, dias)
+            ao_vivo.observar(preco, ts, dias)
+            if n == 1500:
+                self.armazem.salvar_detectores(anomalia.retirar_estados())
+        self.armazem.adicionar_precos(linhas)
+
+        recentes = self.armazem.carregar_recentes(1200 * 3600)
+        anomalia.reconstruir_detectores(recentes, self.armazem.carregar_detectores())
+        self.assertEqual(anomalia.detectores["GRU-LIS"].estado(), ao_vivo.estado())
+
+if __name__ == "__main__":
+    unittest.main()
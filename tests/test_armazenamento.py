@@ -0,0 +1,40 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from armazenamento import ArmazemPrecos
+
+class TestMigracaoJson(unittest.TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.precos = os.path.join(pasta.name, "historico_precos.json")
+        self.alertas = os.path.join(pasta.name, "alertas_personalizados.json")
+        with open(self.precos, "w") as f:
+            json.dump({"GRU-LIS": [{"data": "2024-01-01T10:00:00", "preco": 3000.0},
+                                   {"data": "2024-01-02T10:00:00", "preco": 2900.0}]}, f)
+        with open(self.alertas, "w") as f:
+            json.dump({"42": [{"rota": "GRU-LIS", "preco_max": 2500.0}]}, f)
+        self.armazem = ArmazemPrecos(os.path.join(pasta.name, "precos.db"))
+        self.addCleanup(self.armazem.fechar)
+
+    def contar(self, tabela):
+        return self.armazem.conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+    def test_queda_antes_de_renomear_nao_duplica(self):
+        with mock.patch("armazenamento.os.replace", side_effect=OSError("queda")):
+            with self.assertRaises(OSError):
+                self.armazem.migrar_json(self.precos, self.alertas)
+        self.assertTrue(os.path.exists(self.precos))
+
+        self.assertTrue(self.armazem.migrar_json(self.precos, self.alertas))
+        self.assertEqual(self.contar("precos"), 2)
+        self.assertEqual(self.contar("alertas"), 1)
+        self.assertFalse(os.path.exists(self.precos))
+        self.assertTrue(os.path.exists(self.precos + ".migrado"))
+        self.assertFalse(self.armazem.migrar_json(self.precos, self.alertas))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from grafo import GrafoTarifas, trechos_com_horario
+
+AGORA = time.time()
+DIA = (datetime.fromtimestamp(AGORA) + timedelta(days=10)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def oferta(preco, partida_h, chegada_h):
+    partida = DIA + timedelta(hours=partida_h) if partida_h is not None else None
+    chegada = DIA + timedelta(hours=chegada_h) if chegada_h is not None else None
+    return {
+        'preco': preco,
+        'data_partida': DIA.strftime("%Y-%m-%d"),
+        'partida': partida.isoformat() if partida else None,
+        'chegada': chegada.isoformat() if chegada else None,
+        'companhia': None,
+    }
+
+class TestGrafo(unittest.TestCase):
+    def test_trecho_sem_horario_fica_de_fora(self):
+        grafo = GrafoTarifas()
+        self.assertEqual(grafo.atualizar("GRU", "LIS", [oferta(1000, None, None)], ts=AGORA), 0)
+        self.assertIsNone(grafo.direto("GRU", "LIS", AGORA))
+        self.assertEqual(trechos_com_horario([oferta(1000, None, None), oferta(900, 8, 20)]), [oferta(900, 8, 20)])
+
+    def test_conexao_usa_oferta_que_nao_e_a_mais_barata(self):
+        # O trecho mais barato GRU->LIS chega tarde demais; a conexao so fecha
+        # com a segunda oferta do mesmo dia
+        grafo = GrafoTarifas()
+        grafo.atualizar("GRU", "MAD", [oferta(3000, 9, 21)], ts=AGORA)
+        grafo.atualizar("GRU", "LIS", [oferta(800, 12, 23), oferta(900, 0, 11)], ts=AGORA)
+        grafo.atualizar("LIS", "MAD", [oferta(200, 15, 17)], ts=AGORA)
+        divisoes = grafo.divisoes("GRU", "MAD", agora=AGORA)
+        self.assertEqual(len(divisoes), 1)
+        self.assertEqual(divisoes[0]['preco'], 1100)
+        self.assertEqual([t.destino for t in divisoes[0]['trechos']], ["LIS", "MAD"])
+
+    def test_atualizar_invalida_cache(self):
+        grafo = GrafoTarifas()
+        grafo.atualizar("GRU", "MAD", [oferta(3000, 9, 21)], ts=AGORA)
+        self.assertEqual(grafo.divisoes("GRU", "MAD", agora=AGORA), [])
+        grafo.atualizar("GRU", "LIS", [oferta(900, 0, 11)], ts=AGORA)
+        grafo.atualizar("LIS", "MAD", [oferta(200, 15, 17)], ts=AGORA)
+        self.assertEqual(len(grafo.divisoes("GRU", "MAD", agora=AGORA)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
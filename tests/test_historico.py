@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from armazenamento import ArmazemPrecos
+from historico import DIA, HORA, RETENCAO_BRUTA_DIAS, RETENCAO_HORARIA_DIAS, SerieRota, carregar_series, cortes
+
+AGORA = 1_700_000_000 - 1_700_000_000 % DIA
+
+def pontos(dias, passo=2 * HORA):
+    # Um preco a cada `passo` segundos nos ultimos `dias` dias
+    inicio = AGORA - dias * DIA
+    return [(inicio + i * passo, 1000.0 + (i % 7) * 10) for i in range(dias * DIA // passo)]
+
+class TestCamadas(unittest.TestCase):
+    def test_compactar_passa_bruto_para_horas_e_dias(self):
+        serie = SerieRota()
+        dados = pontos(RETENCAO_HORARIA_DIAS + 10)
+        for ts, preco in dados:
+            serie.adicionar(preco, ts)
+        serie.compactar(AGORA)
+
+        corte_diario, corte_horario, corte_bruto = cortes(AGORA)
+        self.assertGreaterEqual(serie.ts[0], corte_bruto)
+        self.assertGreaterEqual(serie.horas.inicio[0], corte_horario - HORA)
+        self.assertLess(serie.horas.inicio[-1], corte_bruto)
+        self.assertTrue(len(serie.dias))
+        # Nenhum ponto se perde entre as camadas
+        self.assertEqual(len(serie) + serie.horas.resumo()[0] + serie.dias.resumo()[0], len(dados))
+        media, minimo = serie.resumo()
+        self.assertEqual(minimo, min(p for ts, p in dados if ts >= corte_bruto))
+
+    def test_carregar_do_banco_igual_ao_compactado(self):
+        dados = pontos(RETENCAO_HORARIA_DIAS + 10)
+        with tempfile.TemporaryDirectory() as pasta:
+            armazem = ArmazemPrecos(os.path.join(pasta, "precos.db"))
+            armazem.adicionar_precos([("GRU-LIS", ts, preco, None) for ts, preco in dados])
+            corte_diario, corte_horario, corte_bruto = cortes(AGORA)
+            carregada = carregar_series(armazem.carregar_recentes(corte_bruto),
+                                        armazem.carregar_agregados(HORA, corte_horario, corte_bruto),
+                                        armazem.carregar_agregados(DIA, corte_diario, corte_horario), AGORA)["GRU-LIS"]
+            armazem.fechar()
+
+        viva = SerieRota()
+        for ts, preco in dados:
+            viva.adicionar(preco, ts)
+        viva.compactar(AGORA)
+        self.assertEqual(list(carregada.ts), list(viva.ts))
+        self.assertEqual(list(carregada.horas.baldes()), list(viva.horas.baldes()))
+        self.assertEqual(carregada.dias.resumo(), viva.dias.resumo())
+        self.assertEqual(len(carregada), RETENCAO_BRUTA_DIAS * DIA // (2 * HORA))
+
+if __name__ == "__main__":
+    unittest.main()
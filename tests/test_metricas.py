@@ -0,0 +1,36 @@
+import unittest
+
+import amadeus
+import metricas
+from disjuntor import ABERTO, FECHADO
+
+class TestMetricasColetores(unittest.TestCase):
+    def setUp(self):
+        metricas.retirar_deltas()
+        self.addCleanup(metricas.disjuntor_estado.remotos.clear)
+        self.addCleanup(amadeus.disjuntores_coletores.clear)
+
+    def test_deltas_somam_no_registro_do_bot(self):
+        # O coletor zera o que ja mandou; o bot soma o que chega de cada envio
+        metricas.amadeus_requisicoes.inc(3, "flight-offers", 429)
+        metricas.amadeus_latencia.observar(0.2, "flight-offers")
+        deltas = metricas.retirar_deltas()
+        self.assertEqual(metricas.amadeus_requisicoes.total(), 0)
+        self.assertEqual(metricas.amadeus_latencia.contagem(), 0)
+
+        metricas.absorver("coletor0", deltas, {})
+        metricas.absorver("coletor1", deltas, {})
+        self.assertEqual(metricas.amadeus_requisicoes.valores[("flight-offers", 429)], 6)
+        self.assertEqual(metricas.amadeus_latencia.contagem(), 2)
+        self.assertAlmostEqual(metricas.amadeus_latencia.soma(), 0.4)
+
+    def test_disjuntor_aberto_no_coletor(self):
+        metricas.absorver("coletor0", {}, {"amadeus_disjuntor_estado": {("flight-offers",): 2}})
+        self.assertIn('amadeus_disjuntor_estado{endpoint="flight-offers"} 2', metricas.exportar())
+
+        self.assertFalse(amadeus.api_degradada())
+        amadeus.disjuntores_coletores[0] = {"token": FECHADO, "flight-offers": ABERTO}
+        self.assertTrue(amadeus.api_degradada())
+
+if __name__ == "__main__":
+    unittest.main()
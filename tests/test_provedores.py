@@ -0,0 +1,146 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import provedores
+from ofertas import montar_oferta
+from provedores import PROVEDORES_MIN_AMOSTRAS, Provedor, buscar_com_hedge, ler_preco
+
+ARGS = ("GRU", "LIS", "2026-12-01")
+
+# Provedor local: responde depois de `atraso` com `preco` (ou None) e registra
+# quando foi chamado e se foi cancelado
+class ProvedorStub(Provedor):
+    def __init__(self, nome, atraso, preco=1000.0):
+        super().__init__()
+        self.nome = nome
+        self.atraso = atraso
+        self.preco = preco
+        self.inicios = []
+        self.cancelado = False
+
+    async def consultar(self, origem, destino, data_partida, data_retorno=None, adultos=1, moeda="BRL"):
+        self.inicios.append(asyncio.get_running_loop().time())
+        try:
+            await asyncio.sleep(self.atraso)
+        except asyncio.CancelledError:
+            self.cancelado = True
+            raise
+        if self.preco is None:
+            return None
+        return [montar_oferta(self.preco, self.nome, 0, None, None, None, data_partida, data_retorno)]
+
+def aquecer(provedor, latencia):
+    # p95 conhecido sem precisar de chamadas de verdade
+    provedor.latencias.extend([latencia] * PROVEDORES_MIN_AMOSTRAS)
+
+class TestLerPreco(unittest.TestCase):
+    def test_formatos(self):
+        casos = {
+            "R$ 1.234": 1234.0,
+            "R$ 2.399": 2399.0,
+            "2.399,00": 2399.0,
+            "R$ 1.234,56": 1234.56,
+            "1,234.56": 1234.56,
+            "12.50": 12.5,
+            "R$ 899,90": 899.9,
+            "1.234.567": 1234567.0,
+            "USD 12,345": 12345.0,
+        }
+        for texto, esperado in casos.items():
+            with self.subTest(texto=texto):
+                self.assertEqual(ler_preco(texto), esperado)
+
+    def test_sem_digitos(self):
+        self.assertIsNone(ler_preco("Esgotado"))
+        self.assertIsNone(ler_preco("R$ --"))
+
+class TestHedge(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Sem comparacoes amostradas: os perdedores sempre sao cancelados
+        patcher = mock.patch.object(provedores, "PROVEDORES_AMOSTRA", 0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_secundario_so_depois_do_p95(self):
+        primario = ProvedorStub("amadeus", atraso=0.5)
+        secundario = ProvedorStub("html", atraso=0.01, preco=990.0)
+        aquecer(primario, 0.1)
+        inicio = asyncio.get_running_loop().time()
+        ofertas = await buscar_com_hedge([primario, secundario], *ARGS)
+        self.assertEqual(ofertas[0]['preco'], 990.0)
+        self.assertGreaterEqual(secundario.inicios[0] - inicio, 0.1)
+        self.assertEqual(secundario.hedges, 1)
+        self.assertEqual(secundario.vitorias, 1)
+
+    async def test_primario_rapido_nao_aciona_secundario(self):
+        primario = ProvedorStub("amadeus", atraso=0.01)
+        secundario = ProvedorStub("html", atraso=0.01)
+        aquecer(primario, 0.2)
+        await buscar_com_hedge([primario, secundario], *ARGS)
+        self.assertEqual(secundario.chamadas, 0)
+        self.assertEqual(primario.vitorias, 1)
+
+    async def test_falha_aciona_secundario_sem_esperar(self):
+        primario = ProvedorStub("amadeus", atraso=0.01, preco=None)
+        secundario = ProvedorStub("html", atraso=0.01)
+        aquecer(primario, 5.0)
+        ofertas = await asyncio.wait_for(buscar_com_hedge([primario, secundario], *ARGS), 1.0)
+        self.assertEqual(ofertas[0]['companhia'], "html")
+
+    async def test_perdedor_e_cancelado(self):
+        primario = ProvedorStub("amadeus", atraso=1.0)
+        secundario = ProvedorStub("html", atraso=0.01)
+        aquecer(primario, 0.05)
+        await buscar_com_hedge([primario, secundario], *ARGS)
+        await asyncio.sleep(0)
+        self.assertTrue(primario.cancelado)
+        self.assertEqual(primario.latencias.count(0.05), PROVEDORES_MIN_AMOSTRAS)  # cancelado nao conta latencia
+
+    async def test_secundario_discordante_sai_do_hedge(self):
+        primario = ProvedorStub("amadeus", atraso=0.01, preco=None)
+        secundario = ProvedorStub("html", atraso=0.01)
+        aquecer(primario, 0.01)
+        for _ in range(PROVEDORES_MIN_AMOSTRAS):
+            secundario.comparar(1500.0, 1000.0)
+        self.assertFalse(secundario.confiavel())
+        self.assertIsNone(await buscar_com_hedge([primario, secundario], *ARGS))
+        self.assertEqual(secundario.chamadas, 0)
+
+    async def test_concordancia_medida_contra_o_primario(self):
+        primario = ProvedorStub("amadeus", atraso=0.01, preco=1000.0)
+        secundario = ProvedorStub("html", atraso=0.02, preco=2000.0)
+        aquecer(primario, 0.05)
+        with mock.patch.object(provedores, "PROVEDORES_AMOSTRA", 1.0):
+            for _ in range(PROVEDORES_MIN_AMOSTRAS):
+                await buscar_com_hedge([primario, secundario], *ARGS)
+                await asyncio.gather(*provedores._comparacoes)
+        # Comparacoes amostradas seguem chamando o secundario, mas ele nao corre mais
+        self.assertEqual(secundario.concordancia(), 0.0)
+        self.assertIsNone(primario.concordancia())
+        self.assertFalse(secundario.confiavel())
+
+class TestFaixaDePreco(unittest.IsolatedAsyncioTestCase):
+    async def test_fora_da_faixa_e_descartado(self):
+        scraper = ProvedorStub("html", atraso=0.0, preco=2.399)
+        scraper.conferir_faixa = True
+        snap = mock.Mock(media=2400.0)
+        with mock.patch.dict(provedores.snapshots, {"GRU-LIS": snap}):
+            self.assertIsNone(await scraper.medir(*ARGS))
+            scraper.preco = 2399.0
+            self.assertEqual(len(await scraper.medir(*ARGS)), 1)
+
+    async def test_media_enviada_ao_coletor(self):
+        # Processo coletor: sem snapshots, a media chega com a rota
+        scraper = ProvedorStub("html", atraso=0.0, preco=2.399)
+        scraper.conferir_faixa = True
+        with mock.patch.dict(provedores.medias_referencia, {"GRU-LIS": 2400.0}):
+            self.assertIsNone(await scraper.medir(*ARGS))
+
+    async def test_api_oficial_nao_e_conferida(self):
+        api = ProvedorStub("amadeus", atraso=0.0, preco=200.0)
+        with mock.patch.dict(provedores.snapshots, {"GRU-LIS": mock.Mock(media=2400.0)}):
+            self.assertEqual(len(await api.medir(*ARGS)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+
+import metricas
+
+# ==========================================
+# CONFIGURACOES
+# ==========================================
+# Atraso do event loop acima disso e logado (com a pilha de quem travou)
+LOOP_LIMITE_SEGUNDOS = float(os.getenv("LOOP_LIMITE_SEGUNDOS", "0.25"))
+LOOP_INTERVALO_SEGUNDOS = 0.5
+
+# ==========================================
+# VIGIA DO EVENT LOOP
+# ==========================================
+# Uma tarefa no loop mede o atraso de cada sleep (quanto o loop demorou para
+# voltar a ela). Uma thread separada olha a ultima batida dessa tarefa: se o
+# loop ficar parado alem do limite, imprime a pilha da thread do loop naquele
+# momento, que mostra a corotina/funcao que esta bloqueando.
+class VigiaLoop:
+    def __init__(self, limite=LOOP_LIMITE_SEGUNDOS, intervalo=LOOP_INTERVALO_SEGUNDOS):
+        self.limite = limite
+        self.intervalo = intervalo
+        self.batida = time.monotonic()
+        self.thread_loop = None
+        self.tarefa = None
+        self.parado = threading.Event()
+        self.reportado = False
+        self.maior_atraso = 0.0
+
+    def iniciar(self):
+        if self.tarefa:
+            return
+        self.thread_loop = threading.get_ident()
+        self.batida = time.monotonic()
+        self.parado.clear()
+        self.tarefa = asyncio.create_task(self._medir())
+        threading.Thread(target=self._vigiar, name="vigia-loop", daemon=True).start()
+
+    def parar(self):
+        self.parado.set()
+        if self.tarefa:
+            self.tarefa.cancel()
+            self.tarefa = None
+
+    async def _medir(self):
+        while True:
+            inicio = time.monotonic()
+            await asyncio.sleep(self.intervalo)
+            self.batida = time.monotonic()
+            self.reportado = False
+            atraso = max(0.0, self.batida - inicio - self.intervalo)
+            self.maior_atraso = max(self.maior_atraso, atraso)
+            metricas.loop_atraso.observar(atraso)
+            if atraso > self.limite:
+                print(f"🐢 Event loop atrasado {atraso * 1000:.0f}ms")
+
+    def _vigiar(self):
+        while not self.parado.wait(self.intervalo):
+            travado = time.monotonic() - self.batida - self.intervalo
+            if travado <= self.limite or self.reportado:
+                continue
+            # Reporta uma vez por travamento
+            self.reportado = True
+            frame = sys._current_frames().get(self.thread_loop)
+            pilha = "".join(traceback.format_stack(frame)) if frame else "(sem pilha)"
+            print(f"🐢 Event loop travado ha {travado * 1000:.0f}ms, pilha atual:\n{pilha}")